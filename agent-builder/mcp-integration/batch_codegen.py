@@ -0,0 +1,423 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from mcp_helper import (
+    BASIC_AGENT_TEMPLATE_PATH,
+    DEFAULT_AGENT_TEMPLATE,
+    MCP_SERVER_TEMPLATE,
+    MCPIntegrationHelper
+)
+from codegen_validation import CodeValidator
+from template_engine import python_identifier
+
+# Batch agent code generation
+#
+# Renders many agents from a manifest over a process pool. Outputs are
+# written atomically, and agents whose inputs (spec, templates, server
+# configs) hash the same as on the previous run are skipped, unless this
+# run asks for more validation than they passed last time.
+#
+# Manifest format:
+#   {"agents": [{"name": "MyAgent", "servers": ["filesystem"],
+#                "template": "optional/path.tpl", "output": "optional.py"}]}
+# A bare list of agent specs is accepted as well. Relative template paths
+# are resolved against the manifest's directory; outputs are relative to
+# the output directory.
+
+STATE_FILE = ".codegen_state.json"
+
+# Validation levels, weakest first; an agent is only skipped when its last
+# run was validated at least as strictly as this one asks for
+VALIDATION_LEVELS = ("none", "validate", "type_check")
+
+
+@dataclass
+class AgentResult:
+    """Outcome of generating one agent"""
+    name: str
+    path: str
+    status: str
+    input_hash: str
+    output_hash: Optional[str] = None
+    render_seconds: float = 0.0
+    write_seconds: float = 0.0
+    validate_seconds: float = 0.0
+    error: Optional[str] = None
+    diagnostics: List[Dict[str, Any]] = field(default_factory=list)
+    validation: str = "none"
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch run"""
+    results: List[AgentResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    workers: int = 1
+    
+    def count(self, status: str) -> int:
+        return sum(1 for result in self.results if result.status == status)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Counts and timings for the whole batch"""
+        rendered = [result for result in self.results if result.status in ("written", "unchanged")]
+        render_total = sum(result.render_seconds for result in rendered)
+        return {
+            "agents": len(self.results),
+            "written": self.count("written"),
+            "unchanged": self.count("unchanged"),
+            "skipped": self.count("skipped"),
+            "invalid": self.count("invalid"),
+            "failed": self.count("failed"),
+            "workers": self.workers,
+            "elapsed": self.elapsed,
+            "mean_render_ms": 1000 * render_total / len(rendered) if rendered else 0.0
+        }
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """
+    Load agent specs from a manifest file
+    
+    Args:
+        path: Path to the JSON manifest
+        
+    Returns:
+        List of agent specs, with template paths made absolute
+    """
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    specs = manifest.get("agents", []) if isinstance(manifest, dict) else manifest
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+    for spec in specs:
+        if not isinstance(spec, dict) or not spec.get("name"):
+            raise ValueError(f"Agent spec without a name in {path}: {spec!r}")
+        template = spec.get("template")
+        if template and not os.path.isabs(template):
+            # Relative to the manifest, not to wherever the command runs from
+            spec["template"] = os.path.join(manifest_dir, template)
+    return specs
+
+
+def output_filename(spec: Dict[str, Any]) -> str:
+    """File name an agent spec is generated to"""
+    return spec.get("output") or f"{python_identifier(spec['name'].lower())}_agent.py"
+
+
+def atomic_write(path: str, content: str):
+    """
+    Write a file so readers never see a partial version
+    
+    Args:
+        path: Destination path
+        content: File content
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _file_digest(path: Optional[str]) -> str:
+    if not path or not os.path.exists(path):
+        return ""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class InputHasher:
+    """Hashes everything an agent's generated code depends on, memoizing shared inputs"""
+    
+    def __init__(self, helper: MCPIntegrationHelper):
+        self.helper = helper
+        self._templates: Dict[Optional[str], str] = {}
+        self._servers: Dict[str, str] = {}
+        self._base = hashlib.sha256(
+            "\0".join([
+                DEFAULT_AGENT_TEMPLATE,
+                MCP_SERVER_TEMPLATE,
+                _file_digest(BASIC_AGENT_TEMPLATE_PATH)
+            ]).encode()
+        ).hexdigest()
+    
+    def _template_digest(self, template_path: Optional[str]) -> str:
+        if template_path not in self._templates:
+            self._templates[template_path] = _file_digest(template_path)
+        return self._templates[template_path]
+    
+    def _server_digest(self, server_name: str) -> str:
+        if server_name not in self._servers:
+            config = self.helper.get_available_servers().get(server_name)
+            identity = None
+            if config is not None:
+                identity = {
+                    **config,
+                    "args": list(config.get("args", [])),
+                    "env": dict(config.get("env", {}))
+                }
+            self._servers[server_name] = json.dumps(identity, sort_keys=True, default=str)
+        return self._servers[server_name]
+    
+    def digest(self, spec: Dict[str, Any]) -> str:
+        """
+        Hash an agent spec together with its template and server configs
+        
+        Args:
+            spec: Agent spec
+            
+        Returns:
+            Hex digest that changes whenever the generated code could change
+        """
+        parts = [
+            self._base,
+            json.dumps(spec, sort_keys=True, default=str),
+            self._template_digest(spec.get("template"))
+        ]
+        parts.extend(self._server_digest(server_name) for server_name in spec.get("servers", []))
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+_worker_helper: Optional[MCPIntegrationHelper] = None
+_worker_validator: Optional[CodeValidator] = None
+
+
+def _init_worker(config_path: Optional[str], validation: Optional[Dict[str, Any]] = None):
+    """Create the helper (and validator) once per worker process so compiled templates are reused"""
+    global _worker_helper, _worker_validator
+    _worker_helper = MCPIntegrationHelper(config_path)
+    _worker_validator = CodeValidator(**validation) if validation is not None else None
+
+
+def _generate_agent(task: Dict[str, Any]) -> AgentResult:
+    """Render and write one agent (runs in a worker process)"""
+    spec = task["spec"]
+    result = AgentResult(spec["name"], task["path"], "written", task["input_hash"])
+    try:
+        start = time.perf_counter()
+        code = _worker_helper.generate_mcp_integration_code(
+            spec["name"], spec.get("servers", []), spec.get("template")
+        )
+        result.render_seconds = time.perf_counter() - start
+        result.output_hash = hashlib.sha256(code.encode()).hexdigest()
+        
+        if _worker_validator is not None:
+            start = time.perf_counter()
+            validation = _worker_validator.validate(code)
+            if validation.diagnostics:
+                # Re-render with a source map only when there is something to map
+                _, source_map = _worker_helper.generate_mcp_integration_code_with_source_map(
+                    spec["name"], spec.get("servers", []), spec.get("template")
+                )
+                validation.map_to_template(source_map)
+                result.diagnostics = validation.to_dict()["diagnostics"]
+            result.validate_seconds = time.perf_counter() - start
+            if not validation.ok:
+                result.status = "invalid"
+                return result
+        
+        if result.output_hash == task.get("previous_output_hash") and os.path.exists(task["path"]):
+            result.status = "unchanged"
+            return result
+        
+        start = time.perf_counter()
+        atomic_write(task["path"], code)
+        result.write_seconds = time.perf_counter() - start
+    except Exception as e:
+        result.status = "failed"
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _load_state(path: str) -> Dict[str, Dict[str, str]]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def generate_batch(
+    specs: List[Dict[str, Any]],
+    output_dir: str,
+    config_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    validate: bool = False,
+    type_check: bool = False,
+    validation_cache_dir: Optional[str] = None
+) -> BatchReport:
+    """
+    Generate agent code for many agent specs in parallel
+    
+    Args:
+        specs: Agent specs with name, servers and optional template/output
+        output_dir: Directory generated files are written to
+        config_path: Path to custom MCP server configurations
+        workers: Worker processes (defaults to the CPU count; 1 renders inline)
+        force: Regenerate agents even when their inputs are unchanged
+        validate: Check generated code before writing it; invalid agents are not written
+        type_check: Also run mypy during validation
+        validation_cache_dir: Directory for validation results shared across runs
+        
+    Returns:
+        BatchReport with one result per spec, in manifest order
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    state_path = os.path.join(output_dir, STATE_FILE)
+    state = {} if force else _load_state(state_path)
+    hasher = InputHasher(MCPIntegrationHelper(config_path))
+    validation = None
+    validation_level = "type_check" if type_check else "validate" if validate else "none"
+    if validate or type_check:
+        validation = {"cache_dir": validation_cache_dir, "type_check": type_check}
+    
+    results: List[Optional[AgentResult]] = [None] * len(specs)
+    tasks: List[Dict[str, Any]] = []
+    task_indexes: List[int] = []
+    
+    # Specs whose names normalize to the same file would overwrite each other
+    paths = [os.path.join(output_dir, output_filename(spec)) for spec in specs]
+    writers: Dict[str, List[str]] = {}
+    for spec, path in zip(specs, paths):
+        writers.setdefault(os.path.normcase(os.path.abspath(path)), []).append(spec["name"])
+    
+    for index, (spec, path) in enumerate(zip(specs, paths)):
+        input_hash = hasher.digest(spec)
+        names = writers[os.path.normcase(os.path.abspath(path))]
+        if len(names) > 1:
+            others = ", ".join(repr(name) for name in names if name != spec["name"]) or repr(spec["name"])
+            results[index] = AgentResult(
+                spec["name"], path, "failed", input_hash,
+                error=f"Output file {output_filename(spec)} is also generated by {others}"
+            )
+            continue
+        previous = state.get(path, {})
+        previous_level = previous.get("validation", "none")
+        validated = (
+            previous_level in VALIDATION_LEVELS
+            and VALIDATION_LEVELS.index(previous_level) >= VALIDATION_LEVELS.index(validation_level)
+        )
+        if previous.get("input_hash") == input_hash and validated and os.path.exists(path):
+            results[index] = AgentResult(
+                spec["name"], path, "skipped", input_hash, previous.get("output_hash"),
+                validation=previous_level
+            )
+            continue
+        tasks.append({
+            "spec": spec,
+            "path": path,
+            "input_hash": input_hash,
+            "previous_output_hash": previous.get("output_hash")
+        })
+        task_indexes.append(index)
+    
+    workers = max(1, min(workers, len(tasks)))
+    if not tasks:
+        generated = []
+    elif workers == 1:
+        _init_worker(config_path, validation)
+        generated = [_generate_agent(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(config_path, validation)) as executor:
+            generated = list(executor.map(_generate_agent, tasks, chunksize=chunksize))
+    
+    for index, result in zip(task_indexes, generated):
+        result.validation = validation_level
+        results[index] = result
+    
+    new_state = {
+        result.path: {
+            "input_hash": result.input_hash,
+            "output_hash": result.output_hash,
+            "validation": result.validation
+        }
+        for result in results
+        if result.status not in ("failed", "invalid")
+    }
+    if new_state != state:
+        os.makedirs(output_dir, exist_ok=True)
+        atomic_write(state_path, json.dumps(new_state, indent=2, sort_keys=True))
+    
+    return BatchReport(results, time.perf_counter() - started, workers)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate agent code for every agent in a manifest")
+    parser.add_argument("manifest", help="JSON manifest of agent specs")
+    parser.add_argument("-o", "--output-dir", default="generated_agents", help="Directory to write agents to")
+    parser.add_argument("-c", "--config", help="Custom MCP server configuration file")
+    parser.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Regenerate agents whose inputs are unchanged")
+    parser.add_argument("--validate", action="store_true", help="Check generated code before writing it")
+    parser.add_argument("--type-check", action="store_true", help="Also type check generated code with mypy")
+    parser.add_argument("--validation-cache", help="Directory to cache validation results in")
+    parser.add_argument("--report", help="Write a JSON report with per-agent timings to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print one line per agent")
+    args = parser.parse_args(argv)
+    
+    specs = load_manifest(args.manifest)
+    report = generate_batch(
+        specs,
+        args.output_dir,
+        args.config,
+        args.workers,
+        args.force,
+        args.validate,
+        args.type_check,
+        args.validation_cache
+    )
+    
+    for result in report.results:
+        if result.status == "failed":
+            print(f"FAILED {result.name}: {result.error}", file=sys.stderr)
+        elif args.verbose:
+            timing = f"render {1000 * result.render_seconds:.2f}ms, write {1000 * result.write_seconds:.2f}ms"
+            print(f"{result.status:9} {result.name} -> {result.path} ({timing})")
+        for diagnostic in result.diagnostics:
+            origin = ""
+            if diagnostic["template"]:
+                origin = f" (from {diagnostic['template']}:{diagnostic['template_line']})"
+            print(
+                f"{result.path}:{diagnostic['line']}: {diagnostic['severity']}: "
+                f"{diagnostic['message']}{origin}",
+                file=sys.stderr
+            )
+    
+    summary = report.summary()
+    print(
+        f"{summary['agents']} agents in {summary['elapsed']:.2f}s on {summary['workers']} workers: "
+        f"{summary['written']} written, {summary['unchanged']} unchanged, "
+        f"{summary['skipped']} skipped, {summary['invalid']} invalid, {summary['failed']} failed"
+    )
+    
+    if args.report:
+        atomic_write(args.report, json.dumps({
+            "summary": summary,
+            "agents": [asdict(result) for result in report.results]
+        }, indent=2))
+    
+    return 1 if summary["failed"] or summary["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
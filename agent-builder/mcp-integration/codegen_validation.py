@@ -0,0 +1,284 @@
+import ast
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from template_engine import SourceMap
+
+# Validation of generated agent code
+#
+# Checks run in order: ast parsing, import resolution against the current
+# environment, and (optionally) mypy. Results are cached by a hash of the
+# code, the checks requested and a fingerprint of the environment they ran
+# in, in memory and optionally on disk so that batch workers and later runs
+# share them.
+
+VALIDATOR_VERSION = "1"
+
+MYPY_LINE = re.compile(r"^(?P<path>.+?):(?P<line>\d+):(?:(?P<column>\d+):)? (?P<severity>error|warning|note): (?P<message>.*)$")
+
+
+@dataclass
+class Diagnostic:
+    """One problem found in generated code"""
+    check: str
+    severity: str
+    message: str
+    line: Optional[int] = None
+    column: Optional[int] = None
+    template: Optional[str] = None
+    template_line: Optional[int] = None
+
+
+@dataclass
+class ValidationResult:
+    """Outcome of validating one generated file"""
+    content_hash: str
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+    cached: bool = False
+    
+    @property
+    def ok(self) -> bool:
+        return not any(diagnostic.severity == "error" for diagnostic in self.diagnostics)
+    
+    def map_to_template(self, source_map: SourceMap) -> "ValidationResult":
+        """
+        Fill in the template origin of each diagnostic
+        
+        Args:
+            source_map: Source map from rendering the validated code
+            
+        Returns:
+            This result
+        """
+        for diagnostic in self.diagnostics:
+            if diagnostic.line is None:
+                continue
+            origin = source_map.lookup(diagnostic.line)
+            if origin is not None:
+                diagnostic.template, diagnostic.template_line = origin
+        return self
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "content_hash": self.content_hash,
+            "ok": self.ok,
+            "diagnostics": [asdict(diagnostic) for diagnostic in self.diagnostics]
+        }
+
+
+_module_cache: Dict[str, bool] = {}
+
+
+def module_resolves(name: str) -> bool:
+    """
+    Check whether a module can be found without importing it (parents are imported)
+    
+    Args:
+        name: Dotted module name
+        
+    Returns:
+        True when the module is importable
+    """
+    if name not in _module_cache:
+        try:
+            _module_cache[name] = importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):
+            _module_cache[name] = False
+    return _module_cache[name]
+
+
+def check_imports(tree: ast.AST) -> List[Diagnostic]:
+    """Report imports of modules that cannot be found"""
+    diagnostics = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if not module_resolves(name):
+                diagnostics.append(Diagnostic(
+                    "import", "error", f"Cannot resolve module {name!r}", node.lineno, node.col_offset + 1
+                ))
+    return diagnostics
+
+
+def check_types(code: str) -> List[Diagnostic]:
+    """
+    Type check the code with mypy when it is installed
+    
+    Args:
+        code: Python source
+        
+    Returns:
+        mypy errors and warnings as diagnostics (empty when mypy is unavailable)
+    """
+    try:
+        from mypy import api as mypy_api
+    except ImportError:
+        return [Diagnostic("types", "note", "mypy is not installed; type check skipped")]
+    
+    fd, path = tempfile.mkstemp(suffix=".py", prefix="generated_")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(code)
+        stdout, _, _ = mypy_api.run([
+            "--ignore-missing-imports",
+            "--no-error-summary",
+            "--show-column-numbers",
+            "--no-incremental",
+            path
+        ])
+    finally:
+        os.unlink(path)
+    
+    diagnostics = []
+    for output_line in stdout.splitlines():
+        match = MYPY_LINE.match(output_line)
+        if match and match.group("severity") != "note":
+            column = match.group("column")
+            diagnostics.append(Diagnostic(
+                "types",
+                match.group("severity"),
+                match.group("message"),
+                int(match.group("line")),
+                int(column) if column else None
+            ))
+    return diagnostics
+
+
+def environment_fingerprint() -> str:
+    """
+    Digest of everything outside the code that import and type checks depend on
+    
+    Covers the interpreter, sys.prefix, sys.path, the mypy version and the
+    name and version of every installed distribution, so a cache directory
+    shared between virtualenvs or reused after an install never returns
+    results computed against different packages.
+    """
+    distributions = sorted(
+        f"{dist.metadata['Name']}=={dist.version}" for dist in importlib.metadata.distributions()
+    )
+    try:
+        mypy_version = importlib.metadata.version("mypy")
+    except importlib.metadata.PackageNotFoundError:
+        mypy_version = ""
+    parts = [VALIDATOR_VERSION, sys.version, sys.prefix, *sys.path, f"mypy=={mypy_version}", *distributions]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class CodeValidator:
+    """Validates generated code once per distinct content"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, type_check: bool = False):
+        """
+        Initialize the validator
+        
+        Args:
+            cache_dir: Directory for a persistent cache shared across processes
+            type_check: Also run mypy
+        """
+        self.cache_dir = cache_dir
+        self.type_check = type_check
+        self.hits = 0
+        self.misses = 0
+        self._memory: Dict[str, List[Dict[str, Any]]] = {}
+        self._environment: Optional[str] = None
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @property
+    def environment(self) -> str:
+        """Environment fingerprint, computed once per validator"""
+        if self._environment is None:
+            self._environment = environment_fingerprint()
+        return self._environment
+    
+    def content_hash(self, code: str) -> str:
+        """Cache key: the code plus everything that affects the checks' outcome"""
+        checks = "types" if self.type_check else "basic"
+        return hashlib.sha256(f"{self.environment}\0{checks}\0{code}".encode()).hexdigest()
+    
+    def _cache_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{key}.json") if self.cache_dir else None
+    
+    def _lookup(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            return entry
+        path = self._cache_path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._memory[key] = entry
+        return entry
+    
+    def _store(self, key: str, diagnostics: List[Diagnostic]):
+        entry = [asdict(diagnostic) for diagnostic in diagnostics]
+        with self._lock:
+            self._memory[key] = entry
+        path = self._cache_path(key)
+        if path:
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".", suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+    
+    def validate(self, code: str, source_map: Optional[SourceMap] = None) -> ValidationResult:
+        """
+        Validate generated code, reusing the result for identical content
+        
+        Args:
+            code: Generated Python source
+            source_map: Map back to template lines for the diagnostics
+            
+        Returns:
+            ValidationResult
+        """
+        key = self.content_hash(code)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            result = ValidationResult(key, [Diagnostic(**diagnostic) for diagnostic in entry], cached=True)
+        else:
+            self.misses += 1
+            try:
+                tree = ast.parse(code)
+            except SyntaxError as e:
+                diagnostics = [Diagnostic("syntax", "error", e.msg, e.lineno, e.offset)]
+            else:
+                diagnostics = check_imports(tree)
+                if self.type_check:
+                    diagnostics.extend(check_types(code))
+            self._store(key, diagnostics)
+            result = ValidationResult(key, diagnostics)
+        
+        if source_map is not None:
+            result.map_to_template(source_map)
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,11 +1,1180 @@
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, Any, List, Optional
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Mapping, Optional, Tuple, Union
 from pathlib import Path
 from pydantic_ai import Agent
 from pydantic_ai.mcp import MCPServerStdio
+from pydantic import ValidationError
+from mcp import types as mcp_types
+from mcp.shared.message import SessionMessage
+import anyio
 import asyncio
 
+from template_engine import CompiledTemplate, SourceMap, TemplateEngine, python_identifier
+
+logger = logging.getLogger(__name__)
+
+BASIC_AGENT_TEMPLATE_PATH = str(Path(__file__).resolve().parent.parent / "templates" / "basic_agent_template.py")
+
+# Default agent template; AgentDeps comes from the agent_deps region of basic_agent_template.py
+DEFAULT_AGENT_TEMPLATE = '''import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from pydantic_ai import Agent
+from pydantic_ai.mcp import MCPServerStdio
+
+{> agent_deps}
+
+{class_name}Deps = AgentDeps
+
+# Connect to MCP servers
+mcp_servers = []
+{mcp_connections}
+
+# Create agent
+{agent_var}_agent = Agent(
+    'gpt-4',
+    system_prompt="You are an AI assistant with MCP server integration.",
+    deps_type={class_name}Deps,
+    toolsets=mcp_servers
+)
+
+# Run agent
+if __name__ == "__main__":
+    import asyncio
+    async def main():
+        deps = {class_name}Deps(api_key=os.getenv("OPENAI_API_KEY", ""))
+        result = await {agent_var}_agent.run("Hello!", deps=deps)
+        print(result.output)
+    
+    asyncio.run(main())
+'''
+
+# One MCP server connection; secrets are read from the environment at run time
+MCP_SERVER_TEMPLATE = '''
+# Connect to {server_name}
+{server_var} = MCPServerStdio(
+    {repr(command)},
+    {repr(args)},
+    env={env}
+)
+mcp_servers.append({server_var})
+'''
+
+
+@dataclass
+class PooledServer:
+    """A running MCP server subprocess owned by MCPServerPool"""
+    key: str
+    server: MCPServerStdio
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    stop: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+    error: Optional[BaseException] = None
+    leases: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+
+
+class MCPServerPool:
+    """
+    Pool of warm MCP server subprocesses keyed by server configuration
+    
+    A running server's client session multiplexes requests, so one subprocess
+    is shared by every agent holding a lease on it. Idle servers are stopped
+    after idle_timeout, and servers idle longer than health_check_interval are
+    health-checked before being handed out again.
+    
+    Servers are bound to the event loop that started them; on a new loop
+    (e.g. a second asyncio.run) the pool starts afresh and stops the old
+    loop's servers.
+    """
+    
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 60.0,
+        start_timeout: float = 60.0,
+        health_check_timeout: float = 10.0
+    ):
+        """
+        Initialize the pool
+        
+        Args:
+            idle_timeout: Seconds an unleased server is kept running
+            health_check_interval: Seconds after which a server is re-checked before reuse
+            start_timeout: Seconds allowed for a server to start and initialize
+            health_check_timeout: Seconds allowed for a health check
+        """
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.start_timeout = start_timeout
+        self.health_check_timeout = health_check_timeout
+        self.starts = 0
+        self.reuses = 0
+        self._servers: Dict[str, PooledServer] = {}
+        self._by_server: Dict[int, PooledServer] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self._tool_list_listeners: List[Callable[[str], None]] = []
+        self._stopping: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _check_loop(self):
+        """Drop servers, locks and tasks that belong to a previous event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        old_loop, servers = self._loop, list(self._servers.values())
+        self._loop = loop
+        self._servers = {}
+        self._by_server = {}
+        self._locks = {}
+        self._reaper = None
+        self._stopping = set()
+        if not servers:
+            return
+        if old_loop is not None and old_loop.is_running():
+            # Still serving another thread: let each server's own task shut it down
+            for pooled in servers:
+                old_loop.call_soon_threadsafe(pooled.stop.set)
+        else:
+            # asyncio.run cancels leftover tasks, which exits the server contexts
+            logger.debug("Dropped %d MCP servers of a finished event loop", len(servers))
+    
+    def on_tool_list_changed(self, listener: Callable[[str], None]):
+        """Register a callback receiving the config hash of servers whose tools changed"""
+        if listener not in self._tool_list_listeners:
+            self._tool_list_listeners.append(listener)
+    
+    def _watch_notifications(self, key: str, server: MCPServerStdio):
+        """Forward tools/list_changed notifications from a server to the listeners"""
+        if not isinstance(server, CachingMCPServerStdio):
+            logger.debug("%r does not report notifications; its tool list is only refreshed by TTL", server)
+            return
+        
+        async def handle(message: Any):
+            if isinstance(getattr(message, 'root', None), mcp_types.ToolListChangedNotification):
+                for listener in self._tool_list_listeners:
+                    listener(key)
+        
+        server.set_message_handler(handle)
+    
+    @staticmethod
+    def config_key(config: Dict[str, Any]) -> str:
+        """Stable hash of the parts of a server config that define the process"""
+        identity = {
+            "command": config.get("command", "npx"),
+            "args": list(config.get("args", [])),
+            "env": dict(config.get("env", {})),
+            "cwd": config.get("cwd")
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+    
+    async def _keep_running(self, pooled: PooledServer):
+        """Own the server context for its whole life so it is entered and exited in one task"""
+        try:
+            async with pooled.server:
+                pooled.ready.set()
+                await pooled.stop.wait()
+        except BaseException as e:
+            pooled.error = e
+            pooled.ready.set()
+            if not isinstance(e, Exception):
+                raise
+    
+    async def _start(self, key: str, factory: Callable[[], MCPServerStdio]) -> PooledServer:
+        pooled = PooledServer(key=key, server=factory())
+        self._watch_notifications(key, pooled.server)
+        pooled.task = asyncio.create_task(self._keep_running(pooled))
+        try:
+            await asyncio.wait_for(pooled.ready.wait(), self.start_timeout)
+        except asyncio.TimeoutError:
+            self._stop_in_background(pooled)
+            raise TimeoutError(f"MCP server did not start within {self.start_timeout}s")
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. a connect timeout); don't leave a half-started process
+            self._stop_in_background(pooled)
+            raise
+        if pooled.error is not None:
+            raise pooled.error
+        self.starts += 1
+        return pooled
+    
+    async def _stop(self, pooled: PooledServer, cancel: bool = False):
+        pooled.stop.set()
+        if pooled.task is not None:
+            if cancel:
+                pooled.task.cancel()
+            try:
+                await asyncio.shield(pooled.task)
+            except asyncio.CancelledError:
+                if not pooled.task.cancelled():
+                    raise
+            except Exception as e:
+                logger.warning("Error stopping MCP server: %s", e)
+        if self._servers.get(pooled.key) is pooled:
+            del self._servers[pooled.key]
+        self._by_server.pop(id(pooled.server), None)
+    
+    def _stop_in_background(self, pooled: PooledServer):
+        """Cancel a server that failed to start without making the caller wait for its shutdown"""
+        task = asyncio.ensure_future(self._stop(pooled, cancel=True))
+        self._stopping.add(task)
+        task.add_done_callback(self._stopping.discard)
+    
+    async def health_check(self, server: MCPServerStdio) -> bool:
+        """Check a running server answers a tools/list request"""
+        try:
+            await asyncio.wait_for(server.list_tools(), self.health_check_timeout)
+            return True
+        except Exception:
+            return False
+    
+    async def checkout(
+        self,
+        config: Dict[str, Any],
+        factory: Callable[[], MCPServerStdio],
+        key: Optional[str] = None
+    ) -> MCPServerStdio:
+        """
+        Lease a running server for a configuration, starting one if needed
+        
+        Args:
+            config: Server configuration (used as the pool key)
+            factory: Builds a new server instance for the configuration
+            key: Pool key overriding the config hash, to run several
+                processes of one configuration side by side
+                
+        Returns:
+            Running MCPServerStdio; return it with checkin()
+        """
+        self._check_loop()
+        key = key or self.config_key(config)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            pooled = self._servers.get(key)
+            if pooled is not None:
+                stale = time.monotonic() - pooled.last_checked > self.health_check_interval
+                if pooled.task.done() or (stale and not await self.health_check(pooled.server)):
+                    await self._stop(pooled)
+                    pooled = None
+                else:
+                    pooled.last_checked = time.monotonic()
+                    self.reuses += 1
+            
+            if pooled is None:
+                pooled = await self._start(key, factory)
+                self._servers[key] = pooled
+                self._by_server[id(pooled.server)] = pooled
+            
+            pooled.leases += 1
+            pooled.last_used = time.monotonic()
+        
+        self._ensure_reaper()
+        return pooled.server
+    
+    def is_alive(self, server: MCPServerStdio) -> bool:
+        """Whether a server handed out by the pool is still running"""
+        pooled = self._by_server.get(id(server))
+        return pooled is not None and not pooled.task.done()
+    
+    async def checkin(self, server: MCPServerStdio):
+        """Return a leased server to the pool"""
+        pooled = self._by_server.get(id(server))
+        if pooled is not None and pooled.leases > 0:
+            pooled.leases -= 1
+            pooled.last_used = time.monotonic()
+    
+    @asynccontextmanager
+    async def lease(
+        self,
+        config: Dict[str, Any],
+        factory: Callable[[], MCPServerStdio]
+    ) -> AsyncIterator[MCPServerStdio]:
+        """Context manager around checkout() and checkin()"""
+        server = await self.checkout(config, factory)
+        try:
+            yield server
+        finally:
+            await self.checkin(server)
+    
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+    
+    async def _reap_idle(self):
+        """Stop servers that have had no leases for idle_timeout seconds"""
+        while self._servers:
+            await asyncio.sleep(min(self.idle_timeout, self.health_check_interval) / 2)
+            now = time.monotonic()
+            for pooled in list(self._servers.values()):
+                if pooled.leases == 0 and now - pooled.last_used > self.idle_timeout:
+                    await self._stop(pooled)
+    
+    async def close(self):
+        """Stop every pooled server"""
+        self._check_loop()
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for pooled in list(self._servers.values()):
+            await self._stop(pooled)
+        if self._stopping:
+            await asyncio.gather(*self._stopping, return_exceptions=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get pool counters"""
+        return {
+            "running": len(self._servers),
+            "leased": sum(1 for pooled in self._servers.values() if pooled.leases),
+            "starts": self.starts,
+            "reuses": self.reuses
+        }
+
+
+@dataclass
+class CatalogEntry:
+    """Tools discovered from one server configuration"""
+    server_name: str
+    tools: List[Dict[str, Any]]
+    fetched_at: float
+
+
+class ToolCatalog:
+    """
+    In-memory index of MCP tool schemas keyed by server config hash
+    
+    Entries expire after ttl seconds or when the server sends a
+    notifications/tools/list_changed notification.
+    """
+    
+    def __init__(self, ttl: float = 600.0):
+        """
+        Initialize the catalog
+        
+        Args:
+            ttl: Seconds a discovered tool list stays valid
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._tool_index: Dict[str, List[Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+    
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        """Get an unexpired entry for a config hash"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.fetched_at > self.ttl:
+            self.invalidate(key)
+            return None
+        return entry
+    
+    def put(self, key: str, server_name: str, tools: List[Dict[str, Any]]):
+        """Store the tools discovered for a config hash"""
+        self.invalidate(key)
+        self._entries[key] = CatalogEntry(server_name, tools, time.monotonic())
+        for tool in tools:
+            self._tool_index.setdefault(tool["name"], []).append(
+                {"server": server_name, "key": key, **tool}
+            )
+    
+    def invalidate(self, key: str):
+        """Drop the tools of a config hash"""
+        if self._entries.pop(key, None) is None:
+            return
+        for name in list(self._tool_index):
+            remaining = [tool for tool in self._tool_index[name] if tool["key"] != key]
+            if remaining:
+                self._tool_index[name] = remaining
+            else:
+                del self._tool_index[name]
+    
+    def find_tool(self, tool_name: str) -> List[Dict[str, Any]]:
+        """Get every cached server tool with a given name"""
+        return list(self._tool_index.get(tool_name, []))
+    
+    def all_tools(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the cached tools of every server, by server name"""
+        return {
+            entry.server_name: entry.tools
+            for key, entry in list(self._entries.items())
+            if self.get(key) is not None
+        }
+    
+    async def get_or_discover(
+        self,
+        key: str,
+        server_name: str,
+        discover: Callable[[], Awaitable[List[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Get cached tools, running one discovery per config hash on a miss
+        
+        Args:
+            key: Server config hash
+            server_name: Name of the server
+            discover: Coroutine function listing the server's tools
+            
+        Returns:
+            List of tool information
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry.tools
+        
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            # Another caller may have finished discovery while we waited
+            entry = self.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.tools
+            self.misses += 1
+            tools = await discover()
+            self.put(key, server_name, tools)
+            return tools
+
+
+class ToolResultCache:
+    """
+    Opt-in LRU cache of MCP tool results for idempotent (read-only) tools
+    
+    Only tools on the allowlist are cached. Entries are keyed by server
+    route, tool name and canonical JSON arguments; failed calls are never
+    cached, and concurrent identical calls share one upstream request.
+    """
+    
+    def __init__(
+        self,
+        cacheable: Optional[Dict[str, Union[List[str], Dict[str, float]]]] = None,
+        default_ttl: float = 300.0,
+        max_entries: int = 10000
+    ):
+        """
+        Initialize the cache
+        
+        Args:
+            cacheable: Server name -> tool names (using default_ttl) or
+                tool name -> TTL seconds
+            default_ttl: TTL for tools listed without one
+            max_entries: Maximum cached results
+        """
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._ttls: Dict[Tuple[str, str], float] = {}
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        for server_name, tools in (cacheable or {}).items():
+            if isinstance(tools, dict):
+                for tool_name, ttl in tools.items():
+                    self.allow(server_name, tool_name, ttl)
+            else:
+                for tool_name in tools:
+                    self.allow(server_name, tool_name)
+    
+    def allow(self, server_name: str, tool_name: str, ttl: Optional[float] = None):
+        """Mark a tool as safe to cache"""
+        self._ttls[(server_name, tool_name)] = self.default_ttl if ttl is None else ttl
+    
+    def ttl_for(self, server_name: str, tool_name: str) -> Optional[float]:
+        """TTL of a cacheable tool, or None when the tool is not cacheable"""
+        return self._ttls.get((server_name, tool_name))
+    
+    @staticmethod
+    def make_key(route: str, tool_name: str, arguments: Dict[str, Any]) -> str:
+        # A JSON array keeps the parts apart whatever characters they contain
+        canonical = json.dumps([route, tool_name, arguments], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    async def get_or_call(
+        self,
+        server_name: str,
+        route: str,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return a cached result or make the call and cache its result
+        
+        Args:
+            server_name: Name of the server (used for the allowlist)
+            route: Server config hash and tenant the call is routed to
+            tool_name: Name of the tool
+            arguments: Tool arguments
+            call: Coroutine function making the real tool call
+            
+        Returns:
+            Tool result
+        """
+        ttl = self.ttl_for(server_name, tool_name)
+        if not ttl:
+            self.bypassed += 1
+            return await call()
+        
+        key = self.make_key(route, tool_name, arguments)
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+            
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The caller making the shared call was cancelled, not us:
+                # look again and make the call ourselves
+                if pending.cancelled():
+                    continue
+                raise
+            self.hits += 1
+            return result
+        
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            self._entries[key] = (time.monotonic() + ttl, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return result
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+    
+    def clear(self):
+        """Drop every cached result"""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def _server_notification(message: Any) -> Optional[mcp_types.ServerNotification]:
+    """Parse a transport message into a server notification (None for anything else)"""
+    if not isinstance(message, SessionMessage):
+        return None
+    root = message.message.root
+    if not isinstance(root, mcp_types.JSONRPCNotification):
+        return None
+    try:
+        return mcp_types.ServerNotification.model_validate(
+            root.model_dump(by_alias=True, mode="json", exclude_none=True)
+        )
+    except ValidationError:
+        return None
+
+
+class CachingMCPServerStdio(MCPServerStdio):
+    """MCPServerStdio that answers allowlisted tool calls from a ToolResultCache"""
+    
+    def set_message_handler(
+        self,
+        handler: Optional[Callable[[mcp_types.ServerNotification], Awaitable[None]]]
+    ) -> "CachingMCPServerStdio":
+        """
+        Receive the server's notifications, like ClientSession's message_handler
+        
+        pydantic_ai creates the ClientSession itself without a message_handler,
+        so notifications are read off the transport in client_streams().
+        Takes effect the next time the server is started.
+        """
+        self._message_handler = handler
+        return self
+    
+    @asynccontextmanager
+    async def client_streams(self) -> AsyncIterator[Tuple[Any, Any]]:
+        handler = getattr(self, '_message_handler', None)
+        async with super().client_streams() as (read_stream, write_stream):
+            if handler is None:
+                yield read_stream, write_stream
+                return
+            
+            send_stream, receive_stream = anyio.create_memory_object_stream(0)
+            
+            async def forward():
+                async with send_stream:
+                    async for message in read_stream:
+                        notification = _server_notification(message)
+                        if notification is not None:
+                            try:
+                                await handler(notification)
+                            except Exception:
+                                logger.exception("MCP message handler failed")
+                        try:
+                            await send_stream.send(message)
+                        except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+                            return
+            
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(forward)
+                try:
+                    yield receive_stream, write_stream
+                finally:
+                    task_group.cancel_scope.cancel()
+    
+    def enable_telemetry(self, telemetry: Any, server_name: str) -> "CachingMCPServerStdio":
+        """Record spans for this server's start and tool calls"""
+        self._telemetry = telemetry
+        self._telemetry_labels = {"server": server_name}
+        return self
+    
+    async def __aenter__(self) -> "CachingMCPServerStdio":
+        telemetry = getattr(self, '_telemetry', None)
+        if telemetry is None or self.is_running:
+            return await super().__aenter__()
+        with telemetry.span("mcp_server_start", self._telemetry_labels):
+            return await super().__aenter__()
+    
+    def enable_result_cache(
+        self,
+        cache: ToolResultCache,
+        server_name: str,
+        route: str
+    ) -> "CachingMCPServerStdio":
+        """Attach the cache and the identity its entries are keyed by"""
+        self._result_cache = cache
+        self._cache_server_name = server_name
+        self._cache_route = route
+        return self
+    
+    async def _call_through_cache(
+        self,
+        name: str,
+        args: Dict[str, Any],
+        call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        cache = getattr(self, '_result_cache', None)
+        if cache is None:
+            return await call()
+        return await cache.get_or_call(self._cache_server_name, self._cache_route, name, args, call)
+    
+    async def direct_call_tool(
+        self,
+        name: str,
+        args: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        call = lambda: super(CachingMCPServerStdio, self).direct_call_tool(name, args, metadata)
+        telemetry = getattr(self, '_telemetry', None)
+        if telemetry is None:
+            return await self._call_through_cache(name, args, call)
+        with telemetry.span("mcp_call", {**self._telemetry_labels, "tool": name}):
+            return await self._call_through_cache(name, args, call)
+
+
+class MCPBackpressureError(RuntimeError):
+    """Raised when too many calls are already waiting for a multiplexed session"""
+
+
+@dataclass
+class MultiplexedSession:
+    """One shared server process and the calls currently running on it"""
+    server: MCPServerStdio
+    in_flight: int = 0
+    calls: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class SessionGroup:
+    """Sessions serving one (server configuration, tenant) route"""
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+    sessions: List[MultiplexedSession] = field(default_factory=list)
+    starting: int = 0
+    waiting: int = 0
+    next_index: int = 0
+
+
+class MCPSessionMultiplexer:
+    """
+    Routes MCP calls from many agents over a few shared stdio sessions
+    
+    The MCP client session demultiplexes responses by JSON-RPC request id, so
+    one subprocess can serve many concurrent calls. Each route (server config
+    plus tenant) gets up to max_sessions processes from the MCPServerPool;
+    calls go to the least busy session, a new session is started when all are
+    at max_in_flight, and further callers wait in a bounded queue
+    (backpressure). Tenants never share a process, so per-tenant environment
+    variables stay isolated. A background task returns the leases of
+    sessions idle for idle_timeout, the last session of a route included.
+    """
+    
+    def __init__(
+        self,
+        pool: MCPServerPool,
+        max_sessions: int = 4,
+        max_in_flight: int = 32,
+        max_waiting: int = 1000,
+        acquire_timeout: float = 30.0,
+        idle_timeout: float = 300.0
+    ):
+        """
+        Initialize the multiplexer
+        
+        Args:
+            pool: Pool the session processes are leased from
+            max_sessions: Processes per route
+            max_in_flight: Concurrent calls per process
+            max_waiting: Callers allowed to queue per route before MCPBackpressureError
+            acquire_timeout: Seconds a caller waits for a free session
+            idle_timeout: Seconds an unused session is kept before its lease is returned
+        """
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self._groups: Dict[str, SessionGroup] = {}
+        self._reaper: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def route_for(config: Dict[str, Any], tenant: Optional[str] = None) -> str:
+        """Route key for a server configuration and tenant"""
+        return f"{MCPServerPool.config_key(config)}:{tenant or ''}"
+    
+    async def _acquire(
+        self,
+        route: str,
+        config: Dict[str, Any],
+        factory: Callable[[], MCPServerStdio]
+    ) -> Tuple[SessionGroup, MultiplexedSession]:
+        """Reserve a call slot, starting a new session when every session is busy"""
+        self._ensure_reaper()
+        group = self._groups.setdefault(route, SessionGroup())
+        deadline = time.monotonic() + self.acquire_timeout
+        
+        async with group.condition:
+            while True:
+                group.sessions = [
+                    session for session in group.sessions
+                    if self.pool.is_alive(session.server)
+                ]
+                available = [
+                    session for session in group.sessions
+                    if session.in_flight < self.max_in_flight
+                ]
+                if available:
+                    session = min(available, key=lambda session: session.in_flight)
+                    session.in_flight += 1
+                    return group, session
+                
+                if len(group.sessions) + group.starting < self.max_sessions:
+                    group.starting += 1
+                    index = group.next_index
+                    group.next_index += 1
+                    break
+                
+                if group.waiting >= self.max_waiting:
+                    raise MCPBackpressureError(
+                        f"{group.waiting} calls already waiting for an MCP session"
+                    )
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No MCP session available within {self.acquire_timeout}s")
+                group.waiting += 1
+                try:
+                    await asyncio.wait_for(group.condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    group.waiting -= 1
+        
+        # Start the session outside the lock so busy sessions keep serving
+        try:
+            server = await self.pool.checkout(config, factory, key=f"{route}:{index}")
+        except BaseException:
+            async with group.condition:
+                group.starting -= 1
+                group.condition.notify()
+            raise
+        
+        session = MultiplexedSession(server, in_flight=1)
+        async with group.condition:
+            group.starting -= 1
+            group.sessions.append(session)
+            group.condition.notify_all()
+        return group, session
+    
+    async def _release(self, group: SessionGroup, session: MultiplexedSession):
+        async with group.condition:
+            session.in_flight -= 1
+            session.calls += 1
+            session.last_used = time.monotonic()
+            group.condition.notify()
+    
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+    
+    async def _reap_idle(self):
+        """Return the leases of sessions idle for idle_timeout and forget empty routes"""
+        while self._groups:
+            await asyncio.sleep(self.idle_timeout / 2)
+            now = time.monotonic()
+            expired = []
+            # No await between the checks and the removals: a caller part-way
+            # through _acquire is always counted in in_flight, starting or waiting
+            for route, group in list(self._groups.items()):
+                idle = [
+                    session for session in group.sessions
+                    if session.in_flight == 0 and now - session.last_used > self.idle_timeout
+                ]
+                for session in idle:
+                    group.sessions.remove(session)
+                expired.extend(idle)
+                if not group.sessions and not group.starting and not group.waiting:
+                    del self._groups[route]
+            for session in expired:
+                await self.pool.checkin(session.server)
+    
+    async def run(
+        self,
+        config: Dict[str, Any],
+        factory: Callable[[], MCPServerStdio],
+        operation: Callable[[MCPServerStdio], Awaitable[Any]],
+        tenant: Optional[str] = None
+    ) -> Any:
+        """
+        Run an operation against a shared session of a route
+        
+        Args:
+            config: Server configuration
+            factory: Builds a new server instance for the configuration
+            operation: Coroutine function receiving the running server
+            tenant: Tenant the call belongs to
+            
+        Returns:
+            Result of the operation
+        """
+        group, session = await self._acquire(self.route_for(config, tenant), config, factory)
+        try:
+            return await operation(session.server)
+        finally:
+            await self._release(group, session)
+    
+    async def close(self):
+        """Return every session lease to the pool"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for group in self._groups.values():
+            for session in group.sessions:
+                await self.pool.checkin(session.server)
+            group.sessions.clear()
+        self._groups.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get per-route session counters"""
+        return {
+            route: {
+                "sessions": len(group.sessions),
+                "in_flight": sum(session.in_flight for session in group.sessions),
+                "waiting": group.waiting,
+                "calls": sum(session.calls for session in group.sessions)
+            }
+            for route, group in self._groups.items()
+        }
+
+
+class MultiplexedMCPServer(CachingMCPServerStdio):
+    """
+    MCPServerStdio stand-in that sends its requests through an
+    MCPSessionMultiplexer instead of owning a subprocess
+    
+    Add it to an agent like any MCP server; entering it does not start a process.
+    """
+    
+    def bind(
+        self,
+        multiplexer: MCPSessionMultiplexer,
+        config: Dict[str, Any],
+        factory: Callable[[], MCPServerStdio],
+        tenant: Optional[str] = None
+    ) -> "MultiplexedMCPServer":
+        """Attach the multiplexer route this server forwards to"""
+        self._multiplexer = multiplexer
+        self._route_config = config
+        self._route_factory = factory
+        self._tenant = tenant
+        return self
+    
+    async def __aenter__(self) -> "MultiplexedMCPServer":
+        return self
+    
+    async def __aexit__(self, *args: Any) -> Optional[bool]:
+        return None
+    
+    @property
+    def is_running(self) -> bool:
+        return True
+    
+    async def _run(self, operation: Callable[[MCPServerStdio], Awaitable[Any]]) -> Any:
+        return await self._multiplexer.run(
+            self._route_config, self._route_factory, operation, self._tenant
+        )
+    
+    async def list_tools(self) -> List[Any]:
+        return await self._run(lambda server: server.list_tools())
+    
+    async def direct_call_tool(
+        self,
+        name: str,
+        args: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        return await self._call_through_cache(
+            name, args, lambda: self._run(lambda server: server.direct_call_tool(name, args, metadata))
+        )
+
+
+class ServerDefinition:
+    """A validated, read-only MCP server configuration"""
+    
+    def __init__(self, name: str, config: Mapping[str, Any], base_env: Mapping[str, str]):
+        self.name = name
+        self.config = self.freeze(config)
+        self._base_env = base_env
+        self._environment: Optional[Dict[str, str]] = None
+    
+    @staticmethod
+    def freeze(config: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Read-only copy of a configuration with args as a tuple and env as a mapping proxy"""
+        return MappingProxyType({
+            **config,
+            "args": tuple(config.get("args", [])),
+            "env": MappingProxyType(dict(config.get("env", {})))
+        })
+    
+    @property
+    def environment(self) -> Dict[str, str]:
+        """Process environment for the server, resolved once on first use"""
+        if self._environment is None:
+            self._environment = {**self._base_env, **self.config["env"]}
+        return self._environment
+
+
+class MCPServerRegistry:
+    """
+    Index of MCP server configurations: the built-in defaults plus a custom
+    config file
+    
+    The file is read lazily on first lookup and re-read only when its mtime
+    or size changes (checked at most every reload_interval seconds).
+    Definitions are validated on load, invalid ones are skipped and reported
+    in errors, and each server's environment is merged with os.environ once
+    rather than on every server start.
+    """
+    
+    def __init__(
+        self,
+        defaults: Dict[str, Dict[str, Any]],
+        config_path: Optional[str] = None,
+        reload_interval: float = 2.0
+    ):
+        """
+        Initialize the registry
+        
+        Args:
+            defaults: Built-in server configurations
+            config_path: Path to a JSON file of custom server configurations
+            reload_interval: Minimum seconds between checks of the config file
+        """
+        self.defaults = defaults
+        self.config_path = config_path
+        self.reload_interval = reload_interval
+        self.errors: Dict[str, str] = {}
+        self.loads = 0
+        self._base_env = MappingProxyType(os.environ.copy())
+        self._definitions: Dict[str, ServerDefinition] = {}
+        self._custom_names: Tuple[str, ...] = ()
+        self._view: Mapping[str, Mapping[str, Any]] = MappingProxyType({})
+        self._file_state: Optional[Tuple[int, int]] = None
+        self._loaded = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def validate(config: Any) -> Optional[str]:
+        """
+        Check a server configuration
+        
+        Args:
+            config: Configuration to check
+            
+        Returns:
+            Description of the first problem found, or None when valid
+        """
+        if not isinstance(config, dict):
+            return "configuration must be an object"
+        command = config.get("command", "npx")
+        if not isinstance(command, str) or not command:
+            return "command must be a non-empty string"
+        args = config.get("args", [])
+        if not isinstance(args, (list, tuple)) or not all(isinstance(arg, str) for arg in args):
+            return "args must be a list of strings"
+        env = config.get("env", {})
+        if not isinstance(env, dict) or not all(
+            isinstance(key, str) and isinstance(value, str) for key, value in env.items()
+        ):
+            return "env must map strings to strings"
+        cwd = config.get("cwd")
+        if cwd is not None and not isinstance(cwd, str):
+            return "cwd must be a string"
+        return None
+    
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _read_custom(self) -> Dict[str, Any]:
+        """Read the custom config file, keeping the previous configs if it is unreadable"""
+        try:
+            with open(self.config_path, 'r') as f:
+                configs = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Error loading custom configs from %s: %s", self.config_path, e)
+            return {
+                name: {**config, "args": list(config["args"]), "env": dict(config["env"])}
+                for name, config in ((name, self._definitions[name].config) for name in self._custom_names)
+            }
+        if not isinstance(configs, dict):
+            logger.warning("Custom configs in %s must be a JSON object", self.config_path)
+            return {}
+        return configs
+    
+    def _load(self, file_state: Optional[Tuple[int, int]]):
+        custom = self._read_custom() if self.config_path and file_state else {}
+        
+        definitions: Dict[str, ServerDefinition] = {}
+        errors: Dict[str, str] = {}
+        for name, config in {**self.defaults, **custom}.items():
+            error = self.validate(config)
+            if error:
+                errors[name] = error
+                logger.warning("Skipping MCP server %s: %s", name, error)
+                continue
+            
+            frozen = ServerDefinition.freeze(config)
+            previous = self._definitions.get(name)
+            if previous is not None and frozen == previous.config:
+                # Unchanged definitions keep their resolved environment
+                definitions[name] = previous
+                continue
+            definitions[name] = ServerDefinition(name, frozen, self._base_env)
+        
+        self._definitions = definitions
+        self._custom_names = tuple(name for name in custom if name in definitions)
+        self._view = MappingProxyType({name: d.config for name, d in definitions.items()})
+        self.errors = errors
+        self._file_state = file_state
+        self._loaded = True
+        self.loads += 1
+    
+    def _ensure_current(self):
+        """Load on first use and reload when the config file has changed"""
+        now = time.monotonic()
+        if self._loaded and (not self.config_path or now < self._next_check):
+            return
+        
+        with self._lock:
+            if self._loaded and now < self._next_check:
+                return
+            file_state = self._stat() if self.config_path else None
+            if not self._loaded or file_state != self._file_state:
+                self._load(file_state)
+            self._next_check = now + self.reload_interval
+    
+    def reload(self):
+        """Re-read the config file and refresh os.environ on the next lookup"""
+        with self._lock:
+            self._base_env = MappingProxyType(os.environ.copy())
+            self._definitions = {}
+            self._loaded = False
+    
+    def get(self, server_name: str) -> Optional[ServerDefinition]:
+        """Get a server definition by name"""
+        self._ensure_current()
+        return self._definitions.get(server_name)
+    
+    def __contains__(self, server_name: str) -> bool:
+        return self.get(server_name) is not None
+    
+    def configs(self) -> Mapping[str, Mapping[str, Any]]:
+        """Read-only view of every valid server configuration by name"""
+        self._ensure_current()
+        return self._view
+    
+    def custom_configs(self) -> Mapping[str, Mapping[str, Any]]:
+        """Read-only view of the configurations loaded from the config file"""
+        self._ensure_current()
+        return MappingProxyType({name: self._view[name] for name in self._custom_names})
+    
+    @property
+    def base_environment(self) -> Mapping[str, str]:
+        """Snapshot of os.environ that server environments are layered on"""
+        return self._base_env
+
+
+@dataclass
+class ServerStatus:
+    """Outcome of starting and health-checking one MCP server"""
+    name: str
+    connected: bool
+    elapsed: float
+    tool_count: Optional[int] = None
+    error: Optional[str] = None
+
 
 class MCPIntegrationHelper:
     """Helper class for integrating Pydantic AI agents with MCP servers"""
@@ -60,39 +1229,62 @@ class MCPIntegrationHelper:
         }
     }
     
-    def __init__(self, config_path: Optional[str] = None):
+    # Warm server processes and discovered tools shared by every helper in the process
+    shared_pool = MCPServerPool()
+    shared_catalog = ToolCatalog()
+    
+    # Compiled templates shared by every helper in the process
+    template_engine = TemplateEngine()
+    
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        server_pool: Optional[MCPServerPool] = None,
+        tool_catalog: Optional[ToolCatalog] = None,
+        multiplexer: Optional[MCPSessionMultiplexer] = None,
+        result_cache: Optional[ToolResultCache] = None,
+        registry: Optional[MCPServerRegistry] = None,
+        telemetry: Optional[Any] = None
+    ):
         """
         Initialize MCP Integration Helper
         
         Args:
             config_path: Path to custom MCP configuration file
+            server_pool: Pool of running servers (defaults to the shared pool)
+            tool_catalog: Cache of discovered tools (defaults to the shared catalog)
+            multiplexer: Router sharing server sessions between agents
+            result_cache: Cache for allowlisted idempotent tool calls (disabled by default)
+            registry: Server configurations to use instead of the defaults
+                plus config_path
+            telemetry: Records spans for server starts and tool calls of the
+                servers this helper creates (disabled by default)
         """
         self.config_path = config_path
-        self.custom_configs = self._load_custom_configs() if config_path else {}
+        self.registry = registry or MCPServerRegistry(self.DEFAULT_MCP_CONFIGS, config_path)
+        self.server_pool = server_pool or self.shared_pool
+        self.tool_catalog = tool_catalog or self.shared_catalog
+        self.multiplexer = multiplexer or MCPSessionMultiplexer(self.server_pool)
+        self.result_cache = result_cache
+        self.telemetry = telemetry
+        self.server_pool.on_tool_list_changed(self.tool_catalog.invalidate)
         self.active_servers: Dict[str, MCPServerStdio] = {}
+        self.last_connection_report: Dict[str, ServerStatus] = {}
     
-    def _load_custom_configs(self) -> Dict[str, Dict[str, Any]]:
-        """Load custom MCP server configurations from file"""
-        if not self.config_path or not os.path.exists(self.config_path):
-            return {}
-        
-        try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading custom configs: {e}")
-            return {}
+    @property
+    def custom_configs(self) -> Mapping[str, Mapping[str, Any]]:
+        """Custom MCP server configurations loaded from config_path"""
+        return self.registry.custom_configs()
     
-    def get_available_servers(self) -> Dict[str, Dict[str, Any]]:
-        """Get all available MCP server configurations"""
-        available_servers = self.DEFAULT_MCP_CONFIGS.copy()
-        available_servers.update(self.custom_configs)
-        return available_servers
+    def get_available_servers(self) -> Mapping[str, Mapping[str, Any]]:
+        """Get a read-only view of all available MCP server configurations"""
+        return self.registry.configs()
     
     def create_server(
         self, 
         server_name: str, 
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        cache_results: bool = True
     ) -> MCPServerStdio:
         """
         Create an MCP server instance
@@ -100,83 +1292,321 @@ class MCPIntegrationHelper:
         Args:
             server_name: Name of the server to create
             config: Custom configuration override
-            
+            cache_results: Answer allowlisted tool calls from result_cache
+                when one is configured
+                
         Returns:
             MCPServerStdio instance
         """
+        definition = self.registry.get(server_name)
         if config is None:
-            all_configs = self.get_available_servers()
-            if server_name not in all_configs:
-                raise ValueError(f"Unknown server: {server_name}")
-            config = all_configs[server_name]
+            config = self._resolve_config(server_name)
         
         command = config.get("command", "npx")
-        args = config.get("args", [])
-        env = config.get("env", {})
+        args = list(config.get("args", []))
         
-        # Merge with current environment
-        full_env = os.environ.copy()
-        full_env.update(env)
+        # Registry definitions carry their environment merged with os.environ
+        if definition is not None and config is definition.config:
+            full_env = definition.environment
+        else:
+            full_env = {**self.registry.base_environment, **config.get("env", {})}
         
-        return MCPServerStdio(command, args, env=full_env)
+        server = CachingMCPServerStdio(command, args, env=full_env, cwd=config.get("cwd"))
+        if self.telemetry is not None:
+            server.enable_telemetry(self.telemetry, server_name)
+        if cache_results and self.result_cache is not None:
+            server.enable_result_cache(
+                self.result_cache, server_name, MCPSessionMultiplexer.route_for(config)
+            )
+        return server
     
-    async def connect_agent_to_servers(
-        self, 
-        agent: Agent, 
-        server_names: List[str]
+    def _resolve_config(self, server_name: str) -> Dict[str, Any]:
+        """Look up the configuration of a named server"""
+        definition = self.registry.get(server_name)
+        if definition is None:
+            raise ValueError(f"Unknown server: {server_name}")
+        return definition.config
+    
+    async def checkout_server(self, server_name: str) -> MCPServerStdio:
+        """
+        Lease a running server from the pool, starting it on first use
+        
+        Args:
+            server_name: Name of the server
+            
+        Returns:
+            Running MCPServerStdio; return it with checkin_server()
+        """
+        config = self._resolve_config(server_name)
+        return await self.server_pool.checkout(
+            config, lambda: self.create_server(server_name, config)
+        )
+    
+    async def checkin_server(self, server: MCPServerStdio):
+        """Return a leased server to the pool"""
+        await self.server_pool.checkin(server)
+    
+    def _tenant_config(
+        self,
+        server_name: str,
+        tenant_env: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Server configuration with a tenant's environment overrides applied"""
+        config = self._resolve_config(server_name)
+        if tenant_env:
+            config = {**config, "env": {**config.get("env", {}), **tenant_env}}
+        return config
+    
+    def create_multiplexed_server(
+        self,
+        server_name: str,
+        tenant: Optional[str] = None,
+        tenant_env: Optional[Dict[str, str]] = None
+    ) -> MultiplexedMCPServer:
+        """
+        Create an MCP server for an agent that shares processes with other
+        agents of the same tenant through the multiplexer
+        
+        Args:
+            server_name: Name of the server
+            tenant: Tenant the agent runs for; tenants never share a process
+            tenant_env: Environment overrides for this tenant's processes
+            
+        Returns:
+            MultiplexedMCPServer to add to the agent
+        """
+        config = self._tenant_config(server_name, tenant_env)
+        proxy = MultiplexedMCPServer(
+            config.get("command", "npx"), list(config.get("args", [])), env=dict(config.get("env", {}))
+        )
+        proxy.bind(
+            self.multiplexer,
+            config,
+            lambda: self.create_server(server_name, config, cache_results=False),
+            tenant
+        )
+        if self.result_cache is not None:
+            proxy.enable_result_cache(
+                self.result_cache, server_name, MCPSessionMultiplexer.route_for(config, tenant)
+            )
+        return proxy
+    
+    async def call_tool(
+        self,
+        server_name: str,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        tenant: Optional[str] = None,
+        tenant_env: Optional[Dict[str, str]] = None
+    ) -> Any:
+        """
+        Call an MCP tool over a multiplexed session
+        
+        Args:
+            server_name: Name of the server
+            tool_name: Name of the tool
+            arguments: Tool arguments
+            tenant: Tenant the call belongs to
+            tenant_env: Environment overrides for this tenant's processes
+            
+        Returns:
+            Tool result
+        """
+        config = self._tenant_config(server_name, tenant_env)
+        
+        async def call() -> Any:
+            return await self.multiplexer.run(
+                config,
+                lambda: self.create_server(server_name, config, cache_results=False),
+                lambda server: server.direct_call_tool(tool_name, arguments),
+                tenant
+            )
+        
+        if self.result_cache is None:
+            return await call()
+        return await self.result_cache.get_or_call(
+            server_name,
+            MCPSessionMultiplexer.route_for(config, tenant),
+            tool_name,
+            arguments,
+            call
+        )
+    
+    @asynccontextmanager
+    async def server_lease(self, server_name: str) -> AsyncIterator[MCPServerStdio]:
+        """Context manager around checkout_server() and checkin_server()"""
+        server = await self.checkout_server(server_name)
+        try:
+            yield server
+        finally:
+            await self.checkin_server(server)
+    
+    async def _connect(
+        self,
+        server_name: str,
+        timeout: float
+    ) -> Tuple[ServerStatus, Optional[MCPServerStdio]]:
+        """Start (or reuse) one server and health-check it with tools/list"""
+        started = time.monotonic()
+        
+        async def connect() -> Tuple[MCPServerStdio, List[Dict[str, Any]]]:
+            server = await self.checkout_server(server_name)
+            try:
+                tools = await self.list_server_tools(server_name, refresh=True)
+            except BaseException:
+                await self.checkin_server(server)
+                raise
+            return server, tools
+        
+        try:
+            server, tools = await asyncio.wait_for(connect(), timeout)
+        except asyncio.TimeoutError:
+            error = f"Timed out after {timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        else:
+            status = ServerStatus(server_name, True, time.monotonic() - started, len(tools))
+            return status, server
+        
+        logger.warning("Failed to connect to %s MCP server: %s", server_name, error)
+        return ServerStatus(server_name, False, time.monotonic() - started, error=error), None
+    
+    async def connect_servers(
+        self,
+        server_names: List[str],
+        timeout: float = 30.0
+    ) -> Dict[str, ServerStatus]:
+        """
+        Start and health-check several MCP servers concurrently, keeping
+        leases on the ones that connect
+        
+        Total time is roughly that of the slowest server. Connected servers
+        are kept in active_servers until release_servers().
+        
+        Args:
+            server_names: List of server names to connect
+            timeout: Per-server seconds allowed for startup and the health check
+            
+        Returns:
+            Status of each server by name
+        """
+        results = await asyncio.gather(
+            *(self._connect(server_name, timeout) for server_name in server_names)
+        )
+        
+        statuses = {}
+        for status, server in results:
+            statuses[status.name] = status
+            if server is None:
+                continue
+            if status.name in self.active_servers:
+                await self.checkin_server(self.active_servers[status.name])
+            self.active_servers[status.name] = server
+        return statuses
+    
+    @property
+    def toolsets(self) -> List[MCPServerStdio]:
+        """Servers leased by connect_servers(), to pass as agent.run(..., toolsets=...)"""
+        return list(self.active_servers.values())
+    
+    async def create_agent(
+        self,
+        model: Any,
+        server_names: List[str],
+        timeout: float = 30.0,
+        **agent_kwargs: Any
     ) -> Agent:
         """
-        Connect a Pydantic AI agent to multiple MCP servers
+        Create a Pydantic AI agent using several MCP servers
+        
+        Servers are started concurrently; the per-server outcome is kept in
+        last_connection_report. Agent takes its toolsets at construction, so
+        an existing agent gets leased servers per run through toolsets instead.
         
         Args:
-            agent: Pydantic AI agent
+            model: Model name or instance for the agent
             server_names: List of server names to connect
+            timeout: Per-server seconds allowed for startup and the health check
+            **agent_kwargs: Other Agent arguments (e.g. system_prompt, tools, toolsets)
             
         Returns:
-            Agent with connected MCP servers
+            Agent with the connected MCP servers as toolsets
         """
-        for server_name in server_names:
-            try:
-                # Create and store server instance
-                server = self.create_server(server_name)
-                self.active_servers[server_name] = server
-                
-                # Add to agent's MCP servers list
-                if not hasattr(agent, 'mcp_servers'):
-                    agent.mcp_servers = []
-                agent.mcp_servers.append(server)
-                
-                print(f"Successfully connected to {server_name} MCP server")
-            except Exception as e:
-                print(f"Failed to connect to {server_name}: {e}")
+        self.last_connection_report = await self.connect_servers(server_names, timeout)
+        connected = [
+            self.active_servers[server_name]
+            for server_name, status in self.last_connection_report.items()
+            if status.connected
+        ]
+        toolsets = [*(agent_kwargs.pop('toolsets', None) or []), *connected]
+        return Agent(model, toolsets=toolsets, **agent_kwargs)
+    
+    async def connect_agent_to_servers(self, agent: Agent, server_names: List[str]) -> Agent:
+        """
+        Lease MCP servers for an existing agent (deprecated)
+        
+        Agent takes its toolsets at construction, so the leased servers are
+        not attached to the agent; pass helper.toolsets to agent.run() or
+        build the agent with create_agent() instead.
         
+        Args:
+            agent: Pydantic AI agent
+            server_names: List of server names to connect
+            
+        Returns:
+            The agent, unchanged
+        """
+        warnings.warn(
+            "connect_agent_to_servers() is deprecated; use create_agent() or pass "
+            "helper.toolsets to agent.run(..., toolsets=...)",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        self.last_connection_report = await self.connect_servers(server_names)
         return agent
     
-    async def list_server_tools(self, server_name: str) -> List[Dict[str, Any]]:
+    async def release_servers(self):
+        """Return every server leased by connect_servers or create_agent to the pool"""
+        for server in self.active_servers.values():
+            await self.checkin_server(server)
+        self.active_servers.clear()
+    
+    async def list_server_tools(
+        self,
+        server_name: str,
+        refresh: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         List all tools available from a specific MCP server
         
+        Tools are discovered with tools/list and cached in the tool catalog
+        per server configuration.
+        
         Args:
             server_name: Name of the server
+            refresh: Ignore any cached tool list
             
         Returns:
             List of tool information
         """
-        if server_name not in self.active_servers:
-            server = self.create_server(server_name)
-            self.active_servers[server_name] = server
-        else:
-            server = self.active_servers[server_name]
-        
-        # This would require implementing the MCP protocol
-        # For now, return a placeholder
-        return [
-            {
-                "name": f"{server_name}_tool",
-                "description": f"Tool from {server_name} server",
-                "parameters": {}
-            }
-        ]
+        config = self._resolve_config(server_name)
+        key = self.server_pool.config_key(config)
+        if refresh:
+            self.tool_catalog.invalidate(key)
+        
+        async def discover() -> List[Dict[str, Any]]:
+            async with self.server_lease(server_name) as server:
+                tools = await server.list_tools()
+            return [
+                {
+                    "name": tool.name,
+                    "description": tool.description or "",
+                    "parameters": tool.inputSchema
+                }
+                for tool in tools
+            ]
+        
+        return await self.tool_catalog.get_or_discover(key, server_name, discover)
     
     def save_agent_mcp_config(
         self, 
@@ -217,24 +1647,87 @@ class MCPIntegrationHelper:
         with open(config_file, 'r') as f:
             return json.load(f)
     
-    async def test_connection(self, server_name: str) -> bool:
+    async def test_connections(
+        self,
+        server_names: List[str],
+        timeout: float = 30.0
+    ) -> Dict[str, ServerStatus]:
+        """
+        Test connections to several MCP servers concurrently
+        
+        Each server is started (or reused from the pool) and must answer
+        tools/list within the timeout.
+        
+        Args:
+            server_names: Names of the servers to test
+            timeout: Per-server seconds allowed for startup and the health check
+            
+        Returns:
+            Status of each server by name
+        """
+        results = await asyncio.gather(
+            *(self._connect(server_name, timeout) for server_name in server_names)
+        )
+        statuses = {}
+        for status, server in results:
+            if server is not None:
+                await self.checkin_server(server)
+            statuses[status.name] = status
+        return statuses
+    
+    async def test_connection(self, server_name: str, timeout: float = 30.0) -> bool:
         """
         Test connection to an MCP server
         
         Args:
             server_name: Name of the server to test
+            timeout: Seconds allowed for startup and the health check
             
         Returns:
             True if connection successful
         """
-        try:
-            server = self.create_server(server_name)
-            # Here you would implement actual connection test
-            # For now, return True as placeholder
-            return True
-        except Exception as e:
-            print(f"Connection test failed for {server_name}: {e}")
-            return False
+        statuses = await self.test_connections([server_name], timeout)
+        return statuses[server_name].connected
+    
+    def _integration_template(
+        self,
+        agent_name: str,
+        server_names: List[str],
+        template_path: Optional[str] = None
+    ) -> Tuple[CompiledTemplate, Dict[str, Any]]:
+        """Compiled agent template and render context for generate_mcp_integration_code"""
+        if template_path and os.path.exists(template_path):
+            template = self.template_engine.load(template_path)
+        else:
+            template = self.template_engine.from_string(DEFAULT_AGENT_TEMPLATE, "default_agent_template")
+        if os.path.exists(BASIC_AGENT_TEMPLATE_PATH):
+            self.template_engine.load_partials_from(BASIC_AGENT_TEMPLATE_PATH)
+        
+        # Generate MCP connection code
+        server_template = self.template_engine.from_string(MCP_SERVER_TEMPLATE, "mcp_server_template")
+        mcp_connections = []
+        for server_name in server_names:
+            config = self._resolve_config(server_name)
+            env_keys = list(config.get("env", {}))
+            env = "None"
+            if env_keys:
+                env_lines = "".join(f"        {key!r}: os.getenv({key!r}, ''),\n" for key in env_keys)
+                env = "{\n" + env_lines + "    }"
+            mcp_connections.append(self.template_engine.render(server_template, {
+                "server_name": server_name,
+                "server_var": f"{python_identifier(server_name)}_server",
+                "command": config.get("command", "npx"),
+                "args": list(config.get("args", [])),
+                "env": env
+            }))
+        
+        return template, {
+            "agent_name": agent_name,
+            "class_name": python_identifier("".join(word[:1].upper() + word[1:] for word in agent_name.split())),
+            "agent_var": python_identifier(agent_name.lower()),
+            "server_names": list(server_names),
+            "mcp_connections": "\n".join(mcp_connections)
+        }
     
     def generate_mcp_integration_code(
         self, 
@@ -253,63 +1746,28 @@ class MCPIntegrationHelper:
         Returns:
             Generated code with MCP integration
         """
-        if template_path and os.path.exists(template_path):
-            with open(template_path, 'r') as f:
-                template = f.read()
-        else:
-            # Use default template
-            template = '''
-from pydantic_ai import Agent
-from pydantic_ai.mcp import MCPServerStdio
-from dataclasses import dataclass
-
-@dataclass
-class {agent_name}Deps:
-    api_key: str
-
-# Create agent
-{agent_name.lower()}_agent = Agent(
-    'gpt-4',
-    system_prompt="You are an AI assistant with MCP server integration.",
-    deps_type={agent_name}Deps
-)
-
-# Connect to MCP servers
-mcp_servers = []
-{mcp_connections}
-
-{agent_name.lower()}_agent.mcp_servers = mcp_servers
-
-# Run agent
-if __name__ == "__main__":
-    import asyncio
-    async def main():
-        deps = {agent_name}Deps(api_key="your-api-key")
-        result = await {agent_name.lower()}_agent.run("Hello!", deps=deps)
-        print(result.data)
+        template, context = self._integration_template(agent_name, server_names, template_path)
+        return self.template_engine.render(template, context)
     
-    asyncio.run(main())
-'''
-        
-        # Generate MCP connection code
-        mcp_connections = []
-        for server_name in server_names:
-            server_code = f'''
-# Connect to {server_name}
-{server_name}_server = MCPServerStdio(
-    "{self.DEFAULT_MCP_CONFIGS[server_name]['command']}",
-    {self.DEFAULT_MCP_CONFIGS[server_name]['args']},
-    env={{"DATABASE_URL": "your-database-url"}}  # Configure as needed
-)
-mcp_servers.append({server_name}_server)
-'''
-            mcp_connections.append(server_code)
+    def generate_mcp_integration_code_with_source_map(
+        self,
+        agent_name: str,
+        server_names: List[str],
+        template_path: Optional[str] = None
+    ) -> Tuple[str, SourceMap]:
+        """
+        Generate agent code together with a map from its lines to template lines
         
-        # Format template
-        return template.format(
-            agent_name=agent_name,
-            mcp_connections="\n".join(mcp_connections)
-        )
+        Args:
+            agent_name: Name of the agent
+            server_names: List of MCP servers to integrate
+            template_path: Path to agent template file
+            
+        Returns:
+            Generated code and its SourceMap
+        """
+        template, context = self._integration_template(agent_name, server_names, template_path)
+        return self.template_engine.render_with_source_map(template, context)
 
 
 # Example usage
@@ -317,20 +1775,17 @@ if __name__ == "__main__":
     # Initialize helper
     mcp_helper = MCPIntegrationHelper()
     
-    # Create an agent
-    agent = Agent('gpt-4', system_prompt="Test agent")
-    
     # Connect to MCP servers
     server_names = ["cline", "filesystem", "brave"]
     
     async def main():
-        # Connect agent to servers
-        updated_agent = await mcp_helper.connect_agent_to_servers(agent, server_names)
+        # Create an agent using the servers
+        agent = await mcp_helper.create_agent('gpt-4', server_names, system_prompt="Test agent")
         
-        # Test connections
-        for server in server_names:
-            success = await mcp_helper.test_connection(server)
-            print(f"{server} connection: {'Success' if success else 'Failed'}")
+        # Report connection results
+        for server, status in mcp_helper.last_connection_report.items():
+            result = 'Success' if status.connected else f'Failed ({status.error})'
+            print(f"{server} connection: {result} in {status.elapsed:.2f}s")
         
         # Generate integration code
         code = mcp_helper.generate_mcp_integration_code(
@@ -339,5 +1794,10 @@ if __name__ == "__main__":
         )
         print("\nGenerated code:")
         print(code)
+        
+        # Return leased servers and stop the pool on shutdown
+        await mcp_helper.release_servers()
+        await mcp_helper.multiplexer.close()
+        await mcp_helper.server_pool.close()
     
     asyncio.run(main())
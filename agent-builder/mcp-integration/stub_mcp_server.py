@@ -0,0 +1,153 @@
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Minimal MCP server over stdio for exercising MCPIntegrationHelper locally
+# Speaks newline-delimited JSON-RPC 2.0 with no dependencies beyond the stdlib
+
+PROTOCOL_VERSION = "2025-03-26"
+
+
+def build_tools(count: int) -> List[Dict[str, Any]]:
+    """Build the advertised tool list: echo and add, plus numbered filler tools"""
+    tools = [
+        {
+            "name": "echo",
+            "description": "Echo the given text",
+            "inputSchema": {
+                "type": "object",
+                "properties": {"text": {"type": "string"}},
+                "required": ["text"]
+            }
+        },
+        {
+            "name": "add",
+            "description": "Add two numbers",
+            "inputSchema": {
+                "type": "object",
+                "properties": {"a": {"type": "number"}, "b": {"type": "number"}},
+                "required": ["a", "b"]
+            }
+        }
+    ]
+    for i in range(max(count - len(tools), 0)):
+        tools.append({
+            "name": f"tool_{i}",
+            "description": f"Stub tool number {i}",
+            "inputSchema": {"type": "object", "properties": {}}
+        })
+    return tools
+
+
+# Tool advertised by --mutable servers; calling it adds a tool and sends
+# notifications/tools/list_changed
+ADD_TOOL = {
+    "name": "add_tool",
+    "description": "Advertise a new tool with the given name",
+    "inputSchema": {
+        "type": "object",
+        "properties": {"name": {"type": "string"}},
+        "required": ["name"]
+    }
+}
+
+
+class StubMCPServer:
+    """Answers initialize, ping, tools/list and tools/call requests"""
+    
+    def __init__(self, tool_count: int = 2, call_delay: float = 0.0, mutable: bool = False):
+        self.tools = build_tools(tool_count)
+        if mutable:
+            self.tools.append(dict(ADD_TOOL))
+        self.call_delay = call_delay
+        self.calls = 0
+        self.notifications: List[Dict[str, Any]] = []
+    
+    def handle(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Handle one JSON-RPC message
+        
+        Args:
+            message: Decoded request or notification
+            
+        Returns:
+            Response to send, or None for notifications
+        """
+        if "id" not in message:
+            return None
+        
+        method = message.get("method")
+        params = message.get("params") or {}
+        
+        if method == "initialize":
+            result = {
+                "protocolVersion": params.get("protocolVersion", PROTOCOL_VERSION),
+                "capabilities": {"tools": {"listChanged": True}},
+                "serverInfo": {"name": "archon-stub", "version": "1.0.0"}
+            }
+        elif method == "ping":
+            result = {}
+        elif method == "tools/list":
+            result = {"tools": self.tools}
+        elif method == "tools/call":
+            result = self.call_tool(params.get("name"), params.get("arguments") or {})
+        else:
+            return {
+                "jsonrpc": "2.0",
+                "id": message["id"],
+                "error": {"code": -32601, "message": f"Method not found: {method}"}
+            }
+        
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+    
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a stub tool"""
+        self.calls += 1
+        if self.call_delay:
+            time.sleep(self.call_delay)
+        
+        if name == "echo":
+            text = str(arguments.get("text", ""))
+        elif name == "add_tool" and any(tool["name"] == name for tool in self.tools):
+            text = str(arguments.get("name", ""))
+            self.tools.append({
+                "name": text,
+                "description": "Tool added by add_tool",
+                "inputSchema": {"type": "object", "properties": {}}
+            })
+            self.notifications.append({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"})
+        elif name == "add":
+            text = str(arguments.get("a", 0) + arguments.get("b", 0))
+        elif any(tool["name"] == name for tool in self.tools):
+            text = f"{name} called"
+        else:
+            return {"content": [{"type": "text", "text": f"Unknown tool: {name}"}], "isError": True}
+        
+        return {"content": [{"type": "text", "text": text}], "isError": False}
+    
+    def serve(self):
+        """Read requests from stdin and write responses to stdout until EOF"""
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            response = self.handle(json.loads(line))
+            messages = ([response] if response is not None else []) + self.notifications
+            self.notifications = []
+            for message in messages:
+                sys.stdout.write(json.dumps(message) + "\n")
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub MCP server for local testing")
+    parser.add_argument("--tools", type=int, default=2, help="Number of tools to advertise")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="Seconds to wait before serving")
+    parser.add_argument("--call-delay", type=float, default=0.0, help="Seconds each tool call takes")
+    parser.add_argument("--mutable", action="store_true", help="Advertise add_tool, which changes the tool list")
+    args = parser.parse_args()
+    
+    time.sleep(args.startup_delay)
+    StubMCPServer(tool_count=args.tools, call_delay=args.call_delay, mutable=args.mutable).serve()
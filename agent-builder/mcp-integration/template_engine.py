@@ -0,0 +1,592 @@
+import ast
+import hashlib
+import keyword
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Small compiled template engine for agent code generation
+#
+# Syntax:
+#   {expr}      Python expression evaluated against the render context
+#   {expr!r}    Conversion (!r, !s or !a) and/or format spec ({expr:>10},
+#   {expr:spec} {expr!r:^{width}}) applied to the value, as in str.format
+#   {> name}    Include a registered partial, rendered with the same context
+#   {{ and }}   Literal braces (same escapes as str.format)
+#
+# Templates written for str.format keep working, except that a bare index
+# ({servers[name]}) is now a variable; quote string keys ({servers['name']}).
+#
+# Expressions are validated once at compile time: only literals, context
+# names, safe builtins, methods of builtin value types, subscripts, calls,
+# operators and list/set/dict comprehensions are allowed, so templates
+# cannot reach frames, dunder attributes, modules or the filesystem.
+
+
+def python_identifier(name: str) -> str:
+    """
+    Turn an arbitrary name into a valid Python identifier
+    
+    Args:
+        name: Name such as "claude-desktop" or "My Agent"
+        
+    Returns:
+        Identifier such as "claude_desktop" or "My_Agent"
+    """
+    identifier = re.sub(r"\W", "_", name) or "_"
+    if identifier[0].isdigit() or keyword.iskeyword(identifier):
+        identifier = f"_{identifier}"
+    return identifier
+
+
+SAFE_BUILTINS: Dict[str, Any] = {
+    "abs": abs,
+    "all": all,
+    "any": any,
+    "bool": bool,
+    "dict": dict,
+    "enumerate": enumerate,
+    "float": float,
+    "identifier": python_identifier,
+    "int": int,
+    "len": len,
+    "list": list,
+    "max": max,
+    "min": min,
+    "range": range,
+    "repr": repr,
+    "round": round,
+    "set": set,
+    "sorted": sorted,
+    "str": str,
+    "sum": sum,
+    "tuple": tuple,
+    "zip": zip,
+}
+
+ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Store, ast.Constant, ast.Attribute,
+    ast.Subscript, ast.Slice, ast.Call, ast.keyword, ast.Starred,
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.List, ast.Tuple, ast.Dict, ast.Set,
+    ast.ListComp, ast.SetComp, ast.DictComp, ast.comprehension,
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+# str.format and friends resolve attributes from inside the format string,
+# which would bypass the attribute check
+BLOCKED_ATTRIBUTES = {"format", "format_map", "mro"}
+
+# Attributes templates may use: the public methods and properties of the
+# value types render contexts are built from. Anything else (generator and
+# frame attributes such as gi_frame or f_globals included) is rejected.
+ALLOWED_ATTRIBUTES = frozenset(
+    name
+    for value_type in (str, bytes, int, float, bool, list, tuple, dict, set, frozenset)
+    for name in dir(value_type)
+    if not name.startswith("_") and name not in BLOCKED_ATTRIBUTES
+)
+
+MAX_PARTIAL_DEPTH = 16
+
+CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+
+PARTIAL_MARKER = re.compile(r"^\s*# <partial:(?P<name>[\w.-]+)>\s*$")
+PARTIAL_END_MARKER = "# </partial:{name}>"
+
+
+class TemplateError(Exception):
+    """Error compiling or rendering a template"""
+    
+    def __init__(self, message: str, template: str = "<string>", line: Optional[int] = None):
+        self.template = template
+        self.line = line
+        location = f"{template}:{line}" if line is not None else template
+        super().__init__(f"{location}: {message}")
+
+
+class TemplateSyntaxError(TemplateError):
+    """Template source that cannot be compiled"""
+
+
+@dataclass
+class Segment:
+    """One compiled piece of a template: literal text, expression or partial"""
+    kind: str
+    line: int
+    text: str = ""
+    code: Any = None
+    conversion: Optional[str] = None
+    spec: Optional["CompiledTemplate"] = None
+
+
+@dataclass
+class CompiledTemplate:
+    """A template compiled to literal text, expression code objects and partial references"""
+    name: str
+    segments: List[Segment] = field(default_factory=list)
+    
+    def render(self, context: Dict[str, Any], engine: Optional["TemplateEngine"] = None) -> str:
+        """
+        Render the template
+        
+        Args:
+            context: Values available to expressions
+            engine: Engine that resolves partials
+            
+        Returns:
+            Rendered text
+        """
+        out: List[str] = []
+        self._render_into(out, None, context, engine, 0)
+        return "".join(out)
+    
+    def render_with_source_map(
+        self,
+        context: Dict[str, Any],
+        engine: Optional["TemplateEngine"] = None
+    ) -> Tuple[str, "SourceMap"]:
+        """
+        Render the template and record which template line produced each output line
+        
+        Args:
+            context: Values available to expressions
+            engine: Engine that resolves partials
+            
+        Returns:
+            Rendered text and its SourceMap
+        """
+        out: List[str] = []
+        origins: List[Tuple[str, int, bool]] = []
+        self._render_into(out, origins, context, engine, 0)
+        return "".join(out), SourceMap.build(out, origins)
+    
+    def _render_into(
+        self,
+        out: List[str],
+        origins: Optional[List[Tuple[str, int, bool]]],
+        context: Dict[str, Any],
+        engine: Optional["TemplateEngine"],
+        depth: int
+    ):
+        """Append rendered chunks to out, and their template origin to origins when given"""
+        for segment in self.segments:
+            if segment.kind == "text":
+                text = segment.text
+            elif segment.kind == "expr":
+                try:
+                    value = eval(segment.code, {"__builtins__": SAFE_BUILTINS}, context)
+                    if segment.conversion is not None:
+                        value = CONVERSIONS[segment.conversion](value)
+                    if segment.spec is not None:
+                        text = format(value, segment.spec.render(context, engine))
+                    else:
+                        text = str(value)
+                except TemplateError:
+                    raise
+                except Exception as e:
+                    raise TemplateError(
+                        f"error evaluating {{{segment.text}}}: {type(e).__name__}: {e}",
+                        self.name,
+                        segment.line
+                    ) from e
+            else:
+                if engine is None:
+                    raise TemplateError(f"no engine to resolve partial {segment.text!r}", self.name, segment.line)
+                if depth >= MAX_PARTIAL_DEPTH:
+                    raise TemplateError(f"partials nested deeper than {MAX_PARTIAL_DEPTH}", self.name, segment.line)
+                partial = engine.get_partial(segment.text)
+                if partial is None:
+                    raise TemplateError(f"unknown partial {segment.text!r}", self.name, segment.line)
+                partial._render_into(out, origins, context, engine, depth + 1)
+                continue
+            
+            out.append(text)
+            if origins is not None:
+                origins.append((self.name, segment.line, segment.kind == "text"))
+
+
+class SourceMap:
+    """Maps lines of rendered output back to the template line that produced them"""
+    
+    def __init__(self, lines: List[Optional[Tuple[str, int]]]):
+        self.lines = lines
+    
+    @classmethod
+    def build(cls, chunks: List[str], origins: List[Tuple[str, int, bool]]) -> "SourceMap":
+        """
+        Build a map from rendered chunks and their origins
+        
+        Each output line maps to the first chunk that puts non-blank text on
+        it, or to the chunk it starts in when the line is blank. Literal text
+        advances the template line with every newline; expression output
+        keeps pointing at its placeholder.
+        """
+        lines: List[Optional[Tuple[str, int]]] = []
+        current: Optional[Tuple[str, int]] = None
+        has_text = False
+        for chunk, (name, line, is_text) in zip(chunks, origins):
+            for offset, part in enumerate(chunk.split("\n")):
+                if offset:
+                    lines.append(current)
+                    current = None
+                    has_text = False
+                if current is None or (not has_text and part.strip()):
+                    current = (name, line + offset if is_text else line)
+                    has_text = bool(part.strip())
+        lines.append(current)
+        return cls(lines)
+    
+    def lookup(self, line: int) -> Optional[Tuple[str, int]]:
+        """
+        Find the template origin of an output line
+        
+        Args:
+            line: 1-based line of rendered output
+            
+        Returns:
+            (template name, template line), or None when unknown
+        """
+        if 1 <= line <= len(self.lines):
+            return self.lines[line - 1]
+        return None
+
+
+def validate_expression(tree: ast.AST, template: str = "<string>", line: Optional[int] = None):
+    """
+    Check that an expression only uses sandbox-safe constructs
+    
+    Args:
+        tree: Parsed expression
+        template: Template name for error messages
+        line: Template line for error messages
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise TemplateSyntaxError(f"{type(node).__name__} is not allowed in templates", template, line)
+        if isinstance(node, ast.Name) and node.id.startswith("_"):
+            raise TemplateSyntaxError(f"private name {node.id!r} is not allowed", template, line)
+        if isinstance(node, ast.Attribute) and node.attr not in ALLOWED_ATTRIBUTES:
+            raise TemplateSyntaxError(f"attribute {node.attr!r} is not allowed", template, line)
+
+
+def _find_closing_brace(source: str, start: int) -> int:
+    """Index of the brace closing the placeholder opened just before start, skipping strings and nested brackets"""
+    depth = 0
+    quote: Optional[str] = None
+    i = start
+    while i < len(source):
+        char = source[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif source.startswith(quote, i):
+                i += len(quote) - 1
+                quote = None
+        elif char in "'\"":
+            quote = source[i:i + 3] if source[i:i + 3] in ("'''", '"""') else char
+            i += len(quote) - 1
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            if depth == 0:
+                return i if char == "}" else -1
+            depth -= 1
+        i += 1
+    return -1
+
+
+def _split_field(body: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Split a placeholder body into expression, conversion and format spec, skipping strings and nested brackets"""
+    depth = 0
+    quote: Optional[str] = None
+    i = 0
+    while i < len(body):
+        char = body[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif body.startswith(quote, i):
+                i += len(quote) - 1
+                quote = None
+        elif char in "'\"":
+            quote = body[i:i + 3] if body[i:i + 3] in ("'''", '"""') else char
+            i += len(quote) - 1
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif depth == 0 and char == "!" and not body.startswith("!=", i):
+            conversion, colon, spec = body[i + 1:].partition(":")
+            return body[:i], conversion, spec if colon else None
+        elif depth == 0 and char == ":":
+            return body[:i], None, body[i + 1:]
+        i += 1
+    return body, None, None
+
+
+def compile_template(source: str, name: str = "<string>", first_line: int = 1) -> CompiledTemplate:
+    """
+    Compile template source
+    
+    Args:
+        source: Template text
+        name: Template name used in error messages and source maps
+        first_line: Line number of the first line of source in its file
+        
+    Returns:
+        CompiledTemplate ready to render
+    """
+    template = CompiledTemplate(name)
+    text: List[str] = []
+    text_line = first_line
+    line = first_line
+    i = 0
+    
+    def flush():
+        if text:
+            template.segments.append(Segment("text", text_line, "".join(text)))
+            text.clear()
+    
+    while i < len(source):
+        char = source[i]
+        if char == "{" and source.startswith("{{", i):
+            text.append("{")
+            i += 2
+        elif char == "}" and source.startswith("}}", i):
+            text.append("}")
+            i += 2
+        elif char == "}":
+            raise TemplateSyntaxError("single '}' encountered; use '}}' for a literal brace", name, line)
+        elif char == "{":
+            end = _find_closing_brace(source, i + 1)
+            if end < 0:
+                raise TemplateSyntaxError("unterminated placeholder", name, line)
+            flush()
+            body = source[i + 1:end]
+            stripped = body.strip()
+            if stripped.startswith(">"):
+                partial_name = stripped[1:].strip()
+                if not partial_name:
+                    raise TemplateSyntaxError("partial name missing", name, line)
+                template.segments.append(Segment("partial", line, partial_name))
+            else:
+                expression, conversion, spec = _split_field(body)
+                expression = expression.strip()
+                if not expression:
+                    raise TemplateSyntaxError("empty placeholder", name, line)
+                if conversion is not None and conversion not in CONVERSIONS:
+                    raise TemplateSyntaxError(f"invalid conversion '!{conversion}' in {{{stripped}}}", name, line)
+                try:
+                    tree = ast.parse(expression, mode="eval")
+                except SyntaxError as e:
+                    raise TemplateSyntaxError(f"invalid expression {{{stripped}}}: {e.msg}", name, line) from None
+                validate_expression(tree, name, line)
+                code = compile(tree, f"<template {name}:{line}>", "eval")
+                template.segments.append(Segment(
+                    "expr", line, stripped, code, conversion,
+                    compile_template(spec, name, line) if spec is not None else None
+                ))
+            line += body.count("\n")
+            text_line = line
+            i = end + 1
+            continue
+        else:
+            if not text:
+                text_line = line
+            text.append(char)
+            if char == "\n":
+                line += 1
+            i += 1
+    
+    flush()
+    return template
+
+
+def extract_partials(source: str) -> Dict[str, Tuple[int, str]]:
+    """
+    Extract named regions from Python source
+    
+    Regions are marked with `# <partial:name>` and `# </partial:name>`
+    comment lines; the marker lines themselves are not included.
+    
+    Args:
+        source: Python source code
+        
+    Returns:
+        Mapping of region name to (first line number, region text)
+    """
+    regions: Dict[str, Tuple[int, str]] = {}
+    lines = source.splitlines(keepends=True)
+    i = 0
+    while i < len(lines):
+        match = PARTIAL_MARKER.match(lines[i])
+        if match:
+            region_name = match.group("name")
+            end_marker = PARTIAL_END_MARKER.format(name=region_name)
+            for j in range(i + 1, len(lines)):
+                if lines[j].strip() == end_marker:
+                    regions[region_name] = (i + 2, "".join(lines[i + 1:j]))
+                    i = j
+                    break
+            else:
+                raise TemplateSyntaxError(f"partial {region_name!r} is never closed", "<source>", i + 1)
+        i += 1
+    return regions
+
+
+def escape_template_text(text: str) -> str:
+    """Escape braces so text renders literally"""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class TemplateEngine:
+    """
+    Compiles templates once and caches them
+    
+    File templates are cached by path and recompiled when their mtime or
+    size changes; string templates are cached by content hash. Partials can
+    be registered directly or extracted from marked regions of Python
+    source files such as basic_agent_template.py.
+    """
+    
+    def __init__(self):
+        self._files: Dict[str, Tuple[Tuple[int, int], CompiledTemplate]] = {}
+        self._strings: Dict[str, CompiledTemplate] = {}
+        self._partials: Dict[str, CompiledTemplate] = {}
+        self._partial_sources: Dict[str, Tuple[Tuple[int, int], List[str]]] = {}
+        self._lock = threading.Lock()
+        self.compiles = 0
+    
+    def _compile(self, source: str, name: str, first_line: int = 1) -> CompiledTemplate:
+        self.compiles += 1
+        return compile_template(source, name, first_line)
+    
+    def from_string(self, source: str, name: str = "<string>") -> CompiledTemplate:
+        """
+        Get the compiled form of a template string
+        
+        Args:
+            source: Template text
+            name: Template name used in error messages
+            
+        Returns:
+            CompiledTemplate
+        """
+        key = hashlib.sha256(f"{name}\0{source}".encode()).hexdigest()
+        template = self._strings.get(key)
+        if template is None:
+            template = self._compile(source, name)
+            with self._lock:
+                self._strings[key] = template
+        return template
+    
+    def load(self, path: Union[str, os.PathLike]) -> CompiledTemplate:
+        """
+        Get the compiled form of a template file, recompiling only when it changed
+        
+        Args:
+            path: Path to the template file
+            
+        Returns:
+            CompiledTemplate
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        state = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        
+        with open(path, 'r') as f:
+            template = self._compile(f.read(), path)
+        with self._lock:
+            self._files[path] = (state, template)
+        return template
+    
+    def register_partial(
+        self,
+        name: str,
+        source: str,
+        literal: bool = False,
+        origin: Optional[str] = None,
+        first_line: int = 1
+    ):
+        """
+        Register a partial that templates include with {> name}
+        
+        Args:
+            name: Partial name
+            source: Partial template text
+            literal: Treat source as plain text rather than template syntax
+            origin: File the partial comes from, reported in source maps
+            first_line: Line of origin the partial starts at
+        """
+        if literal:
+            source = escape_template_text(source)
+        template = self._compile(source, origin or f"partial:{name}", first_line)
+        with self._lock:
+            self._partials[name] = template
+    
+    def load_partials_from(self, path: Union[str, os.PathLike]) -> List[str]:
+        """
+        Register the marked regions of a Python source file as literal partials
+        
+        The file is re-read only when its mtime or size changes.
+        
+        Args:
+            path: Path to the Python source file
+            
+        Returns:
+            Names of the partials found
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        state = (stat.st_mtime_ns, stat.st_size)
+        cached = self._partial_sources.get(path)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        
+        with open(path, 'r') as f:
+            regions = extract_partials(f.read())
+        for region_name, (first_line, region) in regions.items():
+            self.register_partial(region_name, region, literal=True, origin=path, first_line=first_line)
+        names = list(regions)
+        with self._lock:
+            self._partial_sources[path] = (state, names)
+        return names
+    
+    def get_partial(self, name: str) -> Optional[CompiledTemplate]:
+        """Get a registered partial by name"""
+        return self._partials.get(name)
+    
+    def render(self, template: CompiledTemplate, context: Dict[str, Any]) -> str:
+        """
+        Render a compiled template with this engine's partials
+        
+        Args:
+            template: Template from load() or from_string()
+            context: Values available to expressions
+            
+        Returns:
+            Rendered text
+        """
+        return template.render(context, self)
+    
+    def render_with_source_map(
+        self,
+        template: CompiledTemplate,
+        context: Dict[str, Any]
+    ) -> Tuple[str, SourceMap]:
+        """Render a compiled template and map output lines back to template lines"""
+        return template.render_with_source_map(context, self)
+    
+    def render_string(self, source: str, context: Dict[str, Any], name: str = "<string>") -> str:
+        """Compile (once) and render a template string"""
+        return self.render(self.from_string(source, name), context)
+    
+    def render_file(self, path: Union[str, os.PathLike], context: Dict[str, Any]) -> str:
+        """Compile (once per change) and render a template file"""
+        return self.render(self.load(path), context)
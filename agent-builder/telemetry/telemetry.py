@@ -0,0 +1,380 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+import bisect
+import functools
+import logging
+import math
+import threading
+import time
+
+# Timing spans and counters for ARCHON agents and tools
+#
+# Components take an optional `telemetry` object and do nothing extra when
+# it is None, so instrumentation costs one attribute check when disabled.
+# Metrics are exposed in the Prometheus text format (scraped by the
+# Prometheus/Grafana stack in docs/ARCHITECTURE.md); spans can also be
+# mirrored to OpenTelemetry with OpenTelemetrySpans.
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets in seconds, from fast parses to slow model calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Help text of the duration histogram recorded for each span name
+SPAN_DESCRIPTIONS = {
+    "tool_call": "Agent tool call latency",
+    "fetch": "HTTP fetch latency, including reading the body",
+    "parse": "HTML parsing and extraction latency, including pool queueing",
+    "mcp_server_start": "MCP server process start and initialize latency",
+    "mcp_call": "MCP tool call latency",
+    "agent_run": "Agent run latency",
+    "model_request": "Model request latency within an agent run",
+}
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """A named metric with a fixed set of label names"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Optional[Mapping[str, Any]]) -> Tuple[str, ...]:
+        labels = labels or {}
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _label_text(self, key: Tuple[str, ...], extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+    
+    def render(self) -> List[str]:
+        lines = []
+        if self.description:
+            lines.append(f"# HELP {self.name} {self.description}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing total per label set"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def add(self, amount: float = 1.0, labels: Optional[Mapping[str, Any]] = None):
+        """Increase the counter for a label set"""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, labels: Optional[Mapping[str, Any]] = None) -> float:
+        return self._values.get(self._key(labels), 0.0)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{self._label_text(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets per label set"""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+    
+    def observe(self, value: float, labels: Optional[Mapping[str, Any]] = None):
+        """Record one observation"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+    
+    def count(self, labels: Optional[Mapping[str, Any]] = None) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = self._label_text(key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+@dataclass
+class Span:
+    """
+    One timed operation
+    
+    labels become Prometheus labels of the span's duration histogram and
+    must stay low-cardinality (tool or server names, status codes);
+    attributes (URLs, sizes, token counts) only go to span listeners.
+    """
+    name: str
+    labels: Dict[str, str] = field(default_factory=dict)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.time)
+    started: float = field(default_factory=time.perf_counter)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    # Per-listener state, e.g. the OpenTelemetry span this one is mirrored to
+    context: Dict[str, Any] = field(default_factory=dict)
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def set_label(self, key: str, value: Any):
+        self.labels[key] = str(value)
+    
+    def fail(self, error: str):
+        """Mark the operation failed without raising"""
+        self.error = error
+
+
+class Telemetry:
+    """Registry of counters, histograms and span listeners"""
+    
+    def __init__(self, namespace: str = "archon", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Initialize the registry
+        
+        Args:
+            namespace: Prefix of every metric name
+            buckets: Default histogram buckets in seconds
+        """
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._metrics: Dict[str, Metric] = {}
+        self._listeners: List[Any] = []
+        self._lock = threading.Lock()
+    
+    def _metric(self, cls: type, name: str, description: str, labelnames: Sequence[str], **kwargs: Any) -> Any:
+        full_name = f"{self.namespace}_{name}" if self.namespace else name
+        metric = self._metrics.get(full_name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(full_name)
+                if metric is None:
+                    metric = self._metrics[full_name] = cls(full_name, description, labelnames, **kwargs)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {full_name} is already registered with different type or labels")
+        return metric
+    
+    def counter(self, name: str, description: str = "", labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter (the namespace is prepended to name)"""
+        return self._metric(Counter, name, description, labelnames)
+    
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        """Get or create a histogram (the namespace is prepended to name)"""
+        return self._metric(Histogram, name, description, labelnames, buckets=buckets or self.buckets)
+    
+    def add_listener(self, listener: Any):
+        """
+        Receive every span: listener.on_start(span) and listener.on_end(span)
+        
+        Args:
+            listener: Object with on_start and on_end methods, e.g. OpenTelemetrySpans
+        """
+        self._listeners.append(listener)
+    
+    @contextmanager
+    def span(self, name: str, labels: Optional[Mapping[str, Any]] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block, recording it in the {name}_duration_seconds histogram
+        
+        The histogram is labelled with the span's labels plus outcome
+        ("ok", or "error" when the block raised or called span.fail()).
+        
+        Args:
+            name: Span name
+            labels: Low-cardinality metric labels
+            **attributes: Details passed to span listeners only
+            
+        Yields:
+            The Span, for adding labels and attributes as they become known
+        """
+        span = Span(name, {key: str(value) for key, value in (labels or {}).items()}, attributes)
+        for listener in self._listeners:
+            try:
+                listener.on_start(span)
+            except Exception as e:
+                logger.warning("Span listener failed on start of %s: %s", name, e)
+        try:
+            yield span
+        except BaseException as e:
+            if span.error is None:
+                span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.started
+            labels = dict(sorted(span.labels.items()))
+            labels["outcome"] = "error" if span.error else "ok"
+            self.histogram(
+                f"{name}_duration_seconds", SPAN_DESCRIPTIONS.get(name, f"{name} latency"), tuple(labels)
+            ).observe(span.duration, labels)
+            for listener in self._listeners:
+                try:
+                    listener.on_end(span)
+                except Exception as e:
+                    logger.warning("Span listener failed on end of %s: %s", name, e)
+    
+    def instrument_tool(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap an async agent tool so each call is recorded as a tool_call span
+        
+        The wrapper keeps the tool's name, docstring and signature, so the
+        agent builds the same tool schema from it.
+        """
+        labels = {"tool": func.__name__}
+        
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with self.span("tool_call", labels):
+                return await func(*args, **kwargs)
+        
+        return wrapper
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve /metrics for Prometheus from a background thread
+        
+        Args:
+            port: Port to listen on (0 picks a free one)
+            host: Interface to bind
+            
+        Returns:
+            The running server; call shutdown() on it to stop
+        """
+        telemetry = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format: str, *args: Any):
+                logger.debug("metrics request: " + format, *args)
+        
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="archon-metrics", daemon=True).start()
+        return server
+
+
+class OpenTelemetrySpans:
+    """Span listener that mirrors spans to OpenTelemetry (requires opentelemetry-api)"""
+    
+    def __init__(self, tracer: Any = None):
+        """
+        Initialize the listener
+        
+        Args:
+            tracer: OpenTelemetry tracer (defaults to the global provider's "archon" tracer)
+        """
+        from opentelemetry import context, trace
+        from opentelemetry.trace import Status, StatusCode
+        
+        self._context = context
+        self._trace = trace
+        self._error_status = lambda message: Status(StatusCode.ERROR, message)
+        self.tracer = tracer or trace.get_tracer("archon")
+    
+    @staticmethod
+    def _attributes(span: Span) -> Dict[str, Any]:
+        attributes = {f"archon.{key}": value for key, value in span.labels.items()}
+        for key, value in span.attributes.items():
+            if value is not None:
+                attributes[f"archon.{key}"] = value if isinstance(value, (str, bool, int, float)) else str(value)
+        return attributes
+    
+    def on_start(self, span: Span):
+        otel_span = self.tracer.start_span(
+            f"archon.{span.name}", attributes=self._attributes(span), start_time=int(span.start_time * 1e9)
+        )
+        # Make it the current span so nested spans (e.g. fetch inside tool_call) become children
+        token = self._context.attach(self._trace.set_span_in_context(otel_span))
+        span.context["otel"] = (otel_span, token)
+    
+    def on_end(self, span: Span):
+        otel_span, token = span.context.pop("otel")
+        otel_span.set_attributes(self._attributes(span))
+        if span.error:
+            otel_span.set_status(self._error_status(span.error))
+        otel_span.end()
+        self._context.detach(token)
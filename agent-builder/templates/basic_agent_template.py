@@ -1,12 +1,32 @@
 from pydantic_ai import Agent
-from dataclasses import dataclass
+from pydantic_ai.exceptions import ModelHTTPError, UnexpectedModelBehavior
+from pydantic_ai.messages import (
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta
+)
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+import asyncio
+import hashlib
+import json
 import os
-from typing import List, Dict, Any, Optional
+import random
+import threading
+import time
+import weakref
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Tuple
 
 # ARCHON Agent Template - Basic
 # Generated with visual builder
 # Modify sections marked with # TODO: for customization
+# Regions between # <partial:...> markers are shared with MCP code generation
 
+# <partial:agent_deps>
 @dataclass
 class AgentDeps:
     """Dependencies for the agent"""
@@ -16,13 +36,117 @@ class AgentDeps:
     temperature: float = 0.7
     max_tokens: int = 1000
     custom_data: Optional[Dict[str, Any]] = None
+# </partial:agent_deps>
+
+@dataclass
+class StreamEvent:
+    """One event of a streamed agent run"""
+    # "text_delta", "tool_call", "tool_result" or "final"
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class BatchResult:
+    """Outcome of one message of a run_batch() call"""
+    index: int
+    message: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    from_checkpoint: bool = False
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed agent run is worth retrying"""
+    if isinstance(error, ModelHTTPError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, UnexpectedModelBehavior))
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second, with bursts of up to `burst`"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
 
 class BasicAgentTemplate:
-    """Basic agent template for general-purpose AI tasks"""
+    """
+    Basic agent template for general-purpose AI tasks
+    
+    Built agents are cached per template class and agent settings (model,
+    temperature, max_tokens) and shared by every instance with those
+    settings, so creating an instance per request is cheap. An Agent keeps
+    no per-run state, so one warm agent serves concurrent runs; tools must
+    read per-request values from ctx.deps rather than from self.
+    """
+    
+    # Fully built agents shared across instances, least recently used first
+    _agent_cache: "OrderedDict[Tuple[Any, ...], Agent]" = OrderedDict()
+    _agent_cache_lock = threading.Lock()
+    max_cached_agents = 32
+    
+    # Model requests per second allowed per provider ("openai", "anthropic", ...),
+    # shared by every batch running in the same event loop
+    rate_limits: Dict[str, float] = {}
+    # Limiters per event loop, dropped with their loop
+    _rate_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, RateLimiter]]" = (
+        weakref.WeakKeyDictionary()
+    )
+    
+    # Telemetry recording run latency, model latency and token usage (None disables it)
+    telemetry: Optional[Any] = None
     
     def __init__(self, deps: AgentDeps):
         self.deps = deps
-        self.agent = self._create_agent()
+        self.agent = self._get_agent()
+    
+    @classmethod
+    def _agent_key(cls, deps: AgentDeps) -> Tuple[Any, ...]:
+        """Cache key: everything the built agent depends on"""
+        return (cls, deps.model, deps.temperature, deps.max_tokens)
+    
+    def _get_agent(self) -> Agent:
+        """Get the cached agent for these settings, building it on first use"""
+        key = self._agent_key(self.deps)
+        cache = BasicAgentTemplate._agent_cache
+        with BasicAgentTemplate._agent_cache_lock:
+            agent = cache.get(key)
+            if agent is None:
+                agent = self._create_agent()
+                cache[key] = agent
+                while len(cache) > self.max_cached_agents:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(key)
+        return agent
+    
+    @classmethod
+    def clear_agent_cache(cls):
+        """Drop every cached agent, e.g. after changing the system prompt or tools"""
+        with BasicAgentTemplate._agent_cache_lock:
+            BasicAgentTemplate._agent_cache.clear()
     
     def _create_agent(self) -> Agent:
         """Create the Pydantic AI agent"""
@@ -43,7 +167,7 @@ class BasicAgentTemplate:
             self.deps.model,
             system_prompt=system_prompt,
             deps_type=AgentDeps,
-            settings={
+            model_settings={
                 "temperature": self.deps.temperature,
                 "max_tokens": self.deps.max_tokens
             }
@@ -89,18 +213,357 @@ class BasicAgentTemplate:
             processed["processed"] = True
             return processed
     
-    async def run(self, message: str) -> str:
+    def _agent_for(self, deps: AgentDeps) -> Agent:
+        """Agent matching the settings of deps"""
+        if self._agent_key(deps) == self._agent_key(self.deps):
+            return self.agent
+        return type(self)(deps).agent
+    
+    async def run(self, message: str, deps: Optional[AgentDeps] = None) -> str:
         """
         Run the agent with a message
         
         Args:
             message: User message to process
+            deps: Per-request dependencies (defaults to the instance's deps)
             
         Returns:
             Agent response
         """
-        result = await self.agent.run(message, deps=self.deps)
-        return result.data
+        return await self._run(message, deps or self.deps)
+    
+    async def _run(self, message: str, deps: AgentDeps, limiter: Optional[RateLimiter] = None) -> str:
+        """run(), waiting for the limiter before each model request of the run"""
+        telemetry = self.telemetry
+        if telemetry is None and limiter is None:
+            result = await self._agent_for(deps).run(message, deps=deps)
+            return result.output
+        
+        run_span = telemetry.span("agent_run", {"model": deps.model}) if telemetry is not None else nullcontext()
+        with run_span as span:
+            async with self._agent_for(deps).iter(message, deps=deps) as agent_run:
+                request_started = None
+                async for node in agent_run:
+                    # The node after a model request is produced once the response arrives
+                    if request_started is not None:
+                        self._record_model_request(deps.model, time.perf_counter() - request_started)
+                        request_started = None
+                    if Agent.is_model_request_node(node):
+                        # A node is sent when the iteration moves past it
+                        if limiter is not None:
+                            await limiter.acquire()
+                        if telemetry is not None:
+                            request_started = time.perf_counter()
+            if telemetry is not None:
+                self._record_usage(span, deps.model, agent_run.result.usage())
+        return agent_run.result.output
+    
+    def _record_model_request(self, model: str, elapsed: float):
+        self.telemetry.histogram(
+            "model_request_duration_seconds", "Model request latency within an agent run", ("model",)
+        ).observe(elapsed, {"model": model})
+    
+    def _record_usage(self, span: Any, model: str, usage: Any):
+        """Add a run's token usage to the span and the token counter"""
+        tokens = self.telemetry.counter("agent_tokens_total", "Model tokens used by agent runs", ("model", "kind"))
+        for kind in ("request", "response"):
+            count = getattr(usage, f"{kind}_tokens", None) or 0
+            tokens.add(count, {"model": model, "kind": kind})
+            span.set_attribute(f"{kind}_tokens", count)
+        span.set_attribute("model_requests", usage.requests)
+    
+    async def run_stream(
+        self,
+        message: str,
+        deps: Optional[AgentDeps] = None
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Run the agent with a message, yielding events as they happen
+        
+        Yields text deltas as the model produces them, tool calls and their
+        results as tools run, and finally the complete response.
+        
+        Args:
+            message: User message to process
+            deps: Per-request dependencies (defaults to the instance's deps)
+            
+        Yields:
+            StreamEvent objects
+        """
+        deps = deps or self.deps
+        telemetry = self.telemetry
+        run_span = telemetry.span("agent_run", {"model": deps.model}) if telemetry is not None else nullcontext()
+        with run_span as span:
+            try:
+                async with self._agent_for(deps).iter(message, deps=deps) as agent_run:
+                    async for node in agent_run:
+                        if Agent.is_model_request_node(node):
+                            request_started = time.perf_counter()
+                            async with node.stream(agent_run.ctx) as request_stream:
+                                async for event in request_stream:
+                                    if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                                        if event.part.content:
+                                            yield StreamEvent("text_delta", {"delta": event.part.content})
+                                    elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                                        yield StreamEvent("text_delta", {"delta": event.delta.content_delta})
+                            if telemetry is not None:
+                                self._record_model_request(deps.model, time.perf_counter() - request_started)
+                        elif Agent.is_call_tools_node(node):
+                            async with node.stream(agent_run.ctx) as tool_stream:
+                                async for event in tool_stream:
+                                    if isinstance(event, FunctionToolCallEvent):
+                                        yield StreamEvent("tool_call", {
+                                            "tool_call_id": event.part.tool_call_id,
+                                            "tool_name": event.part.tool_name,
+                                            "args": event.part.args_as_dict()
+                                        })
+                                    elif isinstance(event, FunctionToolResultEvent):
+                                        yield StreamEvent("tool_result", {
+                                            "tool_call_id": event.tool_call_id,
+                                            "tool_name": event.result.tool_name,
+                                            "content": event.result.content
+                                        })
+            except GeneratorExit:
+                # The consumer stopped reading early; that is not a failed run
+                return
+            if telemetry is not None:
+                self._record_usage(span, deps.model, agent_run.result.usage())
+        
+        yield StreamEvent("final", {"output": agent_run.result.output})
+    
+    @staticmethod
+    def provider_of(model: str) -> str:
+        """Provider part of a model name such as "openai:gpt-4o" (bare names count as their own provider)"""
+        return model.split(":", 1)[0]
+    
+    def _rate_limiter(self, model: str, rate: Optional[float]) -> Optional[RateLimiter]:
+        """Shared rate limiter for the model's provider in the running event loop"""
+        provider = self.provider_of(model)
+        rate = rate or self.rate_limits.get(provider)
+        if not rate:
+            return None
+        limiters = BasicAgentTemplate._rate_limiters.setdefault(asyncio.get_running_loop(), {})
+        limiter = limiters.get(provider)
+        if limiter is None or limiter.rate != rate:
+            limiter = RateLimiter(rate)
+            limiters[provider] = limiter
+        return limiter
+    
+    async def _run_with_retry(
+        self,
+        index: int,
+        message: str,
+        deps: AgentDeps,
+        limiter: Optional[RateLimiter],
+        max_retries: int,
+        base_delay: float,
+        max_delay: float
+    ) -> BatchResult:
+        """
+        Run one batch message, retrying retryable failures with full-jitter
+        exponential backoff
+        
+        The limiter is acquired before every model request, so runs that
+        call tools (several requests each) and retries are both counted.
+        """
+        result = BatchResult(index, message)
+        started = time.monotonic()
+        while True:
+            result.attempts += 1
+            try:
+                result.output = await self._run(message, deps, limiter)
+                result.error = None
+                break
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+                if result.attempts > max_retries or not is_retryable(e):
+                    break
+                await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** (result.attempts - 1))))
+        result.elapsed = time.monotonic() - started
+        return result
+    
+    @staticmethod
+    def _message_key(message: str) -> str:
+        return hashlib.sha256(message.encode()).hexdigest()[:16]
+    
+    def _load_checkpoint(self, checkpoint_path: Optional[str]) -> Dict[int, Dict[str, Any]]:
+        """Successful results recorded by an earlier, interrupted run"""
+        completed: Dict[int, Dict[str, Any]] = {}
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return completed
+        with open(checkpoint_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write leaves a truncated last line
+                    continue
+                if record.get("error") is None:
+                    completed[record["index"]] = record
+        return completed
+    
+    async def run_batch(
+        self,
+        messages: Iterable[str],
+        deps: Optional[AgentDeps] = None,
+        max_concurrency: int = 8,
+        ordered: bool = True,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        rate_limit: Optional[float] = None,
+        checkpoint_path: Optional[str] = None
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run the agent over many messages concurrently
+        
+        At most max_concurrency runs are in flight, every model request to
+        the provider is rate limited, and retryable failures (rate limits,
+        server errors, timeouts) are retried with jittered exponential
+        backoff. With a checkpoint_path every finished message is appended
+        to a JSONL file, and a rerun with the same file skips messages that
+        already succeeded and yields their recorded results.
+        
+        Args:
+            messages: User messages to process
+            deps: Dependencies for every run (defaults to the instance's deps)
+            max_concurrency: Maximum concurrent agent runs
+            ordered: Yield results in input order rather than as they complete
+            max_retries: Retries per message after the first attempt
+            base_delay: Backoff ceiling for the first retry, doubled per retry
+            max_delay: Maximum backoff ceiling
+            rate_limit: Model requests per second for this provider (defaults to rate_limits)
+            checkpoint_path: JSONL file to record results in and resume from
+            
+        Yields:
+            BatchResult for every message; failures carry error instead of output
+        """
+        deps = deps or self.deps
+        limiter = self._rate_limiter(deps.model, rate_limit)
+        completed = self._load_checkpoint(checkpoint_path)
+        checkpoint = open(checkpoint_path, 'a') if checkpoint_path else None
+        
+        results: "asyncio.Queue[Any]" = asyncio.Queue()
+        pending: List[Tuple[int, str]] = []
+        for index, message in enumerate(messages):
+            record = completed.get(index)
+            if record is not None and record.get("key") == self._message_key(message):
+                results.put_nowait(BatchResult(
+                    index, message, record.get("output"), None, record.get("attempts", 0), 0.0, True
+                ))
+            else:
+                pending.append((index, message))
+        total = results.qsize() + len(pending)
+        work = iter(pending)
+        
+        async def worker():
+            try:
+                for index, message in work:
+                    result = await self._run_with_retry(
+                        index, message, deps, limiter, max_retries, base_delay, max_delay
+                    )
+                    if checkpoint is not None:
+                        record = asdict(result)
+                        del record["message"], record["from_checkpoint"]
+                        record["key"] = self._message_key(message)
+                        checkpoint.write(json.dumps(record, default=str) + "\n")
+                        checkpoint.flush()
+                    await results.put(result)
+            except Exception as e:
+                # Hand the failure to the consumer instead of leaving it waiting
+                await results.put(e)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(max_concurrency, len(pending))))]
+        try:
+            buffered: Dict[int, BatchResult] = {}
+            next_index = 0
+            for _ in range(total):
+                result = await results.get()
+                if isinstance(result, Exception):
+                    raise result
+                if not ordered:
+                    yield result
+                    continue
+                buffered[result.index] = result
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if checkpoint is not None:
+                checkpoint.close()
+
+# WebSocket / server-sent event names for streamed runs (see docs/ARCHITECTURE.md)
+GENERATION_EVENTS = {
+    "text_delta": "generation:delta",
+    "tool_call": "generation:tool_call",
+    "tool_result": "generation:tool_result",
+    "final": "generation:completed"
+}
+
+async def generation_events(
+    stream: AsyncIterator[StreamEvent],
+    run_id: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Translate a run_stream() into generation:* events
+    
+    Emits generation:started first and generation:completed last; if the run
+    fails, error:occurred is emitted instead of generation:completed.
+    
+    Args:
+        stream: Events from BasicAgentTemplate.run_stream()
+        run_id: Identifier added to every payload so clients can correlate runs
+        
+    Yields:
+        (event name, payload) pairs
+    """
+    base = {"run_id": run_id} if run_id else {}
+    yield "generation:started", dict(base)
+    try:
+        async for event in stream:
+            yield GENERATION_EVENTS[event.type], {**base, **event.data}
+    except Exception as e:
+        yield "error:occurred", {**base, "error": type(e).__name__, "message": str(e)}
+
+async def sse_stream(
+    stream: AsyncIterator[StreamEvent],
+    run_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Format a run_stream() as server-sent events
+    
+    For example with FastAPI:
+    StreamingResponse(sse_stream(agent.run_stream(message)), media_type="text/event-stream")
+    
+    Args:
+        stream: Events from BasicAgentTemplate.run_stream()
+        run_id: Identifier added to every payload
+        
+    Yields:
+        SSE frames
+    """
+    async for name, payload in generation_events(stream, run_id):
+        yield f"event: {name}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+async def websocket_stream(
+    send: Callable[[str], Awaitable[Any]],
+    stream: AsyncIterator[StreamEvent],
+    run_id: Optional[str] = None
+):
+    """
+    Send a run_stream() over a WebSocket as {"event": ..., "data": ...} messages
+    
+    Args:
+        send: Coroutine function sending one text message, e.g. websocket.send_text
+        stream: Events from BasicAgentTemplate.run_stream()
+        run_id: Identifier added to every payload
+    """
+    async for name, payload in generation_events(stream, run_id):
+        await send(json.dumps({"event": name, "data": payload}, default=str))
 
 # Example usage
 if __name__ == "__main__":
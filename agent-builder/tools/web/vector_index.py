@@ -0,0 +1,539 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import threading
+import uuid
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Local vector index of scraped page content
+# Pages are chunked by the scraping tools, embedded with a pluggable
+# embedding function and upserted here so agents can search what they
+# have already read. The default backend is an in-process NumPy
+# brute-force index; Qdrant (docs/ARCHITECTURE.md) is optional.
+
+logger = logging.getLogger(__name__)
+
+QDRANT_AVAILABLE = importlib.util.find_spec("qdrant_client") is not None
+
+# Embedding function: texts in, one L2-normalized row per text out
+EmbeddingFunction = Callable[[List[str]], Any]
+
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def url_prefixes(url: str) -> List[str]:
+    """
+    Prefixes of a URL that end in "/", e.g. "https://", "https://a.com/" and
+    "https://a.com/docs/" for https://a.com/docs/page
+    
+    Stored as a keyword payload so backends can narrow url_prefix searches
+    with an exact match on prefix_key(url_prefix).
+    """
+    return [url[:index + 1] for index, char in enumerate(url) if char == "/"]
+
+
+def prefix_key(prefix: str) -> Optional[str]:
+    """Longest "/"-terminated part of a prefix: every URL starting with prefix has it in url_prefixes"""
+    index = prefix.rfind("/")
+    return prefix[:index + 1] if index >= 0 else None
+
+
+def _matches(payload: Dict[str, Any], match: Dict[str, Any]) -> bool:
+    """Whether each key's payload value equals, or is a list containing, the wanted value"""
+    for key, value in match.items():
+        stored = payload.get(key)
+        if stored != value and not (isinstance(stored, list) and value in stored):
+            return False
+    return True
+
+
+def content_hash(text: str) -> str:
+    """Stable identifier of a chunk's content"""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedding by feature hashing of words and word bigrams
+    
+    Deterministic across processes and needs no model download, so it runs
+    offline. It captures lexical overlap only; plug in a real embedding
+    model for semantic search.
+    """
+    
+    def __init__(self, dim: int = 512):
+        """
+        Initialize the embedder
+        
+        Args:
+            dim: Embedding dimension
+        """
+        self.dim = dim
+    
+    def __call__(self, texts: List[str]) -> Any:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = TERM_PATTERN.findall(text.lower())
+            features = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode())
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dim] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+@dataclass
+class SearchHit:
+    """One search result"""
+    id: str
+    score: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+class NumpyVectorIndex:
+    """
+    Brute-force cosine similarity index held in a NumPy matrix
+    
+    Rows grow by doubling; deleted rows are swapped out with the last row,
+    so upsert, delete and search never rebuild the matrix. Search is one
+    matrix-vector product, which stays fast up to a few hundred thousand
+    chunks.
+    """
+    
+    def __init__(self, dim: int, initial_capacity: int = 1024):
+        """
+        Initialize the index
+        
+        Args:
+            dim: Vector dimension
+            initial_capacity: Rows allocated up front
+        """
+        if np is None:
+            raise ImportError("NumpyVectorIndex requires numpy (pip install numpy)")
+        self.dim = dim
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+    
+    def upsert(self, ids: Sequence[str], vectors: Any, payloads: Sequence[Dict[str, Any]]):
+        """Insert or replace vectors and their payloads"""
+        with self._lock:
+            for item_id, vector, payload in zip(ids, vectors, payloads):
+                row = self._rows.get(item_id)
+                if row is None:
+                    row = len(self._ids)
+                    if row == len(self._vectors):
+                        grown = np.zeros((max(1, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+                        grown[:row] = self._vectors
+                        self._vectors = grown
+                    self._ids.append(item_id)
+                    self._rows[item_id] = row
+                self._vectors[row] = vector
+                self._payloads[item_id] = payload
+    
+    def set_payload(self, item_id: str, payload: Dict[str, Any]):
+        """Replace the payload of an indexed vector"""
+        with self._lock:
+            if item_id in self._rows:
+                self._payloads[item_id] = payload
+    
+    def get_payload(self, item_id: str) -> Optional[Dict[str, Any]]:
+        return self._payloads.get(item_id)
+    
+    def get_payloads(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Payloads of the given ids that are indexed"""
+        with self._lock:
+            return {item_id: self._payloads[item_id] for item_id in ids if item_id in self._payloads}
+    
+    def ids_with(self, key: str, value: Any) -> List[str]:
+        """Ids whose payload list under key contains value"""
+        with self._lock:
+            return [item_id for item_id, payload in self._payloads.items() if value in payload.get(key, ())]
+    
+    def delete(self, ids: Iterable[str]):
+        """Remove vectors by id"""
+        with self._lock:
+            for item_id in ids:
+                row = self._rows.pop(item_id, None)
+                if row is None:
+                    continue
+                self._payloads.pop(item_id, None)
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = moved
+                    self._rows[moved] = row
+                self._ids.pop()
+    
+    def search(
+        self,
+        vector: Any,
+        k: int = 5,
+        where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        match: Optional[Dict[str, Any]] = None
+    ) -> List[SearchHit]:
+        """
+        Find the vectors most similar to a query vector
+        
+        Args:
+            vector: Normalized query vector
+            k: Number of results
+            where: Optional payload filter
+            match: Payload values hits must have (a list payload must contain the value)
+            
+        Returns:
+            Hits sorted by descending cosine similarity
+        """
+        if match:
+            condition = where
+            where = lambda payload: _matches(payload, match) and (condition is None or condition(payload))
+        with self._lock:
+            count = len(self._ids)
+            if not count or k <= 0:
+                return []
+            scores = self._vectors[:count] @ np.asarray(vector, dtype=np.float32)
+            if where is None and k < count:
+                candidates = np.argpartition(-scores, k)[:k]
+            else:
+                candidates = np.arange(count)
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+            
+            hits = []
+            for row in order:
+                item_id = self._ids[row]
+                payload = self._payloads[item_id]
+                if where is not None and not where(payload):
+                    continue
+                hits.append(SearchHit(item_id, float(scores[row]), payload))
+                if len(hits) == k:
+                    break
+            return hits
+
+
+class QdrantVectorIndex:
+    """Vector index stored in a Qdrant collection (requires qdrant-client)"""
+    
+    def __init__(
+        self,
+        dim: int,
+        collection: str = "scraped_content",
+        url: Optional[str] = None,
+        client: Any = None,
+        keyword_fields: Sequence[str] = ("urls", "url_prefixes")
+    ):
+        """
+        Initialize the index, creating the collection if needed
+        
+        Args:
+            dim: Vector dimension
+            collection: Collection name
+            url: Qdrant URL (defaults to QDRANT_URL or http://localhost:6333)
+            client: Existing QdrantClient to use instead of connecting
+            keyword_fields: Payload fields indexed for ids_with and match filters
+        """
+        from qdrant_client import QdrantClient
+        from qdrant_client.http import models
+        
+        self.dim = dim
+        self.collection = collection
+        self._models = models
+        self.client = client or QdrantClient(url=url or os.getenv("QDRANT_URL", "http://localhost:6333"))
+        if not self.client.collection_exists(collection):
+            self.client.create_collection(
+                collection,
+                vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE)
+            )
+            for field_name in keyword_fields:
+                self.client.create_payload_index(
+                    collection, field_name, field_schema=models.PayloadSchemaType.KEYWORD
+                )
+    
+    @staticmethod
+    def _point_id(item_id: str) -> str:
+        # Qdrant ids must be integers or UUIDs
+        return str(uuid.UUID(item_id[:32]))
+    
+    def __len__(self) -> int:
+        return self.client.count(self.collection, exact=True).count
+    
+    def __contains__(self, item_id: str) -> bool:
+        return bool(self.client.retrieve(self.collection, [self._point_id(item_id)], with_payload=False))
+    
+    def upsert(self, ids: Sequence[str], vectors: Any, payloads: Sequence[Dict[str, Any]]):
+        points = [
+            self._models.PointStruct(
+                id=self._point_id(item_id),
+                vector=[float(value) for value in vector],
+                payload={**payload, "id": item_id}
+            )
+            for item_id, vector, payload in zip(ids, vectors, payloads)
+        ]
+        if points:
+            self.client.upsert(self.collection, points)
+    
+    def set_payload(self, item_id: str, payload: Dict[str, Any]):
+        self.client.overwrite_payload(self.collection, {**payload, "id": item_id}, [self._point_id(item_id)])
+    
+    def get_payload(self, item_id: str) -> Optional[Dict[str, Any]]:
+        points = self.client.retrieve(self.collection, [self._point_id(item_id)], with_payload=True)
+        return dict(points[0].payload) if points else None
+    
+    def get_payloads(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        point_ids = [self._point_id(item_id) for item_id in ids]
+        if not point_ids:
+            return {}
+        points = self.client.retrieve(self.collection, point_ids, with_payload=True)
+        payloads = {}
+        for point in points:
+            payload = dict(point.payload or {})
+            payloads[payload.pop("id", str(point.id))] = payload
+        return payloads
+    
+    def _filter(self, match: Dict[str, Any]) -> Any:
+        return self._models.Filter(must=[
+            self._models.FieldCondition(key=key, match=self._models.MatchValue(value=value))
+            for key, value in match.items()
+        ])
+    
+    def ids_with(self, key: str, value: Any) -> List[str]:
+        condition = self._filter({key: value})
+        ids = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                self.collection,
+                scroll_filter=condition,
+                limit=256,
+                offset=offset,
+                with_payload=["id"],
+                with_vectors=False
+            )
+            ids.extend((point.payload or {}).get("id", str(point.id)) for point in points)
+            if offset is None:
+                return ids
+    
+    def delete(self, ids: Iterable[str]):
+        point_ids = [self._point_id(item_id) for item_id in ids]
+        if point_ids:
+            self.client.delete(self.collection, self._models.PointIdsList(points=point_ids))
+    
+    def search(
+        self,
+        vector: Any,
+        k: int = 5,
+        where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        match: Optional[Dict[str, Any]] = None
+    ) -> List[SearchHit]:
+        """
+        Find the points most similar to a query vector
+        
+        match is applied by the server; where runs client side on each page
+        of results until k hits are found or the matching points run out.
+        """
+        if k <= 0:
+            return []
+        query = [float(value) for value in vector]
+        query_filter = self._filter(match) if match else None
+        limit = k if where is None else k * 2
+        hits = []
+        offset = 0
+        while True:
+            points = self.client.query_points(
+                self.collection,
+                query=query,
+                query_filter=query_filter,
+                limit=limit,
+                offset=offset,
+                with_payload=True
+            ).points
+            for point in points:
+                payload = dict(point.payload or {})
+                if where is not None and not where(payload):
+                    continue
+                hits.append(SearchHit(payload.pop("id", str(point.id)), point.score, payload))
+                if len(hits) == k:
+                    return hits
+            if len(points) < limit:
+                return hits
+            offset += limit
+
+
+class ScrapedContentIndex:
+    """
+    Searchable store of page chunks that agents have already fetched
+    
+    Chunks are identified by a hash of their content, so a chunk that
+    appears on many pages (or on every fetch of the same page) is embedded
+    and stored once. Re-indexing a URL only embeds its new chunks and drops
+    the ones that disappeared from it.
+    
+    Which pages contain a chunk is kept in the chunk's "urls" payload, so a
+    persistent backend keeps deduplicating across restarts. The chunks of
+    each URL are cached in memory once read from the backend.
+    """
+    
+    def __init__(
+        self,
+        embedder: Optional[EmbeddingFunction] = None,
+        backend: Any = None,
+        dim: int = 512
+    ):
+        """
+        Initialize the index
+        
+        Args:
+            embedder: Embedding function (defaults to HashingEmbedder(dim))
+            backend: Vector index (defaults to NumpyVectorIndex(dim))
+            dim: Dimension of the default embedder and backend
+        """
+        self.embedder = embedder or HashingEmbedder(dim)
+        self.backend = backend if backend is not None else NumpyVectorIndex(dim)
+        self._url_chunks: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.embedded = 0
+        self.deduplicated = 0
+    
+    def _page_chunks(self, url: str) -> Set[str]:
+        """Ids of the chunks stored for a URL, read from the backend on first use"""
+        chunk_ids = self._url_chunks.get(url)
+        if chunk_ids is None:
+            chunk_ids = set(self.backend.ids_with("urls", url))
+            if chunk_ids:
+                self._url_chunks[url] = chunk_ids
+        return chunk_ids
+    
+    def add_page(self, url: str, chunks: Sequence[Tuple[str, str]]) -> int:
+        """
+        Upsert the chunks of a page
+        
+        Args:
+            url: Page URL
+            chunks: (heading, text) pairs in document order
+            
+        Returns:
+            Number of chunks that had to be embedded
+        """
+        wanted: Dict[str, Tuple[int, str, str]] = {}
+        for position, (heading, text) in enumerate(chunks):
+            chunk_id = content_hash(f"{heading}\n{text}")
+            wanted.setdefault(chunk_id, (position, heading, text))
+        
+        # Embed outside the lock; other pages can be indexed meanwhile
+        stored = self.backend.get_payloads(wanted)
+        new_ids = [chunk_id for chunk_id in wanted if chunk_id not in stored]
+        vectors: Any = []
+        if new_ids:
+            texts = [f"{wanted[chunk_id][1]}\n{wanted[chunk_id][2]}".strip() for chunk_id in new_ids]
+            vectors = self.embedder(texts)
+        
+        with self._lock:
+            self.embedded += len(new_ids)
+            self.deduplicated += len(wanted) - len(new_ids)
+            
+            # Another page may have stored some of the same chunks while we embedded
+            stored = self.backend.get_payloads(wanted)
+            fresh = [index for index, chunk_id in enumerate(new_ids) if chunk_id not in stored]
+            if fresh:
+                self.backend.upsert(
+                    [new_ids[index] for index in fresh],
+                    [vectors[index] for index in fresh],
+                    [
+                        {
+                            **self._url_payload([url]),
+                            "heading": wanted[new_ids[index]][1],
+                            "text": wanted[new_ids[index]][2],
+                            "position": wanted[new_ids[index]][0]
+                        }
+                        for index in fresh
+                    ]
+                )
+            
+            for chunk_id, payload in stored.items():
+                urls = payload.get("urls", [])
+                # Chunks stored before url_prefixes existed gain it here
+                if url not in urls or "url_prefixes" not in payload:
+                    self.backend.set_payload(chunk_id, {**payload, **self._url_payload([*urls, url])})
+            
+            self._release(url, self._page_chunks(url) - set(wanted))
+            self._url_chunks[url] = set(wanted)
+            return len(new_ids)
+    
+    @staticmethod
+    def _url_payload(urls: Iterable[str]) -> Dict[str, List[str]]:
+        """The "urls" payload plus the url_prefixes keywords url_prefix searches filter on"""
+        urls = sorted(set(urls))
+        return {"urls": urls, "url_prefixes": sorted({prefix for url in urls for prefix in url_prefixes(url)})}
+    
+    def _release(self, url: str, chunk_ids: Set[str]):
+        """Drop a URL's reference to chunks, deleting chunks no page references"""
+        orphaned = []
+        for chunk_id, payload in self.backend.get_payloads(chunk_ids).items():
+            urls = [other for other in payload.get("urls", []) if other != url]
+            if urls:
+                self.backend.set_payload(chunk_id, {**payload, **self._url_payload(urls)})
+            else:
+                orphaned.append(chunk_id)
+        self.backend.delete(orphaned)
+    
+    def remove_page(self, url: str):
+        """Forget a page and any chunks only it contained"""
+        with self._lock:
+            self._release(url, self._page_chunks(url))
+            self._url_chunks.pop(url, None)
+    
+    def has_page(self, url: str) -> bool:
+        with self._lock:
+            return bool(self._page_chunks(url))
+    
+    def search(self, query: str, k: int = 5, url_prefix: Optional[str] = None) -> List[SearchHit]:
+        """
+        Find the chunks most similar to a query
+        
+        Args:
+            query: Search text
+            k: Number of results
+            url_prefix: Only return chunks from URLs starting with this prefix
+            
+        Returns:
+            Hits sorted by descending similarity
+        """
+        where = None
+        match = None
+        if url_prefix:
+            # The backend narrows to chunks under the prefix's last "/" (server
+            # side for Qdrant); the exact prefix check runs on those only
+            where = lambda payload: any(url.startswith(url_prefix) for url in payload.get("urls", []))
+            key = prefix_key(url_prefix)
+            if key is not None:
+                match = {"url_prefixes": key}
+        vector = self.embedder([query])[0]
+        return self.backend.search(vector, k, where, match)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get index counters"""
+        return {
+            "pages": len(self._url_chunks),
+            "chunks": len(self.backend),
+            "embedded": self.embedded,
+            "deduplicated": self.deduplicated
+        }
@@ -1,67 +1,2568 @@
 from pydantic_ai import Agent, RunContext
+from abc import ABC, abstractmethod
 import httpx
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from bs4.builder import HTMLTreeBuilder
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Sequence, Tuple, Union
+import asyncio
+import codecs
+import concurrent.futures
+import functools
+import hashlib
+import importlib.util
 import json
+import logging
+import math
+import multiprocessing
+import os
 import re
-from urllib.parse import urljoin
+import threading
+import time
+import zlib
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from vector_index import ScrapedContentIndex
+
+try:
+    # Optional drop-in for `re` with per-call timeouts
+    import regex as regex_module
+except ImportError:
+    regex_module = None
 
 # Web Scraping Tools for ARCHON Agent Builder
 # Compatible with Pydantic AI agent framework
 
+logger = logging.getLogger(__name__)
+
+# httpx only negotiates HTTP/2 when the optional `h2` package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class SharedHTTPClient:
+    """Long-lived, pooled HTTP client shared by web scraping tools"""
+    
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        max_connections_per_host: int = 6,
+        http2: Optional[bool] = None,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        """
+        Initialize the shared client
+        
+        Args:
+            client: Existing httpx client to use instead of building one.
+                The caller keeps ownership of its lifetime.
+            max_connections: Total connections across all hosts
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept alive
+            max_connections_per_host: Concurrent requests allowed per host
+            http2: Negotiate HTTP/2 where offered (defaults to on when `h2` is installed)
+            headers: Default headers sent with every request
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.max_connections_per_host = max_connections_per_host
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        self.headers = headers or {}
+        self._client = client
+        self._owns_client = client is None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._closing: set = set()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The underlying httpx client, created lazily on the running event loop"""
+        if not self._owns_client:
+            return self._client
+        
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Pooled connections are bound to the loop that opened them, so a
+            # new event loop (e.g. a second asyncio.run) needs a fresh pool
+            if self._client is not None:
+                self._retire(self._client, self._loop)
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                headers=self.headers
+            )
+            self._loop = loop
+            self._host_slots = {}
+        return self._client
+    
+    def _retire(self, client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]):
+        """Close a client left behind by another event loop"""
+        if loop is not None and loop.is_running():
+            # Still serving another thread: close the client where its connections live
+            asyncio.run_coroutine_threadsafe(self._close_quietly(client), loop)
+            return
+        task = asyncio.ensure_future(self._close_quietly(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    @staticmethod
+    async def _close_quietly(client: httpx.AsyncClient):
+        try:
+            await client.aclose()
+        except Exception as e:
+            # Connections of a closed loop may fail to shut down cleanly
+            logger.debug("Error closing HTTP client of a previous event loop: %s", e)
+    
+    def host_slot(self, url: str) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent requests to the host of a URL"""
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_slots[host] = slot
+        return slot
+    
+    async def get(self, url: str, timeout: float = 30, **kwargs) -> httpx.Response:
+        """
+        Send a GET request over the pooled connections
+        
+        Args:
+            url: The URL to fetch
+            timeout: Request timeout in seconds
+            
+        Returns:
+            httpx response
+        """
+        client = self.client
+        async with self.host_slot(url):
+            return await client.get(url, timeout=timeout, **kwargs)
+    
+    @asynccontextmanager
+    async def stream(self, url: str, timeout: float = 30, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Send a GET request whose body is read incrementally
+        
+        Args:
+            url: The URL to fetch
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Context manager yielding an httpx response with an unread body
+        """
+        client = self.client
+        async with self.host_slot(url):
+            async with client.stream("GET", url, timeout=timeout, **kwargs) as response:
+                yield response
+    
+    async def aclose(self):
+        """Close pooled connections (no-op for clients owned by the caller)"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+            self._host_slots = {}
+
+
+# Compiled patterns reused across find_by_pattern calls
+PATTERN_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern: str) -> Any:
+    """Compile a regex pattern, using the `regex` package when installed"""
+    return (regex_module or re).compile(pattern)
+
+
+def _findall_limited(compiled: Any, text: str, max_matches: int, **kwargs) -> List[Any]:
+    """re.findall() that stops after max_matches matches"""
+    matches = []
+    for match in compiled.finditer(text, **kwargs):
+        if compiled.groups == 0:
+            matches.append(match.group(0))
+        elif compiled.groups == 1:
+            matches.append(match.group(1) or '')
+        else:
+            matches.append(match.groups(default=''))
+        if len(matches) >= max_matches:
+            break
+    return matches
+
+
+def _pattern_worker(connection: Any):
+    """Worker process loop: answer searches until the pipe is closed"""
+    connection.send(("ready", None))
+    while True:
+        try:
+            pattern, text, max_matches = connection.recv()
+        except EOFError:
+            break
+        try:
+            connection.send(("ok", _findall_limited(compile_pattern(pattern), text, max_matches)))
+        except Exception as e:
+            connection.send(("error", e))
+
+
+class PatternWorkerPool:
+    """
+    Reusable worker processes for searches that may need to be killed
+    
+    Workers start through forkserver or spawn, since forking a threaded
+    process can copy held locks into the child, and serve one search at a
+    time. A worker that overruns its deadline is killed and the next search
+    starts a fresh one; the others are kept warm for reuse.
+    """
+    
+    def __init__(self, max_idle: int = 2):
+        """
+        Initialize the pool
+        
+        Args:
+            max_idle: Idle workers kept running between searches
+        """
+        self.max_idle = max_idle
+        self._idle: List[Tuple[Any, Any]] = []
+        self._lock = threading.Lock()
+    
+    def _start(self) -> Tuple[Any, Any]:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        connection, child_connection = context.Pipe()
+        process = context.Process(target=_pattern_worker, args=(child_connection,), daemon=True)
+        process.start()
+        child_connection.close()
+        # Wait for the worker to finish importing, so start-up time is not
+        # charged to the first search's deadline
+        try:
+            connection.recv()
+        except EOFError:
+            self._stop((process, connection))
+            raise RuntimeError("Pattern worker exited during start-up")
+        return process, connection
+    
+    @staticmethod
+    def _stop(worker: Tuple[Any, Any]):
+        process, connection = worker
+        connection.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+    
+    def search(self, pattern: str, text: str, max_matches: int, timeout: float) -> List[Any]:
+        """
+        Run a search in a worker process, killing it at the deadline
+        
+        Args:
+            pattern: Regex pattern
+            text: Text to search
+            max_matches: Stop after this many matches
+            timeout: Seconds before the search is abandoned
+            
+        Returns:
+            Matches in re.findall() format
+        """
+        worker = None
+        with self._lock:
+            while self._idle and worker is None:
+                worker = self._idle.pop()
+                if not worker[0].is_alive():
+                    self._stop(worker)
+                    worker = None
+        if worker is None:
+            worker = self._start()
+        
+        process, connection = worker
+        try:
+            connection.send((pattern, text, max_matches))
+            if not connection.poll(timeout):
+                raise TimeoutError(f"Pattern timed out after {timeout}s")
+            status, value = connection.recv()
+        except BaseException:
+            self._stop(worker)
+            raise
+        
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(worker)
+                worker = None
+        if worker is not None:
+            self._stop(worker)
+        if status == "error":
+            raise value
+        return value
+    
+    def shutdown(self):
+        """Stop the idle workers; new ones start if the pool is used again"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._stop(worker)
+
+
+# Workers for searches when the `regex` package is not installed
+_pattern_workers = PatternWorkerPool()
+
+
+async def search_pattern(
+    pattern: str,
+    text: str,
+    max_matches: int = 1000,
+    timeout: float = 2.0
+) -> List[Any]:
+    """
+    Find regex matches with a match-count limit and a wall-clock limit
+    
+    Python's re module cannot be interrupted, so without the `regex` package
+    (which supports timeouts natively) the search runs in a reusable worker
+    process that is killed at the deadline.
+    
+    Args:
+        pattern: Regex pattern
+        text: Text to search
+        max_matches: Stop after this many matches
+        timeout: Seconds before the search is abandoned
+        
+    Returns:
+        Matches in re.findall() format
+    """
+    # Compile in-process so invalid patterns fail fast and warm the cache
+    compiled = compile_pattern(pattern)
+    if regex_module is not None:
+        return await asyncio.to_thread(
+            _findall_limited, compiled, text, max_matches, timeout=timeout, concurrent=True
+        )
+    return await asyncio.to_thread(_pattern_workers.search, pattern, text, max_matches, timeout)
+
+
+# Elements whose content is never part of the readable page text
+NON_TEXT_TAGS = frozenset(["script", "style"])
+
+
+def iter_visible_strings(node: Tag) -> Iterator[str]:
+    """
+    Yield the text strings under a node in document order, skipping
+    script and style content without modifying the tree
+    
+    Args:
+        node: Parsed document or element
+        
+    Returns:
+        Iterator over text strings
+    """
+    stack = list(reversed(node.contents))
+    while stack:
+        element = stack.pop()
+        if isinstance(element, Tag):
+            if element.name not in NON_TEXT_TAGS:
+                stack.extend(reversed(element.contents))
+        elif type(element) in (NavigableString, CData):
+            # Same string types get_text() collects; comments and doctypes are skipped
+            yield element
+
+
+def clean_text(text: str) -> str:
+    """Collapse page text into a single line of space-separated phrases"""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+# Where clean_text splits phrases: the line breaks str.splitlines knows and double spaces
+PHRASE_BOUNDARY = re.compile("[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]|  ")
+
+
+# Response bodies fetch_webpage reads by default (10 MB)
+DEFAULT_MAX_RESPONSE_BYTES = 10 * 1024 * 1024
+
+# Content types fetch_webpage accepts; responses without a content type are allowed
+DEFAULT_ALLOWED_CONTENT_TYPES = (
+    "text/html",
+    "application/xhtml+xml",
+    "text/plain",
+    "text/xml",
+    "application/xml",
+    "application/json",
+)
+
+# Media types whose bodies are chunked into the scraped-content index
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a streamed page fetch"""
+    url: str
+    status_code: Optional[int] = None
+    content_type: str = ""
+    text: str = ""
+    bytes_read: int = 0
+    truncated: bool = False
+    error: Optional[str] = None
+    from_cache: bool = False
+
+
+class IncrementalTextExtractor(HTMLParser):
+    """
+    Collects readable page text from HTML fed in chunks
+    
+    Produces the same text as extract_text, so extraction can run while the
+    page is still downloading and stop once enough text has been collected.
+    
+    With max_chars set, the cleaned length is tracked as data arrives:
+    text up to the last phrase boundary is cleaned once, and only the
+    whitespace at the ends of the unfinished phrase after it is tracked,
+    so is_full costs the same however much text has been fed.
+    """
+    
+    def __init__(self, max_chars: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        # Cleaned length of the text before the last phrase boundary
+        self._cleaned_chars = 0
+        # The unfinished phrase after it, with its leading/trailing whitespace counts
+        self._tail: List[str] = []
+        self._tail_chars = 0
+        self._tail_lead = 0
+        self._tail_trail = 0
+        self._tail_has_text = False
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in NON_TEXT_TAGS:
+            self._skip_depth += 1
+    
+    def handle_endtag(self, tag: str):
+        if tag in NON_TEXT_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+    
+    def handle_data(self, data: str):
+        if not self._skip_depth:
+            self._parts.append(data)
+            if self.max_chars:
+                self._count(data)
+    
+    def _count(self, data: str):
+        """Fold newly collected text into the cleaned-length counters"""
+        # The tail's last character may start a double-space boundary
+        carry = self._tail[-1][-1:] if self._tail else ""
+        boundary_end = None
+        for match in PHRASE_BOUNDARY.finditer(carry + data):
+            boundary_end = match.end() - len(carry)
+        if boundary_end is not None:
+            cleaned = clean_text(''.join(self._tail) + data[:boundary_end])
+            if cleaned:
+                self._cleaned_chars += len(cleaned) + (1 if self._cleaned_chars else 0)
+            self._tail = []
+            self._tail_chars = self._tail_lead = self._tail_trail = 0
+            self._tail_has_text = False
+            data = data[boundary_end:]
+        if not data:
+            return
+        
+        self._tail.append(data)
+        self._tail_chars += len(data)
+        stripped = data.rstrip()
+        if not stripped:
+            self._tail_trail += len(data)
+            if not self._tail_has_text:
+                self._tail_lead += len(data)
+            return
+        self._tail_trail = len(data) - len(stripped)
+        if not self._tail_has_text:
+            self._tail_lead += len(data) - len(data.lstrip())
+            self._tail_has_text = True
+    
+    @property
+    def cleaned_chars(self) -> int:
+        """Length of the cleaned text collected so far (tracked only with max_chars)"""
+        if not self._tail_has_text:
+            return self._cleaned_chars
+        tail = self._tail_chars - self._tail_lead - self._tail_trail
+        return self._cleaned_chars + tail + (1 if self._cleaned_chars else 0)
+    
+    @property
+    def text(self) -> str:
+        """Text collected so far, cleaned and cut to max_chars"""
+        text = clean_text(''.join(self._parts))
+        return text[:self.max_chars] if self.max_chars else text
+    
+    @property
+    def is_full(self) -> bool:
+        """Whether max_chars of cleaned text have been collected"""
+        return bool(self.max_chars) and self.cleaned_chars >= self.max_chars
+
+
+@dataclass
+class CachedResponse:
+    """Stored page body with the headers needed for freshness and revalidation"""
+    url: str
+    content_type: str
+    body: bytes  # zlib-compressed UTF-8 text
+    stored_at: float
+    freshness_lifetime: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Stored freshness headers, merged with a 304's headers on revalidation
+    headers: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def text(self) -> str:
+        return zlib.decompress(self.body).decode('utf-8')
+    
+    @property
+    def size(self) -> int:
+        return len(self.body)
+    
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - self.stored_at < self.freshness_lifetime
+    
+    def to_bytes(self) -> bytes:
+        """Serialize as a JSON header line followed by the compressed body"""
+        header = {key: value for key, value in vars(self).items() if key != 'body'}
+        header['body_size'] = len(self.body)
+        return json.dumps(header).encode('utf-8') + b"\n" + self.body
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        """
+        Deserialize an entry written by to_bytes
+        
+        Raises:
+            ValueError: If the data is truncated or otherwise corrupt
+        """
+        try:
+            header, body = data.split(b"\n", 1)
+            fields = json.loads(header)
+            body_size = fields.pop('body_size', len(body))
+            if body_size != len(body):
+                raise ValueError(f"body is {len(body)} bytes, expected {body_size}")
+            return cls(body=body, **fields)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"Corrupt cache entry: {e}") from e
+
+
+class MemoryCacheStore:
+    """In-process LRU response store bounded by compressed size"""
+    
+    # Private to this process, so Cache-Control: private responses may be stored
+    shared = False
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+    
+    async def set(self, key: str, entry: CachedResponse):
+        await self.delete(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.current_bytes += entry.size
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.size
+    
+    async def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+
+
+class DiskCacheStore:
+    """On-disk response store, one file per URL, evicting least recently used files"""
+    
+    shared = False
+    
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # key -> file size in LRU order, seeded from modification times so the
+        # order survives restarts; eviction never has to list the directory
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        files = []
+        for path in self.directory.glob("*.cache"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self._sizes[key] = size
+        self.current_bytes = sum(self._sizes.values())
+        self._lock = threading.Lock()
+    
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.cache"
+    
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            # Reads refresh the modification time the LRU order is seeded from
+            os.utime(path)
+        except OSError:
+            return None
+        try:
+            entry = CachedResponse.from_bytes(data)
+        except ValueError as e:
+            logger.warning("Dropping corrupt cache file %s: %s", path, e)
+            with self._lock:
+                self._remove(key)
+            return None
+        with self._lock:
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        return entry
+    
+    def _write(self, key: str, entry: CachedResponse):
+        data = entry.to_bytes()
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(data)
+        with self._lock:
+            self._remove(key)
+            os.replace(temp_path, path)
+            self._sizes[key] = len(data)
+            self.current_bytes += len(data)
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+    
+    def _remove(self, key: str):
+        """Delete a cache file and stop accounting for its size (lock held)"""
+        self.current_bytes -= self._sizes.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+    
+    def _evict(self):
+        """Remove the least recently used files until within budget (lock held)"""
+        while self.current_bytes > self.max_bytes and self._sizes:
+            self._remove(next(iter(self._sizes)))
+    
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return await asyncio.to_thread(self._read, key)
+    
+    async def set(self, key: str, entry: CachedResponse):
+        await asyncio.to_thread(self._write, key, entry)
+    
+    async def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+
+class RedisCacheStore:
+    """
+    Redis-backed response store shared by every worker
+    
+    Size is bounded by the server's maxmemory policy (allkeys-lru); entries
+    also expire once they are stale and past retain_stale seconds.
+    """
+    
+    # Visible to every worker, so Cache-Control: private responses are not stored
+    shared = True
+    
+    def __init__(
+        self,
+        url: str = os.getenv("REDIS_URL", "redis://localhost:6379"),
+        prefix: str = "archon:http-cache:",
+        retain_stale: float = 24 * 3600
+    ):
+        import redis.asyncio as redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.retain_stale = retain_stale
+    
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        data = await self.client.get(self.prefix + key)
+        if not data:
+            return None
+        try:
+            return CachedResponse.from_bytes(data)
+        except ValueError as e:
+            logger.warning("Dropping corrupt cache entry %s: %s", key, e)
+            await self.delete(key)
+            return None
+    
+    async def set(self, key: str, entry: CachedResponse):
+        expires_in = int(entry.freshness_lifetime + self.retain_stale)
+        await self.client.set(self.prefix + key, entry.to_bytes(), ex=max(expires_in, 1))
+    
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into directive -> argument"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    """Parse an HTTP date header to a timestamp"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class HTTPResponseCache:
+    """
+    HTTP response cache for fetched pages
+    
+    Honors Cache-Control and Expires, revalidates stale entries with ETag /
+    Last-Modified (304 Not Modified), and stores bodies zlib-compressed in a
+    MemoryCacheStore, DiskCacheStore or RedisCacheStore. Stores with
+    shared = True (Redis) act as a shared cache and skip private responses.
+    """
+    
+    # Headers kept with an entry so a 304 can be merged into them (RFC 9111 4.3.4)
+    FRESHNESS_HEADERS = ('cache-control', 'expires', 'date', 'age', 'last-modified', 'etag', 'vary')
+    
+    # Share of a page's age since Last-Modified treated as fresh (RFC 9111 4.2.2)
+    HEURISTIC_FRACTION = 0.1
+    MAX_HEURISTIC_LIFETIME = 24 * 3600
+    
+    def __init__(self, store: Any = None, default_ttl: float = 0.0):
+        """
+        Initialize the cache
+        
+        Args:
+            store: Response store (defaults to an in-process MemoryCacheStore)
+            default_ttl: Freshness lifetime for responses without caching headers
+        """
+        self.store = store or MemoryCacheStore()
+        self.shared = getattr(self.store, 'shared', False)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.stores = 0
+        self.bytes_saved = 0
+    
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    
+    def freshness_lifetime(self, headers: httpx.Headers, now: float) -> Optional[float]:
+        """
+        Seconds a response stays fresh, or None when it must not be stored
+        
+        Args:
+            headers: Response headers
+            now: Current timestamp
+            
+        Returns:
+            Freshness lifetime in seconds
+        """
+        directives = _parse_cache_control(headers.get('cache-control', ''))
+        if 'no-store' in directives or headers.get('vary', '').strip() == '*':
+            return None
+        if self.shared and 'private' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0.0
+        
+        age = float(headers.get('age', 0) or 0)
+        for directive in ('s-maxage', 'max-age'):
+            if directives.get(directive):
+                try:
+                    return max(int(directives[directive]) - age, 0.0)
+                except ValueError:
+                    return 0.0
+        
+        date = _parse_http_date(headers.get('date')) or now
+        expires = headers.get('expires')
+        if expires is not None:
+            expires_at = _parse_http_date(expires)
+            return max(expires_at - date - age, 0.0) if expires_at else 0.0
+        
+        last_modified = _parse_http_date(headers.get('last-modified'))
+        if last_modified is not None:
+            return min((date - last_modified) * self.HEURISTIC_FRACTION, self.MAX_HEURISTIC_LIFETIME)
+        return self.default_ttl
+    
+    async def lookup(self, url: str) -> Tuple[Optional[CachedResponse], bool]:
+        """
+        Get the stored response for a URL, fresh or stale
+        
+        Args:
+            url: The URL to look up
+            
+        Returns:
+            The entry (or None) and whether it is fresh; fresh entries count as hits
+        """
+        entry = await self.store.get(self.key_for(url))
+        fresh = entry is not None and entry.is_fresh()
+        if fresh:
+            self.hits += 1
+        return entry, fresh
+    
+    def record_miss(self):
+        """Count a lookup answered by a full download"""
+        self.misses += 1
+    
+    def validators(self, entry: CachedResponse) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+    
+    async def store_response(self, url: str, response: httpx.Response, text: str):
+        """Store a complete 200 response if its headers allow it"""
+        now = time.time()
+        lifetime = self.freshness_lifetime(response.headers, now)
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        if lifetime is None or (lifetime <= 0 and not etag and not last_modified):
+            return
+        
+        entry = CachedResponse(
+            url=url,
+            content_type=response.headers.get('content-type', ''),
+            body=zlib.compress(text.encode('utf-8')),
+            stored_at=now,
+            freshness_lifetime=lifetime,
+            etag=etag,
+            last_modified=last_modified,
+            headers=self._freshness_headers(response.headers)
+        )
+        await self.store.set(self.key_for(url), entry)
+        self.stores += 1
+    
+    def _freshness_headers(self, headers: httpx.Headers) -> Dict[str, str]:
+        return {name: headers[name] for name in self.FRESHNESS_HEADERS if name in headers}
+    
+    async def refresh(self, entry: CachedResponse, response: httpx.Response):
+        """
+        Update a revalidated entry from a 304 response
+        
+        The 304's headers replace the stored ones they name and the rest are
+        kept (RFC 9111 4.3.4), so a 304 carrying only an ETag still renews the
+        stored max-age. Date and Age describe the original response and are
+        only taken from the 304.
+        """
+        self.revalidations += 1
+        now = time.time()
+        stored = {
+            name: value for name, value in entry.headers.items() if name not in ('date', 'age')
+        }
+        merged = httpx.Headers({**stored, **self._freshness_headers(response.headers)})
+        lifetime = self.freshness_lifetime(merged, now)
+        if lifetime is None:
+            await self.store.delete(self.key_for(entry.url))
+            return
+        entry.stored_at = now
+        entry.freshness_lifetime = lifetime
+        entry.etag = merged.get('etag', entry.etag)
+        entry.last_modified = merged.get('last-modified', entry.last_modified)
+        entry.headers = self._freshness_headers(merged)
+        await self.store.set(self.key_for(entry.url), entry)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.revalidations + self.misses
+        return {
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": (self.hits + self.revalidations) / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved
+        }
+
+
+def _content_type_allowed(content_type: str, allowed: Optional[Sequence[str]]) -> bool:
+    """Check a Content-Type header against an allowlist of media types"""
+    if not allowed or not content_type:
+        return True
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type in allowed
+
+
+async def fetch_page(
+    http_client: SharedHTTPClient,
+    url: str,
+    timeout: float = 30,
+    max_bytes: Optional[int] = DEFAULT_MAX_RESPONSE_BYTES,
+    allowed_content_types: Optional[Sequence[str]] = DEFAULT_ALLOWED_CONTENT_TYPES,
+    on_text: Optional[Callable[[str], bool]] = None,
+    cache: Optional[HTTPResponseCache] = None,
+    telemetry: Optional[Any] = None
+) -> FetchResult:
+    """
+    Stream a page body in chunks, enforcing a byte budget and a content-type allowlist
+    
+    Args:
+        http_client: Client to fetch with
+        url: The URL to fetch
+        timeout: Request timeout in seconds
+        max_bytes: Stop reading after this many body bytes (None for no limit)
+        allowed_content_types: Media types to accept (None to accept any)
+        on_text: Called with each decoded chunk; returning True stops the download
+        cache: Response cache to serve fresh pages from and revalidate stale ones
+        telemetry: Records a fetch span and the bytes read per status
+        
+    Returns:
+        FetchResult with the decoded body read so far
+    """
+    if telemetry is None:
+        return await _fetch_page(
+            http_client, url, timeout, max_bytes, allowed_content_types, on_text, cache
+        )
+    
+    with telemetry.span("fetch", {"status": ""}, url=url) as span:
+        result = await _fetch_page(
+            http_client, url, timeout, max_bytes, allowed_content_types, on_text, cache
+        )
+        status = str(result.status_code) if result.status_code else "error"
+        span.set_label("status", status)
+        span.set_attribute("bytes", result.bytes_read)
+        span.set_attribute("from_cache", result.from_cache)
+        if result.error:
+            span.fail(result.error)
+    telemetry.counter(
+        "fetch_bytes_total", "Response body bytes read by fetches", ("status",)
+    ).add(result.bytes_read, {"status": status})
+    return result
+
+
+async def _fetch_page(
+    http_client: SharedHTTPClient,
+    url: str,
+    timeout: float,
+    max_bytes: Optional[int],
+    allowed_content_types: Optional[Sequence[str]],
+    on_text: Optional[Callable[[str], bool]],
+    cache: Optional[HTTPResponseCache]
+) -> FetchResult:
+    """fetch_page without instrumentation"""
+    result = FetchResult(url=url)
+    cached, fresh = await cache.lookup(url) if cache is not None else (None, False)
+    if fresh:
+        return _cached_result(url, cached, 200, max_bytes, allowed_content_types, on_text, cache)
+    
+    headers = cache.validators(cached) if cached is not None else {}
+    try:
+        async with http_client.stream(url, timeout=timeout, headers=headers) as response:
+            result.status_code = response.status_code
+            result.content_type = response.headers.get("content-type", "")
+            if cached is not None and response.status_code == 304:
+                await cache.refresh(cached, response)
+                return _cached_result(url, cached, 304, max_bytes, allowed_content_types, on_text, cache)
+            if cache is not None:
+                cache.record_miss()
+            response.raise_for_status()
+            
+            if not _content_type_allowed(result.content_type, allowed_content_types):
+                result.error = f"Unsupported content type: {result.content_type}"
+                return result
+            
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            parts = []
+            async for chunk in response.aiter_bytes():
+                if max_bytes is not None and result.bytes_read + len(chunk) > max_bytes:
+                    chunk = chunk[:max_bytes - result.bytes_read]
+                    result.truncated = True
+                result.bytes_read += len(chunk)
+                text = decoder.decode(chunk)
+                parts.append(text)
+                if on_text is not None and on_text(text):
+                    result.truncated = True
+                    break
+                if result.truncated:
+                    break
+            parts.append(decoder.decode(b"", final=not result.truncated))
+            result.text = ''.join(parts)
+            
+            if cache is not None and not result.truncated and response.status_code == 200:
+                await cache.store_response(url, response, result.text)
+    except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+        # Malformed URLs (e.g. an unclosed IPv6 host) raise ValueError from
+        # urlsplit or InvalidURL from httpx; report them like network errors
+        result.error = str(e)
+    return result
+
+
+def _cached_result(
+    url: str,
+    cached: CachedResponse,
+    status_code: int,
+    max_bytes: Optional[int],
+    allowed_content_types: Optional[Sequence[str]],
+    on_text: Optional[Callable[[str], bool]],
+    cache: HTTPResponseCache
+) -> FetchResult:
+    """Build a FetchResult from a cached body, applying the same limits as a download"""
+    if not _content_type_allowed(cached.content_type, allowed_content_types):
+        return FetchResult(
+            url=url,
+            status_code=status_code,
+            content_type=cached.content_type,
+            error=f"Unsupported content type: {cached.content_type}",
+            from_cache=True
+        )
+    
+    text = cached.text
+    body = text.encode('utf-8')
+    cache.bytes_saved += len(body)
+    
+    truncated = max_bytes is not None and len(body) > max_bytes
+    if truncated:
+        body = body[:max_bytes]
+        text = body.decode('utf-8', errors='ignore')
+    if on_text is not None:
+        on_text(text)
+    
+    return FetchResult(
+        url=url,
+        status_code=status_code,
+        content_type=cached.content_type,
+        text=text,
+        bytes_read=len(body),
+        truncated=truncated,
+        from_cache=True
+    )
+
+
+class ParserBackend(ABC):
+    """
+    HTML parsing engine used by the extraction tools
+    
+    Every backend must return exactly what the html.parser backend returns
+    for well-formed markup; PARSER_CONFORMANCE_CORPUS and
+    check_parser_conformance verify that. Broken markup (e.g. unclosed <p>)
+    may still be repaired differently by HTML5 engines than by html.parser.
+    """
+    
+    name = ""
+    
+    # Whether parse() returns a BeautifulSoup tree usable by every tool
+    is_soup = False
+    
+    @abstractmethod
+    def parse(self, html: str) -> Any:
+        """Parse a page into the backend's document type"""
+    
+    @abstractmethod
+    def extract_text(self, document: Any) -> str:
+        """Return the visible text of a document, cleaned like clean_text"""
+    
+    @abstractmethod
+    def find_links(self, document: Any) -> List[Tuple[str, str]]:
+        """Return (text, href) pairs for every link with an href"""
+    
+    @abstractmethod
+    def extract_tables(self, document: Any) -> List[List[List[str]]]:
+        """Return every table as rows of stripped cell texts"""
+    
+    @abstractmethod
+    def select_elements(self, document: Any, selector: str) -> List[Dict[str, Any]]:
+        """Return tag, text and attributes of the elements matching a CSS selector"""
+
+
+class BeautifulSoupBackend(ParserBackend):
+    """BeautifulSoup with a pluggable tree builder (html.parser or lxml)"""
+    
+    is_soup = True
+    
+    def __init__(self, features: str = 'html.parser'):
+        self.name = features
+        self.features = features
+    
+    def parse(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, self.features)
+    
+    def extract_text(self, document: BeautifulSoup) -> str:
+        return clean_text(''.join(iter_visible_strings(document)))
+    
+    def find_links(self, document: BeautifulSoup) -> List[Tuple[str, str]]:
+        return [
+            (a_tag.get_text(strip=True), a_tag['href'])
+            for a_tag in document.find_all('a', href=True)
+        ]
+    
+    def extract_tables(self, document: BeautifulSoup) -> List[List[List[str]]]:
+        tables = []
+        for table in document.find_all('table'):
+            table_data = []
+            for row in table.find_all('tr'):
+                row_data = []
+                for cell in row.find_all(['td', 'th']):
+                    row_data.append(cell.get_text(strip=True))
+                table_data.append(row_data)
+            tables.append(table_data)
+        return tables
+    
+    def select_elements(self, document: BeautifulSoup, selector: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "tag": element.name,
+                "text": element.get_text(strip=True),
+                "attributes": dict(element.attrs)
+            }
+            for element in document.select(selector)
+        ]
+
+
+class SelectolaxBackend(ParserBackend):
+    """C-based selectolax engine (lexbor, or Modest on selectolax < 0.3.13)"""
+    
+    name = 'selectolax'
+    
+    def parse(self, html: str) -> Any:
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError:
+            from selectolax.parser import HTMLParser as LexborHTMLParser
+        return LexborHTMLParser(html)
+    
+    def extract_text(self, document: Any) -> str:
+        parts = []
+        stack = [document.root] if document.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.tag == '-text':
+                parts.append(node.text_content or '')
+            # Comments are '-comment' (lexbor) or '_comment' (Modest)
+            elif node.tag not in NON_TEXT_TAGS and not node.tag.startswith(('-', '_')):
+                stack.extend(reversed(list(node.iter(include_text=True))))
+        return clean_text(''.join(parts))
+    
+    def find_links(self, document: Any) -> List[Tuple[str, str]]:
+        return [
+            (node.text(deep=True, separator='', strip=True), node.attributes.get('href') or '')
+            for node in document.css('a[href]')
+        ]
+    
+    def extract_tables(self, document: Any) -> List[List[List[str]]]:
+        return [
+            [
+                [cell.text(deep=True, separator='', strip=True) for cell in row.css('td, th')]
+                for row in table.css('tr')
+            ]
+            for table in document.css('table')
+        ]
+    
+    def select_elements(self, document: Any, selector: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "tag": node.tag,
+                "text": node.text(deep=True, separator='', strip=True),
+                "attributes": self._soup_attributes(node.tag, node.attributes)
+            }
+            for node in document.css(selector)
+        ]
+    
+    @staticmethod
+    def _soup_attributes(tag: str, attributes: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        """Match BeautifulSoup's attribute values (multi-valued attributes become lists)"""
+        list_attributes = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+        multi_valued = set(list_attributes.get('*', [])) | set(list_attributes.get(tag, []))
+        result = {}
+        for key, value in attributes.items():
+            value = value or ''
+            result[key] = value.split() if key in multi_valued else value
+        return result
+
+
+# Backend name -> (factory, module that must be importable)
+PARSER_BACKENDS: Dict[str, Tuple[Callable[[], ParserBackend], Optional[str]]] = {
+    'html.parser': (lambda: BeautifulSoupBackend('html.parser'), None),
+    'lxml': (lambda: BeautifulSoupBackend('lxml'), 'lxml'),
+    'selectolax': (SelectolaxBackend, 'selectolax'),
+}
+
+DEFAULT_PARSER = os.getenv("ARCHON_HTML_PARSER", "html.parser")
+
+_parser_backends: Dict[str, ParserBackend] = {}
+
+
+def get_parser_backend(name: Optional[str] = None) -> ParserBackend:
+    """
+    Get a parser backend by name, falling back to html.parser when the
+    requested engine is not installed
+    
+    Args:
+        name: 'html.parser', 'lxml' or 'selectolax' (defaults to ARCHON_HTML_PARSER)
+        
+    Returns:
+        Parser backend instance
+    """
+    name = name or DEFAULT_PARSER
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {name}")
+    
+    factory, module = PARSER_BACKENDS[name]
+    if module and importlib.util.find_spec(module) is None:
+        logger.warning("HTML parser backend %s is not installed, using html.parser", name)
+        name = 'html.parser'
+        factory, module = PARSER_BACKENDS[name]
+    
+    if name not in _parser_backends:
+        _parser_backends[name] = factory()
+    return _parser_backends[name]
+
+
+def get_soup_backend(backend: ParserBackend) -> ParserBackend:
+    """Get a BeautifulSoup backend for tools that need the full soup API"""
+    if backend.is_soup:
+        return backend
+    return get_parser_backend('lxml')
+
+
+# Small pages exercising the cases where parsers are known to diverge
+PARSER_CONFORMANCE_CORPUS = [
+    "<html><head><title>T</title></head><body><p>Hello <b>world</b></p></body></html>",
+    "<div>Text<script>var x = '<p>not text</p>';</script>after<style>p {}</style></div>",
+    "<!-- comment --><p>Visible</p><!-- another -->",
+    "<table><tr><th>H1</th><th>H2</th></tr><tr><td>a</td><td> b </td></tr></table>",
+    "<table><thead><tr><td>x</td></tr></thead><tbody><tr><td>y</td></tr></tbody></table>",
+    "<ul><li><a href='https://example.com/x' class='c1 c2' rel='nofollow'>X</a></li>"
+    "<li><a href='y'>  Y  </a></li><li><a>no href</a></li></ul>",
+    "<p>Entities &amp; &lt;tags&gt; &nbsp;and&#160;spaces</p>",
+    "<div id='main'><span class='item'>1</span><span class='item other'>2</span></div>",
+]
+
+# Selectors checked against every corpus page
+PARSER_CONFORMANCE_SELECTORS = ["a", "p", "span.item", "#main span", "td"]
+
+
+def check_parser_conformance(
+    name: str,
+    corpus: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Compare a backend's extraction output with the html.parser reference
+    
+    Args:
+        name: Backend name to check
+        corpus: HTML pages to compare (defaults to PARSER_CONFORMANCE_CORPUS)
+        
+    Returns:
+        List of mismatches, empty when the backend conforms
+    """
+    reference = get_parser_backend('html.parser')
+    backend = get_parser_backend(name)
+    mismatches = []
+    
+    for index, html in enumerate(corpus or PARSER_CONFORMANCE_CORPUS):
+        expected_doc = reference.parse(html)
+        actual_doc = backend.parse(html)
+        checks = {
+            "extract_text": lambda b, d: b.extract_text(d),
+            "find_links": lambda b, d: b.find_links(d),
+            "extract_tables": lambda b, d: b.extract_tables(d),
+        }
+        for selector in PARSER_CONFORMANCE_SELECTORS:
+            checks[f"select_elements({selector})"] = (
+                lambda b, d, selector=selector: b.select_elements(d, selector)
+            )
+        
+        for check, run in checks.items():
+            expected = run(reference, expected_doc)
+            actual = run(backend, actual_doc)
+            if expected != actual:
+                mismatches.append({
+                    "page": index,
+                    "check": check,
+                    "expected": expected,
+                    "actual": actual
+                })
+    
+    return mismatches
+
+
+# Sections extract_page can return
+PAGE_SECTIONS = ("text", "links", "images", "metadata", "tables")
+
+# Node types counted as text by get_text(); comments and doctypes are skipped
+TEXT_STRING_TYPES = (NavigableString, CData)
+
+HEADING_TAGS = frozenset(f"h{i}" for i in range(1, 7))
+
+
+def _absolute_url(url: str, base_url: Optional[str]) -> str:
+    """Convert a relative URL to an absolute one when a base URL is given"""
+    if base_url and not url.startswith(('http://', 'https://')):
+        return urljoin(base_url, url)
+    return url
+
+
+def extract_page_sections(
+    soup: BeautifulSoup,
+    sections: Optional[List[str]] = None,
+    base_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Extract several sections from a parsed document in a single tree walk
+    
+    Each section matches the output of the corresponding single-purpose tool
+    (extract_text, find_links, find_images, extract_metadata, extract_tables).
+    
+    Args:
+        soup: Parsed document
+        sections: Sections to return (defaults to all of PAGE_SECTIONS)
+        base_url: Base URL for relative links and image paths
+        
+    Returns:
+        Dictionary with one entry per requested section
+    """
+    wanted = set(sections or PAGE_SECTIONS)
+    want_text = "text" in wanted
+    want_links = "links" in wanted
+    want_images = "images" in wanted
+    want_metadata = "metadata" in wanted
+    want_tables = "tables" in wanted
+    
+    text_parts: List[str] = []
+    links: List[Tuple[List[str], str]] = []
+    images: List[Dict[str, str]] = []
+    title: Optional[List[str]] = None
+    meta: Dict[str, str] = {}
+    headings: Dict[str, List[List[str]]] = {}
+    tables: List[List[List[List[str]]]] = []
+    
+    # Text accumulators of the elements currently open; a string inside a
+    # nested element counts toward every enclosing one, like get_text()
+    open_collectors: List[List[str]] = []
+    open_tables: List[List[List[List[str]]]] = []
+    open_rows: List[List[List[str]]] = []
+    
+    _EXIT = object()
+    stack: List[Any] = list(reversed(soup.contents))
+    while stack:
+        element = stack.pop()
+        
+        if element is _EXIT:
+            kind = stack.pop()
+            if kind == "collector":
+                open_collectors.pop()
+            elif kind == "table":
+                open_tables.pop()
+            elif kind == "row":
+                open_rows.pop()
+            continue
+        
+        if not isinstance(element, Tag):
+            if type(element) in TEXT_STRING_TYPES:
+                if want_text:
+                    text_parts.append(element)
+                if open_collectors:
+                    stripped = element.strip()
+                    if stripped:
+                        for collector in open_collectors:
+                            collector.append(stripped)
+            continue
+        
+        name = element.name
+        exits = []
+        
+        if want_links and name == 'a' and element.get('href') is not None:
+            collector: List[str] = []
+            links.append((collector, element['href']))
+            open_collectors.append(collector)
+            exits.append("collector")
+        
+        if want_images and name == 'img':
+            images.append({
+                "alt": element.get('alt', ''),
+                "src": _absolute_url(element.get('src', ''), base_url)
+            })
+        
+        if want_metadata:
+            if name == 'title' and title is None:
+                title = []
+                open_collectors.append(title)
+                exits.append("collector")
+            elif name == 'meta':
+                if element.get('name'):
+                    meta[element['name']] = element.get('content', '')
+                elif element.get('property'):
+                    meta[element['property']] = element.get('content', '')
+            elif name in HEADING_TAGS:
+                collector = []
+                headings.setdefault(name, []).append(collector)
+                open_collectors.append(collector)
+                exits.append("collector")
+        
+        if want_tables:
+            if name == 'table':
+                table: List[List[List[str]]] = []
+                tables.append(table)
+                open_tables.append(table)
+                exits.append("table")
+            elif name == 'tr' and open_tables:
+                row: List[List[str]] = []
+                for table in open_tables:
+                    table.append(row)
+                open_rows.append(row)
+                exits.append("row")
+            elif name in ('td', 'th') and open_rows:
+                cell: List[str] = []
+                for row in open_rows:
+                    row.append(cell)
+                open_collectors.append(cell)
+                exits.append("collector")
+        
+        for kind in exits:
+            stack.append(kind)
+            stack.append(_EXIT)
+        if name not in NON_TEXT_TAGS:
+            stack.extend(reversed(element.contents))
+    
+    result: Dict[str, Any] = {}
+    if want_text:
+        result["text"] = clean_text(''.join(text_parts))
+    if want_links:
+        result["links"] = [
+            {"text": ''.join(collector), "url": _absolute_url(href, base_url)}
+            for collector, href in links
+        ]
+    if want_images:
+        result["images"] = images
+    if want_metadata:
+        metadata: Dict[str, Any] = {}
+        if title is not None:
+            metadata['title'] = ''.join(title)
+        metadata['meta'] = meta
+        metadata['headers'] = {
+            level: [''.join(collector) for collector in headings[level]]
+            for level in sorted(headings)
+        }
+        result["metadata"] = metadata
+    if want_tables:
+        result["tables"] = [
+            [[''.join(cell) for cell in row] for row in table]
+            for table in tables
+        ]
+    return result
+
+
+# Page furniture dropped from budgeted text: navigation, headers, footers and sidebars
+BOILERPLATE_TAGS = frozenset(["nav", "header", "footer", "aside", "form", "noscript", "template"])
+BOILERPLATE_ROLES = frozenset(["navigation", "banner", "contentinfo", "complementary", "search"])
+
+# Document metadata rather than page text
+CHUNK_SKIP_TAGS = NON_TEXT_TAGS | frozenset(["head"])
+
+# Elements that end the current paragraph
+BLOCK_TAGS = frozenset([
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd",
+    "blockquote", "pre", "table", "tr", "td", "th", "figure", "figcaption", "br", "hr"
+])
+
+DEFAULT_CHUNK_CHARS = 1200
+
+# Rough characters per token for English text with common BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+TERM_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class TextChunk:
+    """A run of page text under one heading"""
+    heading: str
+    text: str
+    position: int
+    score: float = 0.0
+    
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+    
+    def render(self) -> str:
+        """Chunk text with its heading path on the first line"""
+        return f"{self.heading}\n{self.text}" if self.heading else self.text
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about CHARS_PER_TOKEN characters per token)"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _is_boilerplate(element: Tag) -> bool:
+    return element.name in BOILERPLATE_TAGS or element.get("role") in BOILERPLATE_ROLES
+
+
+def _split_paragraph(text: str, max_chars: int) -> List[str]:
+    """Split an oversized paragraph at sentence boundaries, then at spaces"""
+    pieces: List[str] = []
+    current = ""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_page_text(
+    soup: BeautifulSoup,
+    max_chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    drop_boilerplate: bool = True
+) -> List[TextChunk]:
+    """
+    Split page text into chunks that follow its headings and paragraphs
+    
+    Paragraphs under the same heading are merged until a chunk would exceed
+    max_chunk_chars; longer paragraphs are split at sentence boundaries.
+    Each chunk carries its heading path (e.g. "Install > Linux").
+    
+    Args:
+        soup: Parsed document
+        max_chunk_chars: Target maximum characters per chunk
+        drop_boilerplate: Skip nav, header, footer, aside and similar elements
+        
+    Returns:
+        Chunks in document order
+    """
+    headings: List[Tuple[int, str]] = []
+    paragraphs: List[Tuple[str, str]] = []
+    buffer: List[str] = []
+    
+    def flush():
+        text = clean_text(''.join(buffer))
+        buffer.clear()
+        if text:
+            paragraphs.append((" > ".join(heading for _, heading in headings), text))
+    
+    exit_block = object()
+    stack: List[Any] = list(reversed(soup.contents))
+    while stack:
+        element = stack.pop()
+        if element is exit_block:
+            flush()
+        elif isinstance(element, Tag):
+            if element.name in CHUNK_SKIP_TAGS or (drop_boilerplate and _is_boilerplate(element)):
+                continue
+            if element.name in HEADING_TAGS:
+                flush()
+                level = int(element.name[1])
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                heading = clean_text(''.join(iter_visible_strings(element)))
+                if heading:
+                    headings.append((level, heading))
+                continue
+            if element.name in BLOCK_TAGS:
+                flush()
+                stack.append(exit_block)
+            stack.extend(reversed(element.contents))
+        elif type(element) in TEXT_STRING_TYPES:
+            buffer.append(element)
+    flush()
+    
+    chunks: List[TextChunk] = []
+    for heading, text in paragraphs:
+        for piece in _split_paragraph(text, max_chunk_chars):
+            last = chunks[-1] if chunks else None
+            if last is not None and last.heading == heading and len(last.text) + 1 + len(piece) <= max_chunk_chars:
+                last.text = f"{last.text}\n{piece}"
+            else:
+                chunks.append(TextChunk(heading, piece, len(chunks)))
+    return chunks
+
+
+def tokenize_terms(text: str) -> List[str]:
+    """Lowercased word terms used for lexical ranking"""
+    return TERM_PATTERN.findall(text.lower())
+
+
+def bm25_rank(
+    query: str,
+    chunks: List[TextChunk],
+    k1: float = 1.5,
+    b: float = 0.75
+) -> List[TextChunk]:
+    """
+    Rank chunks against a query with Okapi BM25 over the chunks themselves
+    
+    Args:
+        query: Search query
+        chunks: Chunks to rank (their score is set)
+        k1: Term frequency saturation
+        b: Length normalization
+        
+    Returns:
+        Chunks sorted by descending score, ties in document order
+    """
+    query_terms = set(tokenize_terms(query))
+    documents = [tokenize_terms(chunk.render()) for chunk in chunks]
+    if not chunks or not query_terms:
+        return list(chunks)
+    
+    average_length = sum(len(terms) for terms in documents) / len(documents) or 1.0
+    document_frequency = {
+        term: sum(1 for terms in documents if term in terms)
+        for term in query_terms
+    }
+    
+    for chunk, terms in zip(chunks, documents):
+        counts: Dict[str, int] = {}
+        for term in terms:
+            if term in query_terms:
+                counts[term] = counts.get(term, 0) + 1
+        score = 0.0
+        for term, frequency in counts.items():
+            df = document_frequency[term]
+            idf = math.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+            score += idf * frequency * (k1 + 1) / (
+                frequency + k1 * (1 - b + b * len(terms) / average_length)
+            )
+        chunk.score = score
+    
+    return sorted(chunks, key=lambda chunk: (-chunk.score, chunk.position))
+
+
+def select_chunks(
+    chunks: List[TextChunk],
+    query: Optional[str] = None,
+    max_chars: Optional[int] = None,
+    max_tokens: Optional[int] = None
+) -> List[TextChunk]:
+    """
+    Pick the chunks that fit a budget, most relevant first
+    
+    With a query, chunks are ranked by BM25 and chunks matching no query
+    term are dropped; without one they keep document order. Chunks that do
+    not fit the remaining budget are skipped in favour of smaller ones, and
+    if not even the first chunk fits it is cut to the budget.
+    
+    Args:
+        chunks: Chunks from chunk_page_text
+        query: Optional query to rank by
+        max_chars: Character budget for the rendered chunks
+        max_tokens: Token budget (estimated) for the rendered chunks
+        
+    Returns:
+        Selected chunks in output order
+    """
+    ranked = chunks
+    if query:
+        ranked = [chunk for chunk in bm25_rank(query, chunks) if chunk.score > 0] or chunks
+    
+    budget = max_chars
+    if max_tokens is not None:
+        token_chars = max_tokens * CHARS_PER_TOKEN
+        budget = min(budget, token_chars) if budget is not None else token_chars
+    if budget is None:
+        return list(ranked)
+    
+    selected: List[TextChunk] = []
+    used = 0
+    for chunk in ranked:
+        size = len(chunk.render()) + (2 if selected else 0)
+        if used + size <= budget:
+            selected.append(chunk)
+            used += size
+    if not selected and ranked and budget > 0:
+        first = ranked[0]
+        room = budget - (len(first.heading) + 1 if first.heading else 0)
+        text = first.text[:max(room, 0)]
+        if len(text) < len(first.text) and " " in text:
+            text = text[:text.rfind(" ")]
+        selected.append(TextChunk(first.heading, text, first.position, first.score))
+    return selected
+
+
+class ParsedDocumentCache:
+    """Size-bounded LRU of parsed HTML documents keyed by content hash"""
+    
+    # Rough in-memory footprint of a parsed tree relative to its source text
+    PARSED_SIZE_FACTOR = 10
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 256):
+        """
+        Initialize the cache
+        
+        Args:
+            max_bytes: Estimated memory budget for all cached documents
+            max_entries: Maximum number of cached documents
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def content_key(html: str, parser: str) -> str:
+        """Cache key for an HTML string parsed with a given parser"""
+        digest = hashlib.blake2b(html.encode('utf-8', 'surrogatepass'), digest_size=16)
+        return f"{parser}:{digest.hexdigest()}"
+    
+    def get_document(
+        self,
+        html: str,
+        parser: Union[str, ParserBackend, None] = None
+    ) -> Any:
+        """
+        Get the parsed document for an HTML string, parsing it on a miss
+        
+        Cached documents are shared between tools and must not be modified.
+        
+        Args:
+            html: HTML content
+            parser: Parser backend or backend name (defaults to ARCHON_HTML_PARSER)
+            
+        Returns:
+            Parsed document
+        """
+        backend = parser if isinstance(parser, ParserBackend) else get_parser_backend(parser)
+        key = self.content_key(html, backend.name)
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return document
+            self.misses += 1
+        
+        # Parse outside the lock so one large page does not block other lookups
+        document = backend.parse(html)
+        size = len(html) * self.PARSED_SIZE_FACTOR
+        if size > self.max_bytes:
+            return document
+        
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = document
+                self._sizes[key] = size
+                self.current_bytes += size
+                self._evict()
+        return document
+    
+    def _evict(self):
+        """Drop least recently used documents until within budget (lock held)"""
+        while self._entries and (
+            self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self.current_bytes -= self._sizes.pop(key)
+            self.evictions += 1
+    
+    def clear(self):
+        """Remove all cached documents"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "estimated_bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# How extraction work is dispatched: 'thread', 'process' or 'inline'
+DEFAULT_PARSE_POOL = os.getenv("ARCHON_PARSE_POOL", "thread")
+
+# Pages smaller than this (in characters) are parsed on the event loop
+DEFAULT_INLINE_THRESHOLD = int(os.getenv("ARCHON_PARSE_INLINE_THRESHOLD", str(32 * 1024)))
+
+
+@dataclass
+class OffloadTiming:
+    """Timing of one offloaded (or inline) extraction call"""
+    job: str
+    size: int
+    offloaded: bool
+    queue_wait: float
+    run_time: float
+
+
+def _timed_job(job: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[float, float, Any]:
+    """Run a job in a pool worker, reporting when it started and finished"""
+    started = time.monotonic()
+    result = job(*args)
+    return started, time.monotonic(), result
+
+
+def _init_parse_worker():
+    """Give each worker process its own document cache"""
+    WebScrapingTools.document_cache = ParsedDocumentCache()
+
+
+class ParseOffloader:
+    """
+    Runs parsing and extraction jobs off the event loop
+    
+    Jobs are module-level functions taking (document_cache, html, parser
+    name, ...) and returning plain data, so the same job runs inline, in a
+    thread or in a worker process. Worker processes cannot share the
+    caller's document cache and use one of their own. Pages below
+    inline_threshold characters are handled inline, where a pool round
+    trip would cost more than the parse.
+    """
+    
+    MODES = ('thread', 'process', 'inline')
+    
+    def __init__(
+        self,
+        mode: str = DEFAULT_PARSE_POOL,
+        max_workers: Optional[int] = None,
+        inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+        executor: Optional[concurrent.futures.Executor] = None,
+        recent_calls: int = 256,
+        telemetry: Optional[Any] = None
+    ):
+        """
+        Initialize the offloader
+        
+        Args:
+            mode: 'thread', 'process' or 'inline' (defaults to ARCHON_PARSE_POOL)
+            max_workers: Pool size (defaults to 4 threads or one process per CPU)
+            inline_threshold: Pages shorter than this many characters run inline
+            executor: Existing executor to use; the caller keeps ownership of it
+            recent_calls: Number of per-call timings kept for inspection
+            telemetry: Records the queue wait of offloaded calls
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown parse pool mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.inline_threshold = inline_threshold
+        self.recent: "deque[OffloadTiming]" = deque(maxlen=recent_calls)
+        self.in_flight = 0
+        self.telemetry = telemetry
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def executor(self) -> Optional[concurrent.futures.Executor]:
+        """The worker pool, created on first use (None in inline mode)"""
+        if self._executor is None and self.mode != 'inline':
+            with self._lock:
+                if self._executor is None:
+                    if self.mode == 'process':
+                        methods = multiprocessing.get_all_start_methods()
+                        # Forking a threaded process can copy held locks into the child
+                        context = multiprocessing.get_context(
+                            "forkserver" if "forkserver" in methods else "spawn"
+                        )
+                        self._executor = concurrent.futures.ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=context,
+                            initializer=_init_parse_worker
+                        )
+                    else:
+                        self._executor = concurrent.futures.ThreadPoolExecutor(
+                            max_workers=self.max_workers or 4,
+                            thread_name_prefix="archon-parse"
+                        )
+        return self._executor
+    
+    async def run(
+        self,
+        job: Callable[..., Any],
+        document_cache: Optional[ParsedDocumentCache],
+        html: str,
+        *args: Any
+    ) -> Any:
+        """
+        Run an extraction job, offloading it when the page is large enough
+        
+        Args:
+            job: Module-level job function
+            document_cache: Cache the job parses through (not sent to processes)
+            html: HTML content
+            *args: Remaining job arguments
+            
+        Returns:
+            The job's result
+        """
+        submitted = time.monotonic()
+        if self.mode == 'inline' or len(html) < self.inline_threshold:
+            result = job(document_cache, html, *args)
+            self._record(job, len(html), False, 0.0, time.monotonic() - submitted)
+            return result
+        
+        if self.mode == 'process':
+            document_cache = None
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            started, finished, result = await loop.run_in_executor(
+                self.executor, _timed_job, job, (document_cache, html) + args
+            )
+        finally:
+            self.in_flight -= 1
+        self._record(job, len(html), True, max(started - submitted, 0.0), finished - started)
+        return result
+    
+    def _record(self, job: Callable[..., Any], size: int, offloaded: bool, queue_wait: float, run_time: float):
+        timing = OffloadTiming(job.__name__.strip('_'), size, offloaded, queue_wait, run_time)
+        self.recent.append(timing)
+        totals = self._totals.setdefault(timing.job, {
+            "calls": 0, "offloaded": 0, "queue_wait_total": 0.0, "queue_wait_max": 0.0,
+            "run_time_total": 0.0, "run_time_max": 0.0
+        })
+        totals["calls"] += 1
+        totals["offloaded"] += offloaded
+        totals["queue_wait_total"] += queue_wait
+        totals["queue_wait_max"] = max(totals["queue_wait_max"], queue_wait)
+        totals["run_time_total"] += run_time
+        totals["run_time_max"] = max(totals["run_time_max"], run_time)
+        if offloaded and self.telemetry is not None:
+            self.telemetry.histogram(
+                "parse_queue_wait_seconds", "Time offloaded parse jobs waited for a worker", ("job",)
+            ).observe(queue_wait, {"job": timing.job})
+        if offloaded:
+            logger.debug(
+                "%s: %d chars, waited %.1fms, ran %.1fms",
+                timing.job, size, queue_wait * 1000, run_time * 1000
+            )
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get per-job call counts and queueing/run times in seconds"""
+        return {
+            "mode": self.mode,
+            "in_flight": self.in_flight,
+            "jobs": {name: dict(totals) for name, totals in self._totals.items()}
+        }
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool; it is recreated if the offloader is used again"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._owns_executor:
+            executor.shutdown(wait=wait)
+
+
+# Extraction jobs run by ParseOffloader. Each takes the document cache
+# (None inside worker processes), the HTML and a parser backend name.
+
+def _job_document(document_cache: Optional[ParsedDocumentCache], html: str, parser: str, soup: bool = False) -> Any:
+    """Parse through the given cache, or this process's shared one"""
+    backend = get_parser_backend(parser)
+    if soup:
+        backend = get_soup_backend(backend)
+    cache = document_cache if document_cache is not None else WebScrapingTools.document_cache
+    return cache.get_document(html, backend)
+
+
+def _page_text_job(document_cache: Optional[ParsedDocumentCache], html: str, parser: str) -> str:
+    # Text without script and style elements, cleaned of whitespace runs
+    return get_parser_backend(parser).extract_text(_job_document(document_cache, html, parser))
+
+
+def _text_chunks_job(
+    document_cache: Optional[ParsedDocumentCache],
+    html: str,
+    parser: str,
+    query: Optional[str] = None,
+    max_chars: Optional[int] = None,
+    max_tokens: Optional[int] = None
+) -> List[TextChunk]:
+    soup = _job_document(document_cache, html, parser, soup=True)
+    chunks = chunk_page_text(soup)
+    if query is None and max_chars is None and max_tokens is None:
+        return chunks
+    return select_chunks(chunks, query, max_chars, max_tokens)
+
+
+def _link_hrefs_job(document_cache: Optional[ParsedDocumentCache], html: str, parser: str) -> List[Tuple[str, str]]:
+    return get_parser_backend(parser).find_links(_job_document(document_cache, html, parser))
+
+
+def _images_job(document_cache: Optional[ParsedDocumentCache], html: str, parser: str) -> List[Tuple[str, str]]:
+    soup = _job_document(document_cache, html, parser, soup=True)
+    return [(img_tag.get('alt', ''), img_tag.get('src', '')) for img_tag in soup.find_all('img')]
+
+
+def _tables_job(document_cache: Optional[ParsedDocumentCache], html: str, parser: str) -> List[List[List[str]]]:
+    return get_parser_backend(parser).extract_tables(_job_document(document_cache, html, parser))
+
+
+def _metadata_job(document_cache: Optional[ParsedDocumentCache], html: str, parser: str) -> Dict[str, Any]:
+    soup = _job_document(document_cache, html, parser, soup=True)
+    metadata: Dict[str, Any] = {}
+    
+    # Extract title
+    title_tag = soup.find('title')
+    if title_tag:
+        metadata['title'] = title_tag.get_text(strip=True)
+    
+    # Extract meta tags
+    metadata['meta'] = {}
+    for meta in soup.find_all('meta'):
+        if meta.get('name'):
+            metadata['meta'][meta['name']] = meta.get('content', '')
+        elif meta.get('property'):
+            metadata['meta'][meta['property']] = meta.get('content', '')
+    
+    # Extract headers
+    metadata['headers'] = {}
+    for i in range(1, 7):
+        headers = [h.get_text(strip=True) for h in soup.find_all(f'h{i}')]
+        if headers:
+            metadata['headers'][f'h{i}'] = headers
+    
+    return metadata
+
+
+def _page_sections_job(
+    document_cache: Optional[ParsedDocumentCache],
+    html: str,
+    parser: str,
+    sections: Optional[List[str]],
+    base_url: Optional[str]
+) -> Dict[str, Any]:
+    soup = _job_document(document_cache, html, parser, soup=True)
+    return extract_page_sections(soup, sections, base_url)
+
+
+def _select_job(document_cache: Optional[ParsedDocumentCache], html: str, parser: str, selector: str) -> List[Dict[str, Any]]:
+    document = _job_document(document_cache, html, parser)
+    try:
+        return get_parser_backend(parser).select_elements(document, selector)
+    except Exception as e:
+        return [{"error": str(e)}]
+
+
+@dataclass
+class CrawlResult(FetchResult):
+    """Fetched page plus its crawl depth and the links followed from it"""
+    depth: int = 0
+    links: List[str] = field(default_factory=list)
+
+
+class HostThrottle:
+    """Per-host politeness: bounded concurrency and a minimum delay between requests"""
+    
+    def __init__(self, max_per_host: int = 2, delay: float = 0.0):
+        """
+        Initialize the throttle
+        
+        Args:
+            max_per_host: Concurrent requests allowed per host
+            delay: Minimum seconds between request starts to the same host
+        """
+        self.max_per_host = max_per_host
+        self.delay = delay
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._next_start: Dict[str, float] = {}
+    
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """Hold a request slot for the host of a URL"""
+        host = urlsplit(url).netloc.lower()
+        semaphore = self._slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        async with semaphore:
+            if self.delay > 0:
+                loop = asyncio.get_running_loop()
+                async with self._locks.setdefault(host, asyncio.Lock()):
+                    wait = self._next_start.get(host, 0.0) - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._next_start[host] = loop.time() + self.delay
+            yield
+
+
+def normalize_url(url: str) -> str:
+    """
+    Check that a URL can be fetched and drop its fragment
+    
+    Args:
+        url: Absolute http(s) URL
+        
+    Returns:
+        URL without its fragment
+        
+    Raises:
+        ValueError: If the URL is malformed, not http(s) or has no host
+    """
+    url = urldefrag(url)[0]
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ('http', 'https'):
+        raise ValueError(f"Unsupported URL scheme: {url}")
+    if not parts.hostname:
+        raise ValueError(f"URL has no host: {url}")
+    # Raises ValueError for non-numeric or out-of-range ports
+    parts.port
+    return url
+
+
+async def crawl(
+    http_client: SharedHTTPClient,
+    urls: List[str],
+    max_concurrency: int = 10,
+    max_depth: int = 0,
+    max_pages: int = 50,
+    max_links_per_page: int = 20,
+    same_host_only: bool = True,
+    throttle: Optional[HostThrottle] = None,
+    timeout: float = 30,
+    max_bytes: Optional[int] = DEFAULT_MAX_RESPONSE_BYTES,
+    allowed_content_types: Optional[Sequence[str]] = DEFAULT_ALLOWED_CONTENT_TYPES,
+    backend: Optional[ParserBackend] = None,
+    document_cache: Optional[ParsedDocumentCache] = None,
+    cache: Optional[HTTPResponseCache] = None,
+    offloader: Optional[ParseOffloader] = None,
+    telemetry: Optional[Any] = None
+) -> AsyncIterator[CrawlResult]:
+    """
+    Fetch URLs concurrently, optionally following their links, yielding
+    pages as they finish
+    
+    Args:
+        http_client: Client to fetch with
+        urls: Start URLs
+        max_concurrency: Requests in flight across all hosts
+        max_depth: Link levels to follow from the start URLs (0 fetches only them)
+        max_pages: Maximum pages fetched in total
+        max_links_per_page: Links followed from each page
+        same_host_only: Only follow links to the host of the page they were found on
+        throttle: Per-host politeness limits (defaults to 2 requests per host)
+        timeout: Request timeout in seconds
+        max_bytes: Per-page body budget (None for no limit)
+        allowed_content_types: Media types to accept (None to accept any)
+        backend: Parser used to discover links
+        document_cache: Cache for documents parsed to discover links
+        cache: Response cache shared with fetch_page
+        offloader: Runs link discovery off the event loop (inline when not given)
+        telemetry: Records a fetch span per page
+        
+    Returns:
+        Async iterator of CrawlResult in completion order; start URLs that
+        are malformed come first, each with its error
+    """
+    throttle = throttle or HostThrottle()
+    backend = backend or get_parser_backend()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    seen: set = set()
+    pending: set = set()
+    invalid: List[CrawlResult] = []
+    
+    async def fetch_one(url: str, depth: int) -> CrawlResult:
+        async with semaphore, throttle.slot(url):
+            fetched = await fetch_page(
+                http_client, url, timeout, max_bytes, allowed_content_types,
+                cache=cache, telemetry=telemetry
+            )
+        return CrawlResult(**vars(fetched), depth=depth)
+    
+    def schedule(url: str, depth: int):
+        try:
+            url = normalize_url(url)
+        except ValueError as e:
+            if depth == 0:
+                invalid.append(CrawlResult(url=url, error=str(e)))
+            return
+        if url in seen or len(seen) >= max_pages:
+            return
+        seen.add(url)
+        pending.add(asyncio.ensure_future(fetch_one(url, depth)))
+    
+    async def discover_links(page: CrawlResult) -> List[str]:
+        if offloader is not None:
+            hrefs = await offloader.run(_link_hrefs_job, document_cache, page.text, backend.name)
+        elif document_cache is not None:
+            hrefs = backend.find_links(document_cache.get_document(page.text, backend))
+        else:
+            hrefs = backend.find_links(backend.parse(page.text))
+        host = urlsplit(page.url).netloc.lower()
+        links = []
+        for _, href in hrefs:
+            try:
+                link = normalize_url(urljoin(page.url, href))
+            except ValueError:
+                # Broken hrefs and mailto:/javascript: links are not followed
+                continue
+            if same_host_only and urlsplit(link).netloc.lower() != host:
+                continue
+            if link not in links:
+                links.append(link)
+            if len(links) >= max_links_per_page:
+                break
+        return links
+    
+    for url in urls:
+        schedule(url, 0)
+    
+    try:
+        for page in invalid:
+            yield page
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            for task in done:
+                page = task.result()
+                if page.depth < max_depth and not page.error and page.text:
+                    page.links = await discover_links(page)
+                    for link in page.links:
+                        schedule(link, page.depth + 1)
+                yield page
+    finally:
+        for task in pending:
+            task.cancel()
+
+
 class WebScrapingTools:
     """Collection of web scraping tools for AI agents"""
     
+    _shared_client: Optional[SharedHTTPClient] = None
+    
+    # Parsed documents shared by the extraction tools of every agent
+    document_cache = ParsedDocumentCache()
+    
+    # Worker pool that large pages are parsed in, created on first use
+    parse_offloader = ParseOffloader()
+    
+    @classmethod
+    def get_shared_client(cls) -> SharedHTTPClient:
+        """Get the process-wide HTTP client used when none is passed to register_tools"""
+        if cls._shared_client is None:
+            cls._shared_client = SharedHTTPClient()
+        return cls._shared_client
+    
+    @classmethod
+    async def aclose_shared_client(cls):
+        """Close the process-wide HTTP client; call on application shutdown"""
+        if cls._shared_client is not None:
+            await cls._shared_client.aclose()
+            cls._shared_client = None
+        cls.parse_offloader.shutdown(wait=False)
+        _pattern_workers.shutdown()
+    
     @staticmethod
-    def register_tools(agent: Agent):
-        """Register all web scraping tools to an agent"""
+    def register_tools(
+        agent: Agent,
+        http_client: Optional[Union[SharedHTTPClient, httpx.AsyncClient]] = None,
+        document_cache: Optional[ParsedDocumentCache] = None,
+        parser: Optional[str] = None,
+        max_response_bytes: Optional[int] = DEFAULT_MAX_RESPONSE_BYTES,
+        allowed_content_types: Optional[Sequence[str]] = DEFAULT_ALLOWED_CONTENT_TYPES,
+        max_crawl_concurrency: int = 10,
+        crawl_throttle: Optional[HostThrottle] = None,
+        response_cache: Optional[HTTPResponseCache] = None,
+        pattern_timeout: float = 2.0,
+        max_pattern_matches: int = 1000,
+        scraped_index: Optional[ScrapedContentIndex] = None,
+        parse_offloader: Optional[ParseOffloader] = None,
+        telemetry: Optional[Any] = None
+    ):
+        """
+        Register all web scraping tools to an agent
+        
+        Args:
+            agent: Agent to register the tools on
+            http_client: Client used by fetch_webpage. Defaults to the shared
+                process-wide client so agents reuse pooled connections.
+            document_cache: Cache of parsed documents used by the extraction
+                tools. Defaults to WebScrapingTools.document_cache.
+            parser: HTML parser backend ('html.parser', 'lxml' or 'selectolax').
+                Defaults to ARCHON_HTML_PARSER; unavailable engines fall back
+                to html.parser.
+            max_response_bytes: Largest response body fetch_webpage reads;
+                longer pages are truncated (None for no limit)
+            allowed_content_types: Media types fetch_webpage accepts (None for any)
+            max_crawl_concurrency: Requests fetch_many keeps in flight
+            crawl_throttle: Per-host politeness limits for fetch_many
+            response_cache: HTTP cache used by the fetch tools (disabled by default)
+            pattern_timeout: Seconds find_by_pattern may run before it is abandoned
+            max_pattern_matches: Most matches find_by_pattern returns
+            scraped_index: Index that fetched pages are chunked and added to;
+                enables the search_scraped tool (disabled by default)
+            parse_offloader: Pool that parsing and extraction of large pages
+                run in. Defaults to WebScrapingTools.parse_offloader.
+            telemetry: Records spans for tool calls, fetches and parses
+                (disabled by default)
+        """
+        if http_client is None:
+            http_client = WebScrapingTools.get_shared_client()
+        elif isinstance(http_client, httpx.AsyncClient):
+            http_client = SharedHTTPClient(client=http_client)
+        
+        if document_cache is None:
+            document_cache = WebScrapingTools.document_cache
+        
+        if parse_offloader is None:
+            parse_offloader = WebScrapingTools.parse_offloader
         
-        @agent.tool
-        async def fetch_webpage(ctx: RunContext, url: str, timeout: int = 30) -> str:
+        backend = get_parser_backend(parser)
+        
+        def tool(func: Callable[..., Any]) -> Callable[..., Any]:
+            """Register a tool on the agent, timing its calls when telemetry is enabled"""
+            return agent.tool(telemetry.instrument_tool(func) if telemetry is not None else func)
+        
+        async def extract(job: Callable[..., Any], html: str, *args: Any) -> Any:
+            if telemetry is None:
+                return await parse_offloader.run(job, document_cache, html, backend.name, *args)
+            with telemetry.span("parse", {"job": job.__name__.strip('_')}, chars=len(html)):
+                return await parse_offloader.run(job, document_cache, html, backend.name, *args)
+        
+        async def index_fetched(result: FetchResult):
+            """
+            Chunk a fetched HTML page and upsert it into the scraped-content index
+            
+            Truncated fetches are skipped: indexing them would replace the
+            complete page's chunks with a prefix of it.
+            """
+            if scraped_index is None or result.truncated:
+                return
+            if not result.content_type or not _content_type_allowed(result.content_type, HTML_CONTENT_TYPES):
+                return
+            try:
+                chunks = await extract(_text_chunks_job, result.text)
+                # Embedding (and a remote backend's network calls) would stall the event loop
+                await asyncio.to_thread(
+                    scraped_index.add_page, result.url, [(chunk.heading, chunk.text) for chunk in chunks]
+                )
+            except Exception as e:
+                logger.warning("Could not index %s: %s", result.url, e)
+        
+        @tool
+        async def fetch_webpage(
+            ctx: RunContext,
+            url: str,
+            timeout: int = 30,
+            max_bytes: Optional[int] = None
+        ) -> str:
             """
             Fetch the HTML content of a webpage
             
             Args:
                 url: The URL to fetch
                 timeout: Request timeout in seconds
+                max_bytes: Stop reading the page after this many bytes
                 
             Returns:
                 HTML content of the page
             """
-            try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(url, timeout=timeout)
-                    response.raise_for_status()
-                    return response.text
-            except httpx.RequestError as e:
-                return f"Error fetching {url}: {str(e)}"
+            budget = max_response_bytes
+            if max_bytes is not None:
+                budget = min(max_bytes, budget) if budget is not None else max_bytes
+            
+            result = await fetch_page(
+                http_client, url, timeout, budget, allowed_content_types,
+                cache=response_cache, telemetry=telemetry
+            )
+            if result.error:
+                return f"Error fetching {url}: {result.error}"
+            await index_fetched(result)
+            if result.truncated:
+                return f"{result.text}\n<!-- truncated after {result.bytes_read} bytes -->"
+            return result.text
         
-        @agent.tool
-        async def extract_text(ctx: RunContext, html: str) -> str:
+        @tool
+        async def fetch_text(
+            ctx: RunContext,
+            url: str,
+            max_chars: int = 20000,
+            timeout: int = 30
+        ) -> str:
             """
-            Extract readable text from HTML
+            Fetch a webpage and return its readable text, stopping the
+            download once enough text has been collected
             
             Args:
-                html: HTML content
+                url: The URL to fetch
+                max_chars: Maximum characters of text to return
+                timeout: Request timeout in seconds
                 
             Returns:
                 Extracted text content
             """
-            soup = BeautifulSoup(html, 'html.parser')
+            extractor = IncrementalTextExtractor(max_chars=max_chars)
             
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+            def feed(chunk: str) -> bool:
+                extractor.feed(chunk)
+                return extractor.is_full
             
-            # Get text and clean it
-            text = soup.get_text()
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            result = await fetch_page(
+                http_client, url, timeout, max_response_bytes, allowed_content_types,
+                on_text=feed, cache=response_cache, telemetry=telemetry
+            )
+            if result.error:
+                return f"Error fetching {url}: {result.error}"
+            extractor.close()
+            return extractor.text
+        
+        @tool
+        async def fetch_many(
+            ctx: RunContext,
+            urls: List[str],
+            max_depth: int = 0,
+            max_pages: int = 20,
+            max_links_per_page: int = 10,
+            same_host_only: bool = True,
+            as_text: bool = False,
+            timeout: int = 30
+        ) -> List[Dict[str, Any]]:
+            """
+            Fetch several webpages concurrently, optionally following their links
             
-            return text
+            Args:
+                urls: The URLs to fetch
+                max_depth: Link levels to follow from the given URLs (0 fetches only them)
+                max_pages: Maximum number of pages to fetch in total
+                max_links_per_page: Links to follow from each page
+                same_host_only: Only follow links to the same host
+                as_text: Return readable text instead of HTML
+                timeout: Request timeout in seconds
+                
+            Returns:
+                List of pages in the order they finished, each with url, depth,
+                status and content or error
+            """
+            pages = []
+            async for page in crawl(
+                http_client,
+                urls,
+                max_concurrency=max_crawl_concurrency,
+                max_depth=max_depth,
+                max_pages=max_pages,
+                max_links_per_page=max_links_per_page,
+                same_host_only=same_host_only,
+                throttle=crawl_throttle,
+                timeout=timeout,
+                max_bytes=max_response_bytes,
+                allowed_content_types=allowed_content_types,
+                backend=backend,
+                document_cache=document_cache,
+                cache=response_cache,
+                offloader=parse_offloader,
+                telemetry=telemetry
+            ):
+                entry: Dict[str, Any] = {
+                    "url": page.url,
+                    "depth": page.depth,
+                    "status": page.status_code
+                }
+                if page.error:
+                    entry["error"] = page.error
+                else:
+                    await index_fetched(page)
+                    if as_text:
+                        entry["content"] = await extract(_page_text_job, page.text)
+                    else:
+                        entry["content"] = page.text
+                if page.truncated:
+                    entry["truncated"] = True
+                pages.append(entry)
+            return pages
         
-        @agent.tool
+        if scraped_index is not None:
+            @tool
+            async def search_scraped(
+                ctx: RunContext,
+                query: str,
+                k: int = 5,
+                url_prefix: Optional[str] = None
+            ) -> List[Dict[str, Any]]:
+                """
+                Search the content of pages already fetched, before fetching them again
+                
+                Args:
+                    query: What to look for
+                    k: Number of passages to return
+                    url_prefix: Only search pages whose URL starts with this
+                    
+                Returns:
+                    Matching passages with their page URLs, heading and similarity score
+                """
+                hits = await asyncio.to_thread(scraped_index.search, query, k, url_prefix)
+                return [
+                    {
+                        "urls": hit.payload.get("urls", []),
+                        "heading": hit.payload.get("heading", ""),
+                        "text": hit.payload.get("text", ""),
+                        "score": round(hit.score, 4)
+                    }
+                    for hit in hits
+                ]
+        
+        @tool
+        async def extract_text(
+            ctx: RunContext,
+            html: str,
+            max_chars: Optional[int] = None,
+            max_tokens: Optional[int] = None,
+            query: Optional[str] = None
+        ) -> str:
+            """
+            Extract readable text from HTML
+            
+            Without limits or a query the full page text is returned. With
+            any of them the text is split into chunks by heading and
+            paragraph, navigation/header/footer/sidebar content is dropped,
+            and the chunks that fit the budget are returned, most relevant
+            to the query first.
+            
+            Args:
+                html: HTML content
+                max_chars: Maximum characters to return
+                max_tokens: Maximum (estimated) tokens to return
+                query: Return the chunks most relevant to this query first
+                
+            Returns:
+                Extracted text content
+            """
+            if max_chars is None and max_tokens is None and not query:
+                return await extract(_page_text_job, html)
+            
+            chunks = await extract(_text_chunks_job, html, query, max_chars, max_tokens)
+            return "\n\n".join(chunk.render() for chunk in chunks)
+        
+        @tool
         async def find_links(ctx: RunContext, html: str, base_url: Optional[str] = None) -> List[Dict[str, str]]:
             """
             Extract all links from HTML
@@ -73,25 +2574,17 @@ class WebScrapingTools:
             Returns:
                 List of links with text and href
             """
-            soup = BeautifulSoup(html, 'html.parser')
             links = []
             
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                text = a_tag.get_text(strip=True)
-                
-                # Convert relative to absolute URLs
-                if base_url and not href.startswith(('http://', 'https://')):
-                    href = urljoin(base_url, href)
-                
+            for text, href in await extract(_link_hrefs_job, html):
                 links.append({
                     "text": text,
-                    "url": href
+                    "url": _absolute_url(href, base_url)
                 })
             
             return links
         
-        @agent.tool
+        @tool
         async def find_images(ctx: RunContext, html: str, base_url: Optional[str] = None) -> List[Dict[str, str]]:
             """
             Extract all images from HTML
@@ -103,25 +2596,17 @@ class WebScrapingTools:
             Returns:
                 List of images with alt text and src
             """
-            soup = BeautifulSoup(html, 'html.parser')
             images = []
             
-            for img_tag in soup.find_all('img'):
-                src = img_tag.get('src', '')
-                alt = img_tag.get('alt', '')
-                
-                # Convert relative to absolute URLs
-                if base_url and not src.startswith(('http://', 'https://')):
-                    src = urljoin(base_url, src)
-                
+            for alt, src in await extract(_images_job, html):
                 images.append({
                     "alt": alt,
-                    "src": src
+                    "src": _absolute_url(src, base_url)
                 })
             
             return images
         
-        @agent.tool
+        @tool
         async def extract_tables(ctx: RunContext, html: str) -> List[List[List[str]]]:
             """
             Extract all tables from HTML
@@ -132,21 +2617,9 @@ class WebScrapingTools:
             Returns:
                 List of tables, each as list of rows, each row as list of cells
             """
-            soup = BeautifulSoup(html, 'html.parser')
-            tables = []
-            
-            for table in soup.find_all('table'):
-                table_data = []
-                for row in table.find_all('tr'):
-                    row_data = []
-                    for cell in row.find_all(['td', 'th']):
-                        row_data.append(cell.get_text(strip=True))
-                    table_data.append(row_data)
-                tables.append(table_data)
-            
-            return tables
+            return await extract(_tables_job, html)
         
-        @agent.tool
+        @tool
         async def extract_metadata(ctx: RunContext, html: str) -> Dict[str, Any]:
             """
             Extract metadata from HTML (title, meta tags, etc.)
@@ -157,50 +2630,65 @@ class WebScrapingTools:
             Returns:
                 Dictionary of extracted metadata
             """
-            soup = BeautifulSoup(html, 'html.parser')
-            metadata = {}
-            
-            # Extract title
-            title_tag = soup.find('title')
-            if title_tag:
-                metadata['title'] = title_tag.get_text(strip=True)
-            
-            # Extract meta tags
-            metadata['meta'] = {}
-            for meta in soup.find_all('meta'):
-                if meta.get('name'):
-                    metadata['meta'][meta['name']] = meta.get('content', '')
-                elif meta.get('property'):
-                    metadata['meta'][meta['property']] = meta.get('content', '')
+            return await extract(_metadata_job, html)
+        
+        @tool
+        async def extract_page(
+            ctx: RunContext,
+            html: str,
+            sections: Optional[List[str]] = None,
+            base_url: Optional[str] = None
+        ) -> Dict[str, Any]:
+            """
+            Extract text, links, images, metadata and tables in one call
             
-            # Extract headers
-            metadata['headers'] = {}
-            for i in range(1, 7):
-                headers = [h.get_text(strip=True) for h in soup.find_all(f'h{i}')]
-                if headers:
-                    metadata['headers'][f'h{i}'] = headers
+            Args:
+                html: HTML content
+                sections: Sections to include: text, links, images, metadata,
+                    tables (defaults to all)
+                base_url: Base URL for relative links and image paths
+                
+            Returns:
+                Dictionary with one entry per requested section
+            """
+            unknown = [section for section in sections or [] if section not in PAGE_SECTIONS]
+            if unknown:
+                return {"error": f"Unknown sections: {', '.join(unknown)}"}
             
-            return metadata
+            return await extract(_page_sections_job, html, sections, base_url)
         
-        @agent.tool
-        async def find_by_pattern(ctx: RunContext, html: str, pattern: str) -> List[str]:
+        @tool
+        async def find_by_pattern(
+            ctx: RunContext,
+            html: str,
+            pattern: str,
+            max_matches: Optional[int] = None,
+            search_text: bool = False
+        ) -> List[str]:
             """
             Find content using regex pattern
             
             Args:
                 html: HTML content
                 pattern: Regex pattern to search for
+                max_matches: Stop after this many matches
+                search_text: Search the readable page text instead of the raw markup
                 
             Returns:
                 List of matches
             """
+            limit = min(max_matches, max_pattern_matches) if max_matches else max_pattern_matches
+            if search_text:
+                html = await extract(_page_text_job, html)
+            
             try:
-                matches = re.findall(pattern, html)
-                return matches
-            except re.error as e:
+                return await search_pattern(pattern, html, limit, pattern_timeout)
+            except TimeoutError as e:
+                return [str(e)]
+            except (re.error, getattr(regex_module, 'error', re.error)) as e:
                 return [f"Invalid regex pattern: {str(e)}"]
         
-        @agent.tool
+        @tool
         async def select_elements(ctx: RunContext, html: str, selector: str) -> List[Dict[str, Any]]:
             """
             Select elements using CSS selector
@@ -212,21 +2700,7 @@ class WebScrapingTools:
             Returns:
                 List of selected elements with text and attributes
             """
-            soup = BeautifulSoup(html, 'html.parser')
-            elements = []
-            
-            try:
-                selected = soup.select(selector)
-                for element in selected:
-                    elem_data = {
-                        "tag": element.name,
-                        "text": element.get_text(strip=True),
-                        "attributes": dict(element.attrs)
-                    }
-                    elements.append(elem_data)
-                return elements
-            except Exception as e:
-                return [{"error": str(e)}]
+            return await extract(_select_job, html, selector)
 
 # Example usage in an agent
 if __name__ == "__main__":
@@ -240,3 +2714,11 @@ if __name__ == "__main__":
     
     # Agent can now use all the web scraping tools
     print("Web scraping tools registered successfully!")
+    
+    # Check that installed fast parsers match html.parser output
+    for backend_name in ('lxml', 'selectolax'):
+        mismatches = check_parser_conformance(backend_name)
+        print(f"{backend_name} conformance: {'OK' if not mismatches else mismatches}")
+    
+    # Release pooled connections on shutdown
+    asyncio.run(WebScrapingTools.aclose_shared_client())
@@ -0,0 +1,110 @@
+import random
+from typing import Dict, List
+
+# Synthetic HTML corpus for the benchmarks
+# Pages are generated from a fixed seed, so every run (and every machine)
+# benchmarks byte-identical input. They mix the structures the scraping
+# tools care about: navigation and footer boilerplate, headed sections,
+# links, images, tables, lists, scripts and styles.
+
+CORPUS_SEED = 20240611
+
+# Target size of each page in bytes
+CORPUS_SIZES: Dict[str, int] = {
+    "small": 8 * 1024,
+    "medium": 128 * 1024,
+    "huge": 2 * 1024 * 1024,
+}
+
+WORDS = (
+    "agent model server tool request response schema stream token cache "
+    "parser document section table index vector query latency throughput "
+    "pipeline workflow template runtime context session protocol client "
+    "process thread queue batch metric trace span event payload config"
+).split()
+
+
+def _sentence(rng: random.Random, min_words: int = 6, max_words: int = 18) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, page: int) -> str:
+    parts = []
+    for _ in range(rng.randint(2, 5)):
+        sentence = _sentence(rng)
+        if rng.random() < 0.4:
+            word = rng.choice(WORDS)
+            href = rng.choice([f"/docs/{word}-{page}", f"https://example.com/{word}", f"#{word}"])
+            sentence = f'{sentence} See <a href="{href}" class="ref">{word}</a>.'
+        parts.append(sentence)
+    return f"<p>{' '.join(parts)}</p>"
+
+
+def _table(rng: random.Random) -> str:
+    columns = rng.randint(3, 6)
+    header = "".join(f"<th>{rng.choice(WORDS)}</th>" for _ in range(columns))
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{rng.randint(0, 9999)}</td>" for _ in range(columns)) + "</tr>"
+        for _ in range(rng.randint(3, 12))
+    )
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>"
+
+
+def _section(rng: random.Random, page: int, number: int) -> str:
+    parts = [f'<section id="s{number}"><h2>{_sentence(rng, 2, 5)}</h2>']
+    for sub in range(rng.randint(1, 3)):
+        parts.append(f"<h3>{_sentence(rng, 2, 4)}</h3>")
+        parts.extend(_paragraph(rng, page) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            parts.append(_table(rng))
+        if rng.random() < 0.3:
+            parts.append("<ul>" + "".join(f"<li>{_sentence(rng, 3, 8)}</li>" for _ in range(rng.randint(2, 6))) + "</ul>")
+        if rng.random() < 0.4:
+            parts.append(f'<img src="/img/{number}-{sub}.png" alt="{rng.choice(WORDS)} diagram">')
+    parts.append("</section>")
+    return "".join(parts)
+
+
+def generate_page(size: int, seed: int = CORPUS_SEED) -> str:
+    """
+    Generate a page of roughly the given size
+    
+    Args:
+        size: Target size in bytes
+        seed: Random seed; the same seed and size give the same page
+        
+    Returns:
+        HTML document
+    """
+    rng = random.Random(f"{seed}:{size}")
+    head = (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>{_sentence(rng, 3, 6)}</title>"
+        f"<meta name=\"description\" content=\"{_sentence(rng)}\">"
+        "<meta property=\"og:type\" content=\"article\">"
+        "<style>body { font-family: sans-serif } .ref { color: #06c }</style>"
+        "<script>window.dataLayer = window.dataLayer || []; function track(e) { dataLayer.push(e) }</script>"
+        "</head><body>"
+    )
+    nav = "<nav><ul>" + "".join(
+        f'<li><a href="/{word}">{word}</a></li>' for word in rng.sample(WORDS, 8)
+    ) + "</ul></nav><header><h1>" + _sentence(rng, 3, 6) + "</h1></header><main><article>"
+    tail = (
+        "</article></main><aside><h2>Related</h2>" + _paragraph(rng, 0) + "</aside>"
+        "<footer><p>Copyright example.com</p></footer>"
+        "<script>track({event: 'view'})</script></body></html>"
+    )
+    
+    sections: List[str] = []
+    length = len(head) + len(nav) + len(tail)
+    while length < size:
+        section = _section(rng, size, len(sections))
+        sections.append(section)
+        length += len(section)
+    return head + nav + "".join(sections) + tail
+
+
+def build_corpus(sizes: Dict[str, int] = CORPUS_SIZES) -> Dict[str, str]:
+    """Generate one page per named size"""
+    return {name: generate_page(size) for name, size in sizes.items()}
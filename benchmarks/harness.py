@@ -0,0 +1,266 @@
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from importlib import metadata
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Timing, result files and baseline comparison for the benchmark suite
+
+RESULTS_VERSION = 1
+
+# Each sample runs the benchmark often enough to take at least this long
+MIN_SAMPLE_TIME = 0.05
+
+PACKAGES = ["pydantic-ai", "httpx", "beautifulsoup4", "lxml", "selectolax", "mcp", "numpy"]
+
+
+@dataclass
+class BenchmarkResult:
+    """Timings of one benchmark: seconds per operation for each sample"""
+    name: str
+    samples: List[float]
+    params: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+    
+    @property
+    def p95(self) -> float:
+        ordered = sorted(self.samples)
+        return ordered[max(math.ceil(0.95 * len(ordered)) - 1, 0)]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "median": self.median,
+            "mean": statistics.fmean(self.samples),
+            "min": min(self.samples),
+            "max": max(self.samples),
+            "p95": self.p95,
+            "stdev": statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0,
+            "ops_per_sec": 1 / self.median if self.median else None,
+            "samples": self.samples,
+            "params": self.params
+        }
+
+
+@dataclass
+class Comparison:
+    """Change of one benchmark's median against the baseline"""
+    name: str
+    baseline: Optional[float]
+    current: Optional[float]
+    status: str
+    
+    @property
+    def change(self) -> Optional[float]:
+        if not self.baseline or self.current is None:
+            return None
+        return self.current / self.baseline - 1
+
+
+def _calibrate(run_once: Callable[[], float]) -> int:
+    """Find how many calls make one sample last MIN_SAMPLE_TIME"""
+    number = 1
+    while True:
+        elapsed = sum(run_once() for _ in range(number))
+        if elapsed >= MIN_SAMPLE_TIME or number >= 1_000_000:
+            return number
+        number = max(number * 2, int(number * MIN_SAMPLE_TIME / max(elapsed, 1e-9)))
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5) -> List[float]:
+    """
+    Time a function
+    
+    Args:
+        fn: Function to time (called without arguments)
+        repeat: Number of samples
+        
+    Returns:
+        Seconds per call for each sample
+    """
+    def run_once() -> float:
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
+    
+    number = _calibrate(run_once)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples
+
+
+async def measure_async(fn: Callable[[], Awaitable[Any]], repeat: int = 5, number: Optional[int] = None) -> List[float]:
+    """
+    Time a coroutine function
+    
+    Args:
+        fn: Coroutine function to time (called without arguments)
+        repeat: Number of samples
+        number: Calls per sample (calibrated when not given)
+        
+    Returns:
+        Seconds per call for each sample
+    """
+    # The first call warms caches and connections and calibrates the sample size
+    started = time.perf_counter()
+    await fn()
+    elapsed = time.perf_counter() - started
+    if number is None:
+        number = max(1, min(int(MIN_SAMPLE_TIME / max(elapsed, 1e-9)), 1_000_000))
+    
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info() -> Dict[str, Any]:
+    """Describe the machine and package versions results were taken on"""
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[package] = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": _git_commit(),
+        "packages": packages
+    }
+
+
+def write_results(path: str, results: List[BenchmarkResult], environment: Dict[str, Any]):
+    """Write results as JSON"""
+    document = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment,
+        "results": [result.to_dict() for result in results]
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a results file
+    
+    Args:
+        path: Path written by write_results
+        
+    Returns:
+        Results by benchmark name
+    """
+    with open(path, 'r') as f:
+        document = json.load(f)
+    if document.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported results version in {path}: {document.get('version')}")
+    return {result["name"]: result for result in document["results"]}
+
+
+def compare(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = 0.10
+) -> List[Comparison]:
+    """
+    Compare medians with a baseline
+    
+    A benchmark regressed when its median is more than threshold slower
+    than the baseline median and its fastest sample is also slower than
+    the baseline's slowest, so run-to-run noise alone does not fail a run.
+    
+    Args:
+        results: Current results
+        baseline: Baseline results by name
+        threshold: Relative slowdown tolerated (0.10 is 10%)
+        
+    Returns:
+        One comparison per benchmark in either set
+    """
+    comparisons = []
+    current_names = set()
+    for result in results:
+        current_names.add(result.name)
+        previous = baseline.get(result.name)
+        if previous is None:
+            comparisons.append(Comparison(result.name, None, result.median, "new"))
+            continue
+        change = result.median / previous["median"] - 1 if previous["median"] else 0.0
+        if change > threshold and min(result.samples) > previous["max"]:
+            status = "regressed"
+        elif change < -threshold and max(result.samples) < previous["min"]:
+            status = "improved"
+        else:
+            status = "unchanged"
+        comparisons.append(Comparison(result.name, previous["median"], result.median, status))
+    for name, previous in baseline.items():
+        if name not in current_names:
+            comparisons.append(Comparison(name, previous["median"], None, "missing"))
+    return comparisons
+
+
+def format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if value >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value / 1e-9:.0f}ns"
+
+
+def format_report(results: List[BenchmarkResult], comparisons: Optional[List[Comparison]] = None) -> str:
+    """Render results (and their comparison with a baseline) as a text table"""
+    by_name = {comparison.name: comparison for comparison in comparisons or []}
+    width = max([len(result.name) for result in results] + [len(name) for name in by_name] + [9])
+    lines = [f"{'benchmark':<{width}}  {'median':>10}  {'p95':>10}  {'baseline':>10}  change"]
+    for result in results:
+        comparison = by_name.get(result.name)
+        baseline = change = ""
+        if comparison is not None:
+            baseline = format_seconds(comparison.baseline)
+            if comparison.change is not None:
+                change = f"{comparison.change:+.1%} {comparison.status}"
+            else:
+                change = comparison.status
+        lines.append(
+            f"{result.name:<{width}}  {format_seconds(result.median):>10}  "
+            f"{format_seconds(result.p95):>10}  {baseline:>10}  {change}"
+        )
+    for comparison in comparisons or []:
+        if comparison.status == "missing":
+            lines.append(f"{comparison.name:<{width}}  {'-':>10}  {'-':>10}  {format_seconds(comparison.baseline):>10}  missing")
+    return "\n".join(lines)
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from corpus import CORPUS_SIZES, build_corpus
+from harness import (
+    BenchmarkResult,
+    compare,
+    environment_info,
+    format_report,
+    load_results,
+    measure,
+    measure_async,
+    write_results,
+)
+
+# Benchmarks for the scraping tools, the MCP helper and code generation
+#
+#   python benchmarks/run_benchmarks.py                      # all suites
+#   python benchmarks/run_benchmarks.py --suite extract --sizes small,medium
+#   python benchmarks/run_benchmarks.py --save-baseline      # record a baseline
+#   python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+#
+# Exits with status 1 when a benchmark regressed against the baseline.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("agent-builder/tools/web", "agent-builder/mcp-integration"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+from web_scraping_tools import (  # noqa: E402
+    ParsedDocumentCache,
+    ParseOffloader,
+    SharedHTTPClient,
+    WebScrapingTools,
+    get_parser_backend,
+)
+from mcp_helper import MCPIntegrationHelper, MCPServerPool, MCPServerRegistry, ToolCatalog  # noqa: E402
+from batch_codegen import generate_batch  # noqa: E402
+
+SUITES = ["extract", "fetch", "mcp", "codegen"]
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+STUB_MCP_SERVER = os.path.join(ROOT, "agent-builder", "mcp-integration", "stub_mcp_server.py")
+
+
+class ToolRecorder:
+    """Stands in for an Agent so registered tools can be called directly"""
+    
+    def __init__(self):
+        self.tools: Dict[str, Callable[..., Any]] = {}
+    
+    def tool(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        self.tools[func.__name__] = func
+        return func
+
+
+# Extraction tool calls benchmarked per page: name -> (tool, extra arguments)
+EXTRACT_CALLS = {
+    "extract_text": ("extract_text", ()),
+    "extract_text_ranked": ("extract_text", (None, 512, "cache latency")),
+    "find_links": ("find_links", ("https://example.com/",)),
+    "find_images": ("find_images", ("https://example.com/",)),
+    "extract_tables": ("extract_tables", ()),
+    "extract_metadata": ("extract_metadata", ()),
+    "extract_page": ("extract_page", ()),
+    "select_elements": ("select_elements", ("section p a.ref",)),
+}
+
+
+async def bench_extract(corpus: Dict[str, str], parsers: List[str], repeat: int) -> List[BenchmarkResult]:
+    """Parse cost per page, then each extraction tool against the parsed page"""
+    results = []
+    for parser in parsers:
+        backend = get_parser_backend(parser)
+        recorder = ToolRecorder()
+        WebScrapingTools.register_tools(
+            recorder,
+            document_cache=ParsedDocumentCache(),
+            parser=parser,
+            parse_offloader=ParseOffloader('inline')
+        )
+        for size, html in corpus.items():
+            params = {"parser": backend.name, "size": size, "bytes": len(html)}
+            samples = measure(lambda: backend.parse(html), repeat)
+            results.append(BenchmarkResult(f"parse/{backend.name}/{size}", samples, params))
+            
+            for name, (tool, args) in EXTRACT_CALLS.items():
+                function = recorder.tools[tool]
+                samples = await measure_async(lambda: function(None, html, *args), repeat)
+                results.append(BenchmarkResult(f"extract/{name}/{backend.name}/{size}", samples, params))
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_http_stub(directory: str) -> Tuple[subprocess.Popen, str]:
+    """Serve a directory over HTTP from a child process, returning once it answers"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1", "--directory", directory],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            urllib.request.urlopen(base_url, timeout=1).close()
+            return process, base_url
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("HTTP stub did not start")
+            time.sleep(0.05)
+
+
+async def bench_fetch(corpus: Dict[str, str], repeat: int, concurrency: int = 16) -> List[BenchmarkResult]:
+    """fetch_webpage latency per page size and fetch_many throughput against a local server"""
+    directory = tempfile.mkdtemp(prefix="archon-bench-")
+    for size, html in corpus.items():
+        with open(os.path.join(directory, f"{size}.html"), 'w') as f:
+            f.write(html)
+    server, base_url = start_http_stub(directory)
+    client = SharedHTTPClient(max_connections_per_host=concurrency)
+    recorder = ToolRecorder()
+    WebScrapingTools.register_tools(recorder, http_client=client, parse_offloader=ParseOffloader('inline'))
+    fetch_webpage = recorder.tools["fetch_webpage"]
+    fetch_many = recorder.tools["fetch_many"]
+    
+    results = []
+    try:
+        for size, html in corpus.items():
+            url = f"{base_url}/{size}.html"
+            params = {"size": size, "bytes": len(html)}
+            samples = await measure_async(lambda: fetch_webpage(None, url), repeat)
+            results.append(BenchmarkResult(f"fetch/fetch_webpage/{size}", samples, params))
+            
+            # Distinct query strings so the crawler does not deduplicate the URLs
+            urls = [f"{url}?copy={i}" for i in range(concurrency)]
+            samples = await measure_async(
+                lambda: fetch_many(None, urls, max_pages=concurrency), repeat, number=1
+            )
+            results.append(BenchmarkResult(
+                f"fetch/fetch_many_x{concurrency}/{size}", samples, {**params, "pages": concurrency}
+            ))
+    finally:
+        await client.aclose()
+        server.kill()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def _stub_helper(pool: MCPServerPool, tool_count: int) -> MCPIntegrationHelper:
+    registry = MCPServerRegistry({
+        "stub": {"command": sys.executable, "args": [STUB_MCP_SERVER, "--tools", str(tool_count)]}
+    })
+    return MCPIntegrationHelper(registry=registry, server_pool=pool, tool_catalog=ToolCatalog())
+
+
+async def bench_mcp(repeat: int, tool_count: int = 50) -> List[BenchmarkResult]:
+    """Stub MCP server cold start, pooled reconnect and tool call latency"""
+    params = {"tools": tool_count}
+    
+    async def cold_start():
+        pool = MCPServerPool()
+        helper = _stub_helper(pool, tool_count)
+        try:
+            statuses = await helper.connect_servers(["stub"])
+            if not statuses["stub"].connected:
+                raise RuntimeError(f"Stub MCP server failed: {statuses['stub'].error}")
+            await helper.release_servers()
+        finally:
+            await pool.close()
+    
+    results = [BenchmarkResult("mcp/cold_start", await measure_async(cold_start, repeat, number=1), params)]
+    
+    pool = MCPServerPool()
+    helper = _stub_helper(pool, tool_count)
+    try:
+        async def warm_connect():
+            await helper.connect_servers(["stub"])
+            await helper.release_servers()
+        
+        samples = await measure_async(warm_connect, repeat)
+        results.append(BenchmarkResult("mcp/warm_connect", samples, params))
+        
+        samples = await measure_async(lambda: helper.call_tool("stub", "echo", {"text": "ping"}), repeat)
+        results.append(BenchmarkResult("mcp/call_tool", samples, params))
+    finally:
+        await helper.release_servers()
+        await helper.multiplexer.close()
+        await pool.close()
+    return results
+
+
+def bench_codegen(repeat: int, batch_size: int = 200) -> List[BenchmarkResult]:
+    """generate_mcp_integration_code per agent and generate_batch throughput"""
+    helper = MCPIntegrationHelper()
+    server_names = list(helper.get_available_servers())
+    results = []
+    for count in (1, len(server_names)):
+        names = server_names[:count]
+        counter = iter(range(10 ** 9))
+        samples = measure(
+            lambda: helper.generate_mcp_integration_code(f"Bench Agent {next(counter)}", names), repeat
+        )
+        results.append(BenchmarkResult(f"codegen/generate/{count}_servers", samples, {"servers": count}))
+    
+    specs = [
+        {"name": f"Bench Agent {i}", "servers": server_names[:1 + i % len(server_names)]}
+        for i in range(batch_size)
+    ]
+    directory = tempfile.mkdtemp(prefix="archon-bench-")
+    try:
+        def batch():
+            generate_batch(specs, directory, workers=1, force=True)
+        
+        samples = [sample / batch_size for sample in measure(batch, repeat)]
+        results.append(BenchmarkResult(
+            f"codegen/batch_per_agent/{batch_size}", samples, {"agents": batch_size, "workers": 1}
+        ))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+async def run_suites(args: argparse.Namespace) -> List[BenchmarkResult]:
+    sizes = {name: CORPUS_SIZES[name] for name in args.sizes}
+    corpus = build_corpus(sizes)
+    results: List[BenchmarkResult] = []
+    for suite in args.suite:
+        started = time.perf_counter()
+        if suite == "extract":
+            results.extend(await bench_extract(corpus, args.parser, args.repeat))
+        elif suite == "fetch":
+            results.extend(await bench_fetch(corpus, args.repeat))
+        elif suite == "mcp":
+            results.extend(await bench_mcp(args.repeat))
+        elif suite == "codegen":
+            results.extend(bench_codegen(args.repeat))
+        print(f"{suite}: done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if args.filter:
+        results = [result for result in results if args.filter in result.name]
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the ARCHON benchmark suite")
+    parser.add_argument(
+        "--suite", action="append", choices=SUITES,
+        help="Suite to run; repeat for several (defaults to all)"
+    )
+    parser.add_argument(
+        "--sizes", default=",".join(CORPUS_SIZES),
+        help=f"Comma-separated corpus page sizes ({', '.join(CORPUS_SIZES)})"
+    )
+    parser.add_argument(
+        "--parser", action="append",
+        help="HTML parser backend for the extract suite; repeat for several (defaults to ARCHON_HTML_PARSER)"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per benchmark")
+    parser.add_argument("--filter", help="Only report benchmarks whose name contains this")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10,
+        help="Relative slowdown of the median counted as a regression"
+    )
+    parser.add_argument(
+        "--save-baseline", nargs="?", const=DEFAULT_BASELINE,
+        help=f"Also write the results as the baseline (default {os.path.relpath(DEFAULT_BASELINE, ROOT)})"
+    )
+    args = parser.parse_args(argv)
+    
+    args.suite = args.suite or SUITES
+    args.sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in args.sizes if size not in CORPUS_SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+    args.parser = args.parser or [None]
+    
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run_suites(args))
+    environment = environment_info()
+    write_results(args.output, results, environment)
+    if args.save_baseline:
+        write_results(args.save_baseline, results, environment)
+    
+    comparisons = None
+    if args.baseline:
+        comparisons = compare(results, load_results(args.baseline), args.threshold)
+    print(format_report(results, comparisons))
+    print(f"\nResults written to {args.output}")
+    
+    regressed = [comparison.name for comparison in comparisons or [] if comparison.status == "regressed"]
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# agent-builder directories are not packages; their modules import each
+# other by plain name, so put them on the path like the benchmarks do
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in (
+    "agent-builder/tools/web",
+    "agent-builder/mcp-integration",
+    "agent-builder/templates",
+    "agent-builder/telemetry",
+):
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,230 @@
+import asyncio
+import gc
+import json
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+
+from basic_agent_template import (
+    AgentDeps, BasicAgentTemplate, RateLimiter, StreamEvent, sse_stream, websocket_stream
+)
+from telemetry import Telemetry
+
+
+@pytest.fixture(autouse=True)
+def fresh_agent_cache():
+    BasicAgentTemplate.clear_agent_cache()
+    yield
+    BasicAgentTemplate.clear_agent_cache()
+
+
+def _deps(**settings):
+    return AgentDeps(api_key="", model="test", **settings)
+
+
+def test_instances_with_equal_settings_share_an_agent():
+    first = BasicAgentTemplate(_deps())
+    second = BasicAgentTemplate(_deps(custom_data={"request": 2}))
+    
+    assert second.agent is first.agent
+
+
+@pytest.mark.parametrize("settings", [{"temperature": 0.2}, {"max_tokens": 50}])
+def test_different_settings_build_another_agent(settings):
+    base = BasicAgentTemplate(_deps())
+    deps = _deps()
+    for name, value in settings.items():
+        setattr(deps, name, value)
+    
+    assert BasicAgentTemplate(deps).agent is not base.agent
+
+
+def test_run_returns_the_output_text():
+    output = asyncio.run(BasicAgentTemplate(_deps()).run("hello"))
+    
+    assert isinstance(output, str)
+    assert "get_information" in output
+
+
+def _collect(stream):
+    async def run():
+        return [item async for item in stream]
+    
+    return asyncio.run(run())
+
+
+def test_stream_events_arrive_in_run_order():
+    events = _collect(BasicAgentTemplate(_deps()).run_stream("hello"))
+    types = [event.type for event in events]
+    
+    assert types[:4] == ["tool_call", "tool_call", "tool_result", "tool_result"]
+    assert set(types[4:-1]) == {"text_delta"}
+    assert types[-1] == "final"
+    calls = {event.data["tool_call_id"]: event.data["tool_name"] for event in events[:2]}
+    assert {event.data["tool_call_id"]: event.data["tool_name"] for event in events[2:4]} == calls
+    text = "".join(event.data["delta"] for event in events if event.type == "text_delta")
+    assert events[-1].data == {"output": text}
+
+
+def _parse_sse(frames):
+    parsed = []
+    for frame in frames:
+        assert frame.endswith("\n\n")
+        event_line, data_line = frame[:-2].split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        parsed.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return parsed
+
+
+def test_sse_framing():
+    frames = _collect(sse_stream(BasicAgentTemplate(_deps()).run_stream("hello"), run_id="run-1"))
+    events = _parse_sse(frames)
+    names = [name for name, _ in events]
+    
+    assert names[0] == "generation:started"
+    assert names[-1] == "generation:completed"
+    assert "generation:tool_call" in names and "generation:delta" in names
+    assert all(payload["run_id"] == "run-1" for _, payload in events)
+
+
+def test_websocket_framing_reports_errors():
+    async def failing_stream():
+        yield StreamEvent("text_delta", {"delta": "partial"})
+        raise RuntimeError("model went away")
+    
+    sent = []
+    
+    async def send(text):
+        sent.append(json.loads(text))
+    
+    asyncio.run(websocket_stream(send, failing_stream(), run_id="run-2"))
+    
+    assert sent == [
+        {"event": "generation:started", "data": {"run_id": "run-2"}},
+        {"event": "generation:delta", "data": {"run_id": "run-2", "delta": "partial"}},
+        {"event": "error:occurred", "data": {"run_id": "run-2", "error": "RuntimeError", "message": "model went away"}},
+    ]
+
+
+def test_websocket_framing_of_a_run():
+    sent = []
+    
+    async def send(text):
+        sent.append(json.loads(text))
+    
+    asyncio.run(websocket_stream(send, BasicAgentTemplate(_deps()).run_stream("hello")))
+    
+    assert sent[0] == {"event": "generation:started", "data": {}}
+    assert sent[-1]["event"] == "generation:completed"
+    assert isinstance(sent[-1]["data"]["output"], str)
+
+
+class FlakyTemplate(BasicAgentTemplate):
+    """Agent whose model fails each message's first `failures[message]` requests"""
+    
+    failures: dict = {}
+    attempts: dict = {}
+    
+    def _create_agent(self):
+        def model(messages, info):
+            prompt = messages[0].parts[-1].content
+            self.attempts[prompt] = self.attempts.get(prompt, 0) + 1
+            status = self.failures.get(prompt, 0)
+            if isinstance(status, int) and self.attempts[prompt] <= status:
+                raise ModelHTTPError(503, "test")
+            if status == "fatal":
+                raise ModelHTTPError(400, "test")
+            return ModelResponse(parts=[TextPart(f"answer to {prompt}")])
+        
+        return Agent(FunctionModel(model), deps_type=AgentDeps)
+
+
+def _batch(template, messages, **kwargs):
+    return _collect(template.run_batch(messages, base_delay=0.001, max_delay=0.001, **kwargs))
+
+
+def test_run_batch_retries_retryable_failures():
+    FlakyTemplate.failures = {"a": 2, "b": 0, "c": "fatal", "d": 5}
+    FlakyTemplate.attempts = {}
+    results = _batch(FlakyTemplate(_deps()), ["a", "b", "c", "d"], max_retries=3)
+    
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert [result.attempts for result in results] == [3, 1, 1, 4]
+    assert [result.output for result in results[:2]] == ["answer to a", "answer to b"]
+    assert results[2].error.startswith("ModelHTTPError") and results[3].error.startswith("ModelHTTPError")
+
+
+def test_run_batch_resumes_from_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "batch.jsonl")
+    FlakyTemplate.failures = {"b": "fatal"}
+    FlakyTemplate.attempts = {}
+    first = _batch(FlakyTemplate(_deps()), ["a", "b", "c"], checkpoint_path=checkpoint)
+    assert [result.ok for result in first] == [True, False, True]
+    
+    FlakyTemplate.failures = {}
+    FlakyTemplate.attempts = {}
+    second = _batch(FlakyTemplate(_deps()), ["a", "b", "c", "d"], checkpoint_path=checkpoint)
+    
+    assert [result.from_checkpoint for result in second] == [True, False, True, False]
+    assert [result.output for result in second] == ["answer to a", "answer to b", "answer to c", "answer to d"]
+    assert FlakyTemplate.attempts == {"b": 1, "d": 1}
+    
+    # A changed message at a recorded index is run again
+    third = _batch(FlakyTemplate(_deps()), ["a", "changed"], checkpoint_path=checkpoint)
+    assert [result.from_checkpoint for result in third] == [True, False]
+
+
+def test_rate_limiter_is_acquired_per_model_request(monkeypatch):
+    acquired = []
+    original = RateLimiter.acquire
+    
+    async def acquire(self):
+        acquired.append(self)
+        await original(self)
+    
+    monkeypatch.setattr(RateLimiter, "acquire", acquire)
+    # TestModel calls every tool, then answers: two model requests per run
+    results = _batch(BasicAgentTemplate(_deps()), ["a", "b"], rate_limit=1000)
+    
+    assert all(result.ok for result in results)
+    assert len(acquired) == 4
+    assert len(set(acquired)) == 1
+
+
+def test_rate_limiters_are_kept_per_event_loop():
+    gc.collect()
+    loops_before = len(BasicAgentTemplate._rate_limiters)
+    
+    async def limiter():
+        return BasicAgentTemplate(_deps())._rate_limiter("test", 5.0)
+    
+    async def same_loop():
+        return await limiter() is await limiter()
+    
+    assert asyncio.run(same_loop())
+    first, second = asyncio.run(limiter()), asyncio.run(limiter())
+    assert first is not second
+    # Limiters go away with their loop instead of being found again by a reused id()
+    gc.collect()
+    assert len(BasicAgentTemplate._rate_limiters) == loops_before
+
+
+def test_closing_a_stream_early_is_not_a_failed_run():
+    telemetry = Telemetry()
+    template = BasicAgentTemplate(_deps())
+    template.telemetry = telemetry
+    
+    async def run():
+        stream = template.run_stream("hello")
+        async for _ in stream:
+            break
+        await stream.aclose()
+    
+    asyncio.run(run())
+    
+    histogram = telemetry.histogram("agent_run_duration_seconds", labelnames=("model", "outcome"))
+    assert histogram.count({"model": "test", "outcome": "ok"}) == 1
+    assert histogram.count({"model": "test", "outcome": "error"}) == 0
@@ -0,0 +1,57 @@
+import json
+import os
+
+from batch_codegen import generate_batch, load_manifest
+
+SPECS = [{"name": "My Agent", "servers": ["filesystem"]}]
+
+
+def statuses(report):
+    return [result.status for result in report.results]
+
+
+def test_rerun_with_validation_validates_skipped_agents(tmp_path):
+    assert statuses(generate_batch(SPECS, str(tmp_path), workers=1)) == ["written"]
+    assert statuses(generate_batch(SPECS, str(tmp_path), workers=1)) == ["skipped"]
+    
+    validated = generate_batch(SPECS, str(tmp_path), workers=1, validate=True)
+    assert statuses(validated) == ["unchanged"]
+    assert validated.results[0].validation == "validate"
+    
+    # A weaker run than the last one can skip again
+    assert statuses(generate_batch(SPECS, str(tmp_path), workers=1)) == ["skipped"]
+    assert statuses(generate_batch(SPECS, str(tmp_path), workers=1, validate=True)) == ["skipped"]
+
+
+def test_specs_writing_the_same_file_fail(tmp_path):
+    specs = [
+        {"name": "My Agent", "servers": []},
+        {"name": "my_agent", "servers": []},
+        {"name": "Other", "servers": [], "output": "my_agent_agent.py"},
+        {"name": "Distinct", "servers": []},
+    ]
+    report = generate_batch(specs, str(tmp_path), workers=1)
+    
+    assert statuses(report) == ["failed", "failed", "failed", "written"]
+    assert "'my_agent', 'Other'" in report.results[0].error
+    assert not (tmp_path / "my_agent_agent.py").exists()
+
+
+def test_manifest_templates_resolve_against_the_manifest(tmp_path, monkeypatch):
+    manifest_dir = tmp_path / "project"
+    (manifest_dir / "templates").mkdir(parents=True)
+    (manifest_dir / "templates" / "agent.tpl").write_text("# {agent_name}\n")
+    manifest = manifest_dir / "agents.json"
+    manifest.write_text(json.dumps({"agents": [
+        {"name": "Templated", "template": "templates/agent.tpl"},
+        {"name": "Absolute", "template": str(manifest_dir / "templates" / "agent.tpl")},
+    ]}))
+    
+    # Run from somewhere else, as a CI job or a script in another directory would
+    monkeypatch.chdir(tmp_path)
+    specs = load_manifest(os.path.join("project", "agents.json"))
+    assert [spec["template"] for spec in specs] == [str(manifest_dir / "templates" / "agent.tpl")] * 2
+    
+    report = generate_batch(specs, str(tmp_path / "out"), workers=1)
+    assert statuses(report) == ["written", "written"]
+    assert (tmp_path / "out" / "templated_agent.py").read_text() == "# Templated\n"
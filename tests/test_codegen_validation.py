@@ -0,0 +1,49 @@
+import importlib.metadata
+import sys
+
+from codegen_validation import CodeValidator
+
+CODE = "import os\nprint(os.getcwd())\n"
+
+
+def test_identical_code_hits_the_shared_cache(tmp_path):
+    first = CodeValidator(cache_dir=str(tmp_path))
+    second = CodeValidator(cache_dir=str(tmp_path))
+    
+    assert not first.validate(CODE).cached
+    assert second.validate(CODE).cached
+    assert first.content_hash(CODE) == second.content_hash(CODE)
+
+
+def test_key_changes_with_sys_path(monkeypatch):
+    before = CodeValidator().content_hash(CODE)
+    monkeypatch.setattr(sys, "path", [*sys.path, "/somewhere/else"])
+    assert CodeValidator().content_hash(CODE) != before
+
+
+def test_key_changes_with_sys_prefix(monkeypatch):
+    before = CodeValidator().content_hash(CODE)
+    monkeypatch.setattr(sys, "prefix", "/other/venv")
+    assert CodeValidator().content_hash(CODE) != before
+
+
+def test_key_changes_with_installed_distributions(monkeypatch):
+    installed = list(importlib.metadata.distributions())
+    before = CodeValidator().content_hash(CODE)
+    monkeypatch.setattr(importlib.metadata, "distributions", lambda: installed[1:])
+    assert CodeValidator().content_hash(CODE) != before
+
+
+def test_key_changes_with_mypy_version(monkeypatch):
+    real_version = importlib.metadata.version
+    
+    def version(name):
+        return "0.0-test" if name == "mypy" else real_version(name)
+    
+    before = CodeValidator().content_hash(CODE)
+    monkeypatch.setattr(importlib.metadata, "version", version)
+    assert CodeValidator().content_hash(CODE) != before
+
+
+def test_key_depends_on_checks_requested():
+    assert CodeValidator().content_hash(CODE) != CodeValidator(type_check=True).content_hash(CODE)
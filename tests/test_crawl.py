@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+from web_scraping_tools import HostThrottle, SharedHTTPClient, crawl, fetch_page, normalize_url
+
+
+async def _crawl(urls):
+    client = SharedHTTPClient()
+    try:
+        return [page async for page in crawl(client, urls)]
+    finally:
+        await client.aclose()
+
+
+def test_normalize_url_drops_fragment():
+    assert normalize_url("https://example.com/a#top") == "https://example.com/a"
+
+
+def test_malformed_seeds_are_reported_per_url():
+    pages = asyncio.run(_crawl(["http://[::1/x", "ftp://example.com/", "http://example.com:99999/"]))
+    
+    assert [page.url for page in pages] == ["http://[::1/x", "ftp://example.com/", "http://example.com:99999/"]
+    assert all(page.error and page.status_code is None for page in pages)
+
+
+def test_fetch_page_reports_malformed_url():
+    async def fetch():
+        client = SharedHTTPClient()
+        try:
+            return await fetch_page(client, "http://[::1/x")
+        finally:
+            await client.aclose()
+    
+    result = asyncio.run(fetch())
+    assert result.error == "Invalid IPv6 URL"
+
+
+class Site:
+    """Mock transport serving linked pages, recording when each request ran"""
+    
+    def __init__(self, links=None, delays=None):
+        self.links = links or {}
+        self.delays = delays or {}
+        self.requests = Counter()
+        self.starts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def __call__(self, request):
+        path = request.url.path
+        self.requests[str(request.url)] += 1
+        self.starts.append((request.url.host, asyncio.get_running_loop().time()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(path, 0.01))
+        finally:
+            self.in_flight -= 1
+        body = "".join(f'<a href="{link}">link</a>' for link in self.links.get(path, []))
+        return httpx.Response(200, headers={"content-type": "text/html"}, text=f"<html><body>{body}</body></html>")
+
+
+def _crawl_site(site, urls, **kwargs):
+    async def run():
+        client = SharedHTTPClient(httpx.AsyncClient(transport=httpx.MockTransport(site)))
+        return [page async for page in crawl(client, urls, **kwargs)]
+    
+    return asyncio.run(run())
+
+
+def test_max_concurrency_bounds_requests_in_flight():
+    site = Site(delays={"/": 0.05})
+    urls = [f"http://host{number}.test/" for number in range(12)]
+    pages = _crawl_site(site, urls, max_concurrency=3)
+    
+    assert len(pages) == 12
+    assert site.max_in_flight == 3
+
+
+def test_max_depth_and_max_pages_stop_the_crawl():
+    links = {"/": ["/a", "/b"], "/a": ["/c"], "/c": ["/d"]}
+    
+    pages = _crawl_site(Site(links), ["http://site.test/"], max_depth=1)
+    assert sorted((page.url, page.depth) for page in pages) == [
+        ("http://site.test/", 0), ("http://site.test/a", 1), ("http://site.test/b", 1)
+    ]
+    
+    site = Site(links)
+    pages = _crawl_site(site, ["http://site.test/"], max_depth=3, max_pages=3)
+    assert len(pages) == 3
+    assert sum(site.requests.values()) == 3
+
+
+def test_host_throttle_spaces_requests_to_a_host():
+    site = Site()
+    urls = [f"http://slow.test/{number}" for number in range(4)] + ["http://other.test/"]
+    _crawl_site(site, urls, throttle=HostThrottle(max_per_host=4, delay=0.1))
+    
+    starts = [start for host, start in site.starts if host == "slow.test"]
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert len(starts) == 4
+    assert min(gaps) >= 0.09
+    # Other hosts are not held back by slow.test's delay
+    other_start = next(start for host, start in site.starts if host == "other.test")
+    assert other_start - starts[0] < 0.09
+
+
+def test_pages_are_yielded_as_they_complete():
+    site = Site(delays={"/slow": 0.2, "/fast": 0.01})
+    pages = _crawl_site(site, ["http://site.test/slow", "http://site.test/fast"])
+    
+    assert [page.url for page in pages] == ["http://site.test/fast", "http://site.test/slow"]
+
+
+def test_revisited_links_are_fetched_once():
+    links = {
+        "/": ["/a", "/b", "/#top", "/"],
+        "/a": ["/", "/b", "/a#section"],
+        "/b": ["/a", "http://site.test/"],
+    }
+    site = Site(links)
+    pages = _crawl_site(site, ["http://site.test/", "http://site.test/#again"], max_depth=3)
+    
+    assert sorted(page.url for page in pages) == ["http://site.test/", "http://site.test/a", "http://site.test/b"]
+    assert set(site.requests.values()) == {1}
+
+
+def test_shared_client_closes_the_client_of_a_finished_loop():
+    shared = SharedHTTPClient()
+    
+    async def get_client():
+        return shared.client
+    
+    async def replace():
+        client = shared.client
+        await asyncio.sleep(0.01)
+        return client
+    
+    first = asyncio.run(get_client())
+    second = asyncio.run(replace())
+    
+    assert second is not first
+    assert first.is_closed
+    asyncio.run(shared.aclose())
+
+
+def test_shared_client_closes_a_running_loops_client_on_that_loop():
+    shared = SharedHTTPClient()
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever)
+    thread.start()
+    try:
+        async def get_client():
+            return shared.client
+        
+        first = asyncio.run_coroutine_threadsafe(get_client(), old_loop).result(5)
+        second = asyncio.run(get_client())
+        for _ in range(100):
+            if first.is_closed:
+                break
+            time.sleep(0.01)
+        
+        assert second is not first
+        assert first.is_closed
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join()
+        old_loop.close()
@@ -0,0 +1,92 @@
+import asyncio
+import random
+
+import httpx
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import FunctionModel
+
+from web_scraping_tools import IncrementalTextExtractor, WebScrapingTools, clean_text
+
+PARAGRAPH = "<p>" + "word " * 100 + "</p>\n"
+
+
+class StreamingSite:
+    """Serves a page in chunks, counting how many were read"""
+    
+    def __init__(self, chunks, content_type="text/html"):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.sent = 0
+    
+    async def body(self):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk.encode()
+    
+    async def __call__(self, request):
+        return httpx.Response(200, headers={"content-type": self.content_type}, content=self.body())
+
+
+def _call_tool(site, name, args, **register_kwargs):
+    """Have an agent call one web scraping tool and return what the tool returned"""
+    def model(messages, info):
+        if len(messages) == 1:
+            return ModelResponse(parts=[ToolCallPart(name, args)])
+        return ModelResponse(parts=[TextPart("done")])
+    
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(site))
+        agent = Agent(FunctionModel(model))
+        WebScrapingTools.register_tools(agent, http_client=client, **register_kwargs)
+        result = await agent.run("fetch")
+        await client.aclose()
+        return result
+    
+    result = asyncio.run(run())
+    return next(
+        part.content
+        for message in result.all_messages()
+        for part in message.parts
+        if isinstance(part, ToolReturnPart)
+    )
+
+
+def test_fetch_text_stops_downloading_once_full():
+    site = StreamingSite(["<html><body>"] + [PARAGRAPH] * 200 + ["</body></html>"])
+    text = _call_tool(site, "fetch_text", {"url": "http://site.test/", "max_chars": 1000})
+    
+    assert len(text) == 1000
+    assert text.startswith("word word")
+    assert site.sent < 10
+
+
+def test_fetch_text_rejects_disallowed_content_types():
+    site = StreamingSite(["%PDF-1.7"], content_type="application/pdf")
+    text = _call_tool(site, "fetch_text", {"url": "http://site.test/doc.pdf"})
+    
+    assert text == "Error fetching http://site.test/doc.pdf: Unsupported content type: application/pdf"
+    assert site.sent == 0
+
+
+def test_fetch_text_respects_the_byte_limit():
+    site = StreamingSite(["<html><body>"] + [PARAGRAPH] * 50 + ["</body></html>"])
+    limit = len(PARAGRAPH) * 2
+    text = _call_tool(site, "fetch_text", {"url": "http://site.test/", "max_chars": 100000}, max_response_bytes=limit)
+    
+    assert 0 < len(text) <= limit
+    assert site.sent <= 4
+
+
+def test_incremental_length_matches_clean_text():
+    rng = random.Random(7)
+    alphabet = ["a", "b", " ", "  ", "\t", "\n", "\r\n", "\r", "\xa0", "\x0c", " "]
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        extractor = IncrementalTextExtractor(max_chars=10 ** 9)
+        position = 0
+        while position < len(text):
+            size = rng.randint(1, 6)
+            extractor.feed(text[position:position + size])
+            position += size
+            assert extractor.cleaned_chars == len(clean_text("".join(extractor._parts)))
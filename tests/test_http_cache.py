@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import httpx
+
+from web_scraping_tools import (
+    CachedResponse, DiskCacheStore, HTTPResponseCache, SharedHTTPClient, fetch_page
+)
+
+URL = "http://example.com/page"
+
+
+class SharedStore:
+    """Memory store that claims to be shared, like RedisCacheStore"""
+    
+    shared = True
+    
+    def __init__(self):
+        self.entries = {}
+    
+    async def get(self, key):
+        return self.entries.get(key)
+    
+    async def set(self, key, entry):
+        self.entries[key] = entry
+    
+    async def delete(self, key):
+        self.entries.pop(key, None)
+
+
+def _fetch_all(handler, cache, times):
+    """Fetch URL `times` times through a mock transport, returning the results"""
+    async def run():
+        client = SharedHTTPClient(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return [await fetch_page(client, URL, cache=cache) for _ in range(times)]
+    
+    return asyncio.run(run())
+
+
+def _headers(**headers):
+    return {"content-type": "text/html", **{k.replace("_", "-"): v for k, v in headers.items()}}
+
+
+def test_fresh_responses_are_served_from_cache():
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, headers=_headers(cache_control="max-age=60"), text="<p>hi</p>")
+    
+    cache = HTTPResponseCache()
+    results = _fetch_all(handler, cache, 3)
+    
+    assert len(requests) == 1
+    assert [result.from_cache for result in results] == [False, True, True]
+    assert all(result.text == "<p>hi</p>" for result in results)
+    assert (cache.misses, cache.hits, cache.revalidations) == (1, 2, 0)
+
+
+def test_freshness_lifetime():
+    cache = HTTPResponseCache()
+    now = time.time()
+    
+    assert cache.freshness_lifetime(httpx.Headers({"cache-control": "max-age=60"}), now) == 60
+    assert cache.freshness_lifetime(httpx.Headers({"cache-control": "max-age=60", "age": "50"}), now) == 10
+    assert cache.freshness_lifetime(httpx.Headers({"cache-control": "no-store"}), now) is None
+    assert cache.freshness_lifetime(httpx.Headers({"cache-control": "no-cache"}), now) == 0
+    assert cache.freshness_lifetime(httpx.Headers({"cache-control": "private, max-age=60"}), now) == 60
+    assert HTTPResponseCache(SharedStore()).freshness_lifetime(
+        httpx.Headers({"cache-control": "private, max-age=60"}), now
+    ) is None
+
+
+def test_shared_store_skips_private_responses():
+    def handler(request):
+        return httpx.Response(200, headers=_headers(cache_control="private, max-age=60"), text="mine")
+    
+    store = SharedStore()
+    cache = HTTPResponseCache(store)
+    _fetch_all(handler, cache, 2)
+    
+    assert store.entries == {}
+    assert (cache.misses, cache.stores) == (2, 0)
+
+
+def test_304_merges_stored_freshness_headers():
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            # The 304 names only the validator; the stored max-age still applies
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(200, headers=_headers(cache_control="max-age=60", etag='"v1"'), text="body")
+    
+    cache = HTTPResponseCache()
+    first = _fetch_all(handler, cache, 1)[0]
+    
+    entry = asyncio.run(cache.store.get(cache.key_for(URL)))
+    entry.stored_at -= 120
+    results = _fetch_all(handler, cache, 2)
+    
+    assert first.text == "body"
+    assert [result.status_code for result in results] == [304, 200]
+    assert all(result.text == "body" and result.from_cache for result in results)
+    assert len(requests) == 2
+    assert entry.freshness_lifetime == 60
+    assert (cache.misses, cache.revalidations, cache.hits) == (1, 1, 1)
+
+
+def _entry(size):
+    return CachedResponse(
+        url=URL, content_type="text/html", body=b"x" * size, stored_at=1700000000.0, freshness_lifetime=60
+    )
+
+
+def test_disk_store_evicts_least_recently_used(tmp_path):
+    entry_size = len(_entry(100).to_bytes())
+    store = DiskCacheStore(str(tmp_path), max_bytes=entry_size * 2)
+    
+    async def run():
+        await store.set("a", _entry(100))
+        await store.set("b", _entry(100))
+        assert await store.get("a") is not None
+        await store.set("c", _entry(100))
+    
+    asyncio.run(run())
+    
+    assert sorted(path.stem for path in tmp_path.glob("*.cache")) == ["a", "c"]
+    assert store.current_bytes == entry_size * 2
+    
+    # A new store picks up the same files and sizes
+    reopened = DiskCacheStore(str(tmp_path), max_bytes=entry_size * 2)
+    assert reopened.current_bytes == entry_size * 2
+
+
+def test_disk_store_drops_corrupt_files(tmp_path):
+    store = DiskCacheStore(str(tmp_path))
+    asyncio.run(store.set("a", _entry(100)))
+    path = tmp_path / "a.cache"
+    path.write_bytes(path.read_bytes()[:-10])
+    (tmp_path / "b.cache").write_bytes(b"not a cache entry")
+    
+    assert asyncio.run(store.get("a")) is None
+    assert asyncio.run(store.get("b")) is None
+    assert list(tmp_path.glob("*.cache")) == []
+    assert store.current_bytes == 0
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from mcp_helper import MCPIntegrationHelper, MCPServerPool, MCPServerRegistry, ToolCatalog
+
+STUB_MCP_SERVER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "agent-builder", "mcp-integration", "stub_mcp_server.py"
+)
+
+
+def _stub_registry(*stub_args):
+    return MCPServerRegistry({
+        "stub": {"command": sys.executable, "args": [STUB_MCP_SERVER, *stub_args], "env": {}}
+    })
+
+
+async def _with_helper(test, *stub_args):
+    """Run a test coroutine against a helper with its own pool and catalog"""
+    pool = MCPServerPool()
+    catalog = ToolCatalog()
+    helper = MCPIntegrationHelper(server_pool=pool, tool_catalog=catalog, registry=_stub_registry(*stub_args))
+    try:
+        await test(helper, pool, catalog)
+    finally:
+        await helper.release_servers()
+        await helper.multiplexer.close()
+        await pool.close()
+
+
+def test_tool_listing_is_cached():
+    async def test(helper, pool, catalog):
+        first = await helper.list_server_tools("stub")
+        second = await helper.list_server_tools("stub")
+        
+        assert [tool["name"] for tool in first] == ["echo", "add"]
+        assert second == first
+        assert (catalog.misses, catalog.hits) == (1, 1)
+        assert catalog.find_tool("echo")[0]["server"] == "stub"
+    
+    asyncio.run(_with_helper(test))
+
+
+def test_list_changed_invalidates_catalog():
+    async def test(helper, pool, catalog):
+        await helper.list_server_tools("stub")
+        key = pool.config_key(dict(helper.get_available_servers()["stub"]))
+        
+        async with helper.server_lease("stub") as server:
+            await server.direct_call_tool("add_tool", {"name": "added"})
+        for _ in range(100):
+            if catalog.get(key) is None:
+                break
+            await asyncio.sleep(0.05)
+        
+        assert catalog.get(key) is None
+        tools = await helper.list_server_tools("stub")
+        assert "added" in [tool["name"] for tool in tools]
+        assert catalog.misses == 2
+    
+    asyncio.run(_with_helper(test, "--mutable"))
+
+
+def test_pool_reuses_running_server():
+    async def test(helper, pool, catalog):
+        async with helper.server_lease("stub") as first:
+            pass
+        async with helper.server_lease("stub") as second:
+            assert second is first
+            assert pool.is_alive(second)
+        await helper.list_server_tools("stub")
+        
+        stats = pool.stats()
+        assert stats["starts"] == 1
+        assert stats["reuses"] >= 2
+        assert stats["leased"] == 0
+    
+    asyncio.run(_with_helper(test))
+
+
+def test_connect_agent_to_servers_is_deprecated():
+    async def test(helper, pool, catalog):
+        agent = Agent(TestModel())
+        with pytest.warns(DeprecationWarning, match="create_agent"):
+            returned = await helper.connect_agent_to_servers(agent, ["stub"])
+        
+        assert returned is agent
+        assert helper.last_connection_report["stub"].connected
+        assert helper.toolsets == [helper.active_servers["stub"]]
+        assert pool.stats()["leased"] == 1
+    
+    asyncio.run(_with_helper(test))
+
+
+def test_pool_stops_servers_of_a_previous_loop():
+    pool = MCPServerPool()
+    helper = MCPIntegrationHelper(server_pool=pool, tool_catalog=ToolCatalog(), registry=_stub_registry())
+    
+    async def lease():
+        async with helper.server_lease("stub") as server:
+            return server
+    
+    # The first loop keeps running in another thread, as in a server with a worker loop
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever)
+    thread.start()
+    try:
+        first = asyncio.run_coroutine_threadsafe(lease(), old_loop).result(30)
+        old_pooled = next(iter(pool._servers.values()))
+        
+        async def second_run():
+            try:
+                second = await lease()
+                assert second is not first
+                assert pool.is_alive(second)
+            finally:
+                await pool.close()
+        
+        asyncio.run(second_run())
+        for _ in range(100):
+            if old_pooled.task.done():
+                break
+            time.sleep(0.05)
+        assert old_pooled.task.done()
+        assert pool.starts == 2
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join()
+        old_loop.close()
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from mcp_helper import MCPBackpressureError, MCPSessionMultiplexer
+
+CONFIG = {"command": "stub", "args": []}
+
+
+class FakePool:
+    """Stands in for MCPServerPool, handing out one object per session key"""
+    
+    def __init__(self):
+        self.checkouts = []
+        self.checkins = []
+    
+    async def checkout(self, config, factory, key=None):
+        self.checkouts.append(key)
+        await asyncio.sleep(0)
+        return factory()
+    
+    async def checkin(self, server):
+        self.checkins.append(server)
+    
+    def is_alive(self, server):
+        return server not in self.checkins
+
+
+def test_calls_fan_out_across_sessions():
+    pool = FakePool()
+    
+    async def run():
+        multiplexer = MCPSessionMultiplexer(pool, max_sessions=3, max_in_flight=2)
+        servers = await asyncio.gather(*(
+            multiplexer.run(CONFIG, object, lambda server: asyncio.sleep(0.05, result=server))
+            for _ in range(6)
+        ))
+        stats = multiplexer.stats()
+        await multiplexer.close()
+        return servers, stats
+    
+    servers, stats = asyncio.run(run())
+    assert len(set(servers)) == 3
+    assert len(pool.checkouts) == 3
+    assert list(stats.values()) == [{"sessions": 3, "in_flight": 0, "waiting": 0, "calls": 6}]
+
+
+def test_full_queue_raises_backpressure_error():
+    pool = FakePool()
+    
+    async def run():
+        multiplexer = MCPSessionMultiplexer(pool, max_sessions=1, max_in_flight=1, max_waiting=2)
+        release = asyncio.Event()
+        
+        async def hold(server):
+            await release.wait()
+        
+        calls = [asyncio.create_task(multiplexer.run(CONFIG, object, hold)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(MCPBackpressureError):
+            await multiplexer.run(CONFIG, object, hold)
+        release.set()
+        await asyncio.gather(*calls)
+        await multiplexer.close()
+    
+    asyncio.run(run())
+    assert len(pool.checkouts) == 1
+
+
+def test_idle_sessions_are_released_including_the_last():
+    pool = FakePool()
+    
+    async def run():
+        multiplexer = MCPSessionMultiplexer(pool, max_sessions=2, max_in_flight=1, idle_timeout=0.05)
+        servers = await asyncio.gather(*(
+            multiplexer.run(CONFIG, object, lambda server: asyncio.sleep(0.01, result=server))
+            for _ in range(2)
+        ))
+        await asyncio.sleep(0.2)
+        stats = multiplexer.stats()
+        await multiplexer.close()
+        return servers, stats
+    
+    servers, stats = asyncio.run(run())
+    assert sorted(map(id, pool.checkins)) == sorted(map(id, servers))
+    assert stats == {}
@@ -0,0 +1,52 @@
+import json
+import os
+
+from mcp_helper import MCPIntegrationHelper, MCPServerRegistry
+
+
+def _write(path, configs):
+    with open(path, "w") as f:
+        json.dump(configs, f)
+    # Force a different (mtime, size) so the registry notices the change
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_reload_keeps_unchanged_definitions(tmp_path):
+    config_path = tmp_path / "servers.json"
+    custom = {"custom": {"command": "python", "args": ["server.py"], "env": {"A": "1"}}}
+    _write(config_path, custom)
+    registry = MCPServerRegistry(MCPIntegrationHelper.DEFAULT_MCP_CONFIGS, str(config_path), reload_interval=0)
+    
+    old_definition = registry.get("filesystem")
+    old_custom = registry.get("custom")
+    assert old_custom.environment["A"] == "1"
+    
+    _write(config_path, {**custom, "other": {"command": "node", "args": ["x.js"]}})
+    assert "other" in registry
+    assert registry.loads == 2
+    assert registry.get("filesystem") is old_definition
+    assert registry.get("custom") is old_custom
+
+
+def test_reload_replaces_changed_definitions(tmp_path):
+    config_path = tmp_path / "servers.json"
+    _write(config_path, {"custom": {"command": "python", "args": ["a.py"]}})
+    registry = MCPServerRegistry({}, str(config_path), reload_interval=0)
+    old_custom = registry.get("custom")
+    
+    _write(config_path, {"custom": {"command": "python", "args": ["b.py"]}})
+    new_custom = registry.get("custom")
+    assert new_custom is not old_custom
+    assert new_custom.config["args"] == ("b.py",)
+
+
+def test_unreadable_file_keeps_previous_custom_configs(tmp_path):
+    config_path = tmp_path / "servers.json"
+    _write(config_path, {"custom": {"command": "python", "args": ["a.py"], "env": {"A": "1"}}})
+    registry = MCPServerRegistry({}, str(config_path), reload_interval=0)
+    old_custom = registry.get("custom")
+    
+    config_path.write_text("{not json")
+    assert registry.get("custom") is old_custom
+    assert registry.errors == {}
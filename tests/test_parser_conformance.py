@@ -0,0 +1,30 @@
+import importlib.util
+
+import pytest
+
+from web_scraping_tools import PARSER_BACKENDS, ParserBackend, check_parser_conformance
+
+
+@pytest.mark.parametrize("name", sorted(PARSER_BACKENDS))
+def test_backend_matches_html_parser(name):
+    # get_parser_backend falls back to html.parser for missing engines,
+    # which would make the check pass vacuously
+    _, module = PARSER_BACKENDS[name]
+    if module and importlib.util.find_spec(module) is None:
+        pytest.skip(f"{module} is not installed")
+    
+    assert check_parser_conformance(name) == []
+
+
+def test_incomplete_backends_cannot_be_instantiated():
+    class TextOnlyBackend(ParserBackend):
+        name = "text-only"
+        
+        def parse(self, html):
+            return html
+        
+        def extract_text(self, document):
+            return document
+    
+    with pytest.raises(TypeError, match="find_links"):
+        TextOnlyBackend()
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+
+from vector_index import ScrapedContentIndex
+from web_scraping_tools import WebScrapingTools
+
+PAGE = "<html><body><h1>Title</h1><p>" + "word " * 200 + "</p></body></html>"
+
+RESPONSES = {
+    "/page": ("text/html; charset=utf-8", PAGE),
+    "/long": ("text/html", PAGE * 10),
+    "/data": ("application/json", '{"text": "not a page"}'),
+    "/plain": ("text/plain", "plain text"),
+}
+
+
+def handler(request):
+    content_type, body = RESPONSES[request.url.path]
+    return httpx.Response(200, headers={"content-type": content_type}, text=body)
+
+
+def test_only_complete_html_pages_are_indexed():
+    urls = [f"http://example.com{path}" for path in RESPONSES]
+    
+    def model(messages, info):
+        if len(messages) == 1:
+            return ModelResponse(parts=[ToolCallPart("fetch_many", {"urls": urls})])
+        return ModelResponse(parts=[TextPart("done")])
+    
+    async def run():
+        index = ScrapedContentIndex()
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        agent = Agent(FunctionModel(model))
+        WebScrapingTools.register_tools(
+            agent, http_client=client, scraped_index=index, max_response_bytes=len(PAGE) * 2
+        )
+        await agent.run("fetch")
+        await client.aclose()
+        return index
+    
+    index = asyncio.run(run())
+    assert index.has_page("http://example.com/page")
+    assert not index.has_page("http://example.com/long")
+    assert not index.has_page("http://example.com/data")
+    assert not index.has_page("http://example.com/plain")
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+import web_scraping_tools
+from web_scraping_tools import PatternWorkerPool, search_pattern
+
+
+@pytest.fixture
+def without_regex(monkeypatch):
+    # Force the worker-process fallback used when `regex` is not installed
+    monkeypatch.setattr(web_scraping_tools, "regex_module", None)
+    monkeypatch.setattr(web_scraping_tools, "_pattern_workers", PatternWorkerPool())
+    web_scraping_tools.compile_pattern.cache_clear()
+    yield web_scraping_tools._pattern_workers
+    web_scraping_tools._pattern_workers.shutdown()
+    web_scraping_tools.compile_pattern.cache_clear()
+
+
+def test_fallback_reuses_worker(without_regex):
+    assert asyncio.run(search_pattern(r"\d+", "a 12 b 345")) == ["12", "345"]
+    worker = without_regex._idle[0]
+    
+    assert asyncio.run(search_pattern(r"(x)(y)?", "xx", max_matches=1)) == [("x", "")]
+    assert without_regex._idle == [worker]
+
+
+def test_fallback_kills_worker_at_deadline(without_regex):
+    with pytest.raises(TimeoutError):
+        asyncio.run(search_pattern(r"(a|aa)+b", "a" * 40, timeout=0.5))
+    assert without_regex._idle == []
+    
+    assert asyncio.run(search_pattern(r"\w+", "still works")) == ["still", "works"]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent, RunContext
+
+from telemetry import Telemetry
+
+
+def test_render_uses_the_prometheus_text_format():
+    telemetry = Telemetry(buckets=(0.1, 1.0))
+    telemetry.counter("fetches_total", "Pages fetched", ("status",)).add(2, {"status": "200"})
+    telemetry.histogram("fetch_seconds", "Fetch latency", ("host",)).observe(0.5, {"host": 'a"b'})
+    
+    assert telemetry.render() == "\n".join([
+        "# HELP archon_fetch_seconds Fetch latency",
+        "# TYPE archon_fetch_seconds histogram",
+        'archon_fetch_seconds_bucket{host="a\\"b",le="0.1"} 0',
+        'archon_fetch_seconds_bucket{host="a\\"b",le="1"} 1',
+        'archon_fetch_seconds_bucket{host="a\\"b",le="+Inf"} 1',
+        'archon_fetch_seconds_sum{host="a\\"b"} 0.5',
+        'archon_fetch_seconds_count{host="a\\"b"} 1',
+        "# HELP archon_fetches_total Pages fetched",
+        "# TYPE archon_fetches_total counter",
+        'archon_fetches_total{status="200"} 2',
+    ]) + "\n"
+
+
+def test_metrics_reject_mismatched_labels():
+    telemetry = Telemetry()
+    counter = telemetry.counter("calls_total", labelnames=("tool",))
+    
+    with pytest.raises(ValueError):
+        counter.add(1, {"server": "x"})
+    with pytest.raises(ValueError):
+        telemetry.histogram("calls_total", labelnames=("tool",))
+
+
+def test_span_outcome_labels():
+    telemetry = Telemetry()
+    
+    with telemetry.span("fetch", {"host": "a"}):
+        pass
+    with telemetry.span("fetch", {"host": "a"}) as span:
+        span.fail("HTTP 500")
+    with pytest.raises(RuntimeError):
+        with telemetry.span("fetch", {"host": "a"}):
+            raise RuntimeError("boom")
+    
+    histogram = telemetry.histogram("fetch_duration_seconds", labelnames=("host", "outcome"))
+    assert histogram.count({"host": "a", "outcome": "ok"}) == 1
+    assert histogram.count({"host": "a", "outcome": "error"}) == 2
+
+
+def test_instrument_tool_keeps_the_tool_schema():
+    telemetry = Telemetry()
+    
+    async def lookup(ctx: RunContext[None], query: str, limit: int = 5) -> str:
+        """
+        Look something up
+        
+        Args:
+            ctx: Run context
+            query: What to look for
+            limit: Maximum number of results
+        """
+        return f"{query}:{limit}"
+    
+    plain = Agent("test")
+    plain.tool(lookup)
+    instrumented = Agent("test")
+    instrumented.tool(telemetry.instrument_tool(lookup))
+    
+    def definition(agent):
+        tool = agent._function_toolset.tools["lookup"]
+        return tool.tool_def
+    
+    assert definition(instrumented) == definition(plain)
+    
+    result = asyncio.run(instrumented.run("go"))
+    assert "lookup" in result.output
+    histogram = telemetry.histogram("tool_call_duration_seconds", labelnames=("tool", "outcome"))
+    assert histogram.count({"tool": "lookup", "outcome": "ok"}) == 1
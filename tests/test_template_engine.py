@@ -0,0 +1,43 @@
+import pytest
+
+from template_engine import TemplateEngine, TemplateSyntaxError
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("{agent_name!r}", "'My Agent'"),
+    ("{agent_name!s:>10}", "  My Agent"),
+    ("{count:03d}", "007"),
+    ("{agent_name!r:^{width}}", " 'My Agent' "),
+    ("{names[0]!a}", "'caf\\xe9'"),
+    ("{count != 7}", "False"),
+    ("{ {'a': 1}['a'] }", "1"),
+    ("{'x:y'}", "x:y"),
+    ("{names[0:1]}", "['café']"),
+])
+def test_str_format_conversions_and_specs(source, expected):
+    context = {"agent_name": "My Agent", "count": 7, "width": 12, "names": ["café"]}
+    assert TemplateEngine().render_string(source, context) == expected
+
+
+def test_invalid_conversion_is_a_syntax_error():
+    with pytest.raises(TemplateSyntaxError, match="invalid conversion"):
+        TemplateEngine().render_string("{agent_name!x}", {"agent_name": "a"})
+
+
+@pytest.mark.parametrize("source", [
+    "{[[l.append((x.gi_frame.f_back.f_back.f_back.f_globals['os'].getcwd() for x in l)),"
+    " list(l[0])] for l in [[]]]}",
+    "{(x for x in names)}",
+    "{names.gi_frame}",
+    "{names.f_globals}",
+    "{(lambda: 1)()}",
+])
+def test_frame_escapes_are_rejected(source):
+    with pytest.raises(TemplateSyntaxError):
+        TemplateEngine().render_string(source, {"names": []})
+
+
+def test_methods_of_builtin_values_are_allowed():
+    context = {"names": ["a", "b"], "config": {"k": "v"}}
+    source = "{', '.join([n.upper() for n in names])} {config.get('k')}"
+    assert TemplateEngine().render_string(source, context) == "A, B v"
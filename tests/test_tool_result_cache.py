@@ -0,0 +1,36 @@
+import asyncio
+
+from mcp_helper import ToolResultCache
+
+
+def test_cancelled_caller_does_not_cancel_waiters():
+    async def run():
+        cache = ToolResultCache({"stub": ["echo"]})
+        calls = 0
+        
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return calls
+        
+        first = asyncio.create_task(cache.get_or_call("stub", "route", "echo", {}, call))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(cache.get_or_call("stub", "route", "echo", {}, call))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        first.cancel()
+        return await asyncio.gather(first, *waiters, return_exceptions=True), calls
+    
+    (first, *waiters), calls = asyncio.run(run())
+    assert isinstance(first, asyncio.CancelledError)
+    # One waiter retries the call and the other shares it
+    assert waiters == [2, 2]
+    assert calls == 2
+
+
+def test_key_separates_route_tool_and_arguments():
+    assert ToolResultCache.make_key("a", "b\0c", {}) != ToolResultCache.make_key("a\0b", "c", {})
+    assert ToolResultCache.make_key("r", "t", {"x": 1, "y": 2}) == ToolResultCache.make_key("r", "t", {"y": 2, "x": 1})
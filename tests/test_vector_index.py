@@ -0,0 +1,77 @@
+import pytest
+
+from vector_index import QdrantVectorIndex, ScrapedContentIndex, prefix_key, url_prefixes
+
+
+def texts_and_urls(index, query):
+    return sorted((hit.payload["text"], hit.payload["urls"]) for hit in index.search(query, 10))
+
+
+def test_reindexing_embeds_only_new_chunks():
+    index = ScrapedContentIndex()
+    assert index.add_page("https://a", [("h", "one"), ("h", "two")]) == 2
+    assert index.add_page("https://b", [("h", "two")]) == 0
+    assert index.add_page("https://a", [("h", "two"), ("h", "three")]) == 1
+    
+    assert texts_and_urls(index, "one two three") == [
+        ("three", ["https://a"]),
+        ("two", ["https://a", "https://b"]),
+    ]
+    index.remove_page("https://a")
+    assert texts_and_urls(index, "two") == [("two", ["https://b"])]
+
+
+def test_qdrant_index_keeps_deduplicating_after_restart(tmp_path):
+    qdrant_client = pytest.importorskip("qdrant_client")
+    
+    def open_index():
+        client = qdrant_client.QdrantClient(path=str(tmp_path))
+        return ScrapedContentIndex(backend=QdrantVectorIndex(512, client=client))
+    
+    index = open_index()
+    index.add_page("https://a", [("h", "one"), ("h", "two")])
+    index.add_page("https://b", [("h", "two")])
+    index.backend.client.close()
+    
+    index = open_index()
+    assert index.has_page("https://a")
+    assert index.add_page("https://a", [("h", "two"), ("h", "three")]) == 1
+    # "one" vanished from its only page; "two" keeps both pages
+    assert texts_and_urls(index, "one two three") == [
+        ("three", ["https://a"]),
+        ("two", ["https://a", "https://b"]),
+    ]
+    index.backend.client.close()
+
+
+def test_url_prefix_keys():
+    assert url_prefixes("https://a.com/docs/page") == ["https:/", "https://", "https://a.com/", "https://a.com/docs/"]
+    assert prefix_key("https://a.com/do") == "https://a.com/"
+    assert prefix_key("https") is None
+    assert prefix_key("https://a.com/do") in url_prefixes("https://a.com/docs/page")
+
+
+def _numpy_index(tmp_path):
+    return ScrapedContentIndex()
+
+
+def _qdrant_index(tmp_path):
+    qdrant_client = pytest.importorskip("qdrant_client")
+    client = qdrant_client.QdrantClient(path=str(tmp_path))
+    return ScrapedContentIndex(backend=QdrantVectorIndex(512, client=client))
+
+
+@pytest.mark.parametrize("open_index", [_numpy_index, _qdrant_index])
+def test_url_prefix_search_finds_pages_beyond_the_top_hits(open_index, tmp_path):
+    index = open_index(tmp_path)
+    # Many better matches elsewhere must not crowd out the one under the prefix
+    for number in range(40):
+        index.add_page(f"https://other.com/{number}", [("pricing", f"pricing plans {number}")])
+    index.add_page("https://a.com/docs/pricing", [("docs", "pricing")])
+    index.add_page("https://a.com/blog/pricing", [("blog", "pricing news")])
+    
+    for prefix in ("https://a.com/docs/", "https://a.com/do", "https://a.com/docs/pricing"):
+        hits = index.search("pricing plans", 1, url_prefix=prefix)
+        assert [hit.payload["urls"] for hit in hits] == [["https://a.com/docs/pricing"]]
+    assert len(index.search("pricing plans", 5, url_prefix="https://a.com/")) == 2
+    assert len(index.search("pricing plans", 5, url_prefix="h")) == 5